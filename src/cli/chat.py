@@ -77,9 +77,12 @@ def _record_fingerprint(
 ) -> None:
     """
     记录一条轻量交互指纹（纯规则提取，零额外 LLM 调用）
+
+    写入由共享 EvolutionContext 的后台队列完成，不阻塞回到提示符
     """
     try:
-        from ..evolution.pattern_detector import PatternDetector, InteractionFingerprint
+        from ..evolution.pattern_detector import InteractionFingerprint
+        from .evolution_context import get_evolution_context
 
         domain = _infer_domain(user_input, tools_used)
         tool_chain = "→".join(tools_used) if tools_used else ""
@@ -95,8 +98,7 @@ def _record_fingerprint(
             rounds=rounds,
         )
 
-        detector = PatternDetector(JARVIS_HOME)
-        detector.record(fp)
+        get_evolution_context().record_fingerprint(fp)
     except Exception:
         pass  # 指纹记录失败不应影响聊天体验
 
@@ -343,15 +345,20 @@ def _do_ask(question: str):
     def on_compaction():
         console.print("\n  [dim]📦 对话已压缩，早期内容已摘要[/dim]")
 
+    async def _ask():
+        async with client:
+            await client.chat_with_tools(
+                messages=[{"role": "user", "content": question}],
+                on_content=on_content,
+                on_tool_start=on_tool_start,
+                on_tool_end=on_tool_end,
+                on_compaction=on_compaction,
+                background_compaction=False,  # 没有下一轮，不做后台摘要
+            )
+
     success = True
     try:
-        asyncio.run(client.chat_with_tools(
-            messages=[{"role": "user", "content": question}],
-            on_content=on_content,
-            on_tool_start=on_tool_start,
-            on_tool_end=on_tool_end,
-            on_compaction=on_compaction,
-        ))
+        asyncio.run(_ask())
         print("\n")
     except Exception as e:
         console.print(f"\n[red]错误: {e}[/red]")
@@ -402,60 +409,71 @@ def run_chat_loop():
     def on_compaction():
         console.print("  [dim]📦 对话已压缩，早期内容已摘要[/dim]")
 
-    while True:
-        try:
-            user_input = session.prompt("你> ").strip()
+    # 整个会话共用一个事件循环，LLM 客户端的连接池才能跨轮次复用；
+    # 等待输入时循环也在运行，后台压缩可以在两轮之间完成
+    runner = asyncio.Runner()
+    try:
+        while True:
+            try:
+                user_input = runner.run(session.prompt_async("你> ")).strip()
 
-            if not user_input:
-                continue
+                if not user_input:
+                    continue
 
-            # 斜杠命令
-            if user_input.startswith("/"):
-                if not handle_slash_command(user_input):
+                # 斜杠命令
+                if user_input.startswith("/"):
+                    if not handle_slash_command(user_input):
+                        break
+                    continue
+
+                # 退出兼容
+                if user_input.lower() in ("exit", "quit", "q"):
+                    console.print("\n[dim]再见！随时呼唤我。[/dim] 👋")
                     break
-                continue
 
-            # 退出兼容
-            if user_input.lower() in ("exit", "quit", "q"):
-                console.print("\n[dim]再见！随时呼唤我。[/dim] 👋")
+                # 自然语言意图
+                intent = detect_natural_intent(user_input)
+                if intent == "start":
+                    _do_start_daemon()
+                    continue
+                elif intent == "rest":
+                    _do_rest()
+                    continue
+                elif intent == "status":
+                    _do_status()
+                    continue
+
+                # LLM 对话 (with tool calling)
+                messages.append({"role": "user", "content": user_input})
+                round_tools.clear()  # 清空本轮工具追踪
+
+                console.print("\n[bold cyan]Jarvis[/bold cyan]: ", end="")
+
+                success = True
+                try:
+                    reply = runner.run(client.chat_with_tools(
+                        messages=messages,
+                        on_content=on_content,
+                        on_tool_start=on_tool_start,
+                        on_tool_end=on_tool_end,
+                        on_compaction=on_compaction,
+                    ))
+                    print("\n")
+
+                except Exception as e:
+                    console.print(f"\n[red]连接错误: {e}[/red]\n")
+                    success = False
+
+                # 记录交互指纹
+                _record_fingerprint(user_input, round_tools, success=success)
+
+            except KeyboardInterrupt:
+                console.print("\n[dim]再见！(daemon 仍在后台运行)[/dim] 👋")
                 break
-
-            # 自然语言意图
-            intent = detect_natural_intent(user_input)
-            if intent == "start":
-                _do_start_daemon()
-                continue
-            elif intent == "rest":
-                _do_rest()
-                continue
-            elif intent == "status":
-                _do_status()
-                continue
-
-            # LLM 对话 (with tool calling)
-            messages.append({"role": "user", "content": user_input})
-            round_tools.clear()  # 清空本轮工具追踪
-
-            console.print("\n[bold cyan]Jarvis[/bold cyan]: ", end="")
-
-            success = True
-            try:
-                reply = asyncio.run(client.chat_with_tools(
-                    messages=messages,
-                    on_content=on_content,
-                    on_tool_start=on_tool_start,
-                    on_tool_end=on_tool_end,
-                    on_compaction=on_compaction,
-                ))
-                print("\n")
-
-            except Exception as e:
-                console.print(f"\n[red]连接错误: {e}[/red]\n")
-                success = False
-
-            # 记录交互指纹
-            _record_fingerprint(user_input, round_tools, success=success)
-
-        except KeyboardInterrupt:
-            console.print("\n[dim]再见！(daemon 仍在后台运行)[/dim] 👋")
-            break
+    finally:
+        try:
+            runner.run(client.aclose())
+        finally:
+            runner.close()
+            from .evolution_context import close_evolution_context
+            close_evolution_context()
@@ -3,6 +3,7 @@ Jarvis CLI — 公共常量与工具函数
 """
 import json
 import os
+import sqlite3
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
@@ -31,13 +32,21 @@ def get_state_path() -> Path:
 
 
 def get_discoveries_path() -> Path:
-    return JARVIS_HOME / "discoveries.json"
+    return JARVIS_HOME / "discoveries.jsonl"
+
+
+def get_index_path() -> Path:
+    return JARVIS_HOME / "index.db"
 
 
 def get_pid_path() -> Path:
     return JARVIS_HOME / "daemon.pid"
 
 
+def get_llm_cache_path() -> Path:
+    return JARVIS_HOME / "llm_cache.db"
+
+
 def ensure_jarvis_home():
     """确保 Jarvis 家目录存在"""
     JARVIS_HOME.mkdir(parents=True, exist_ok=True)
@@ -54,64 +63,99 @@ def get_status_summary() -> tuple[str, str, int]:
     Returns: (status_emoji, status_text, unread_count)
     """
     state_path = get_state_path()
-    discoveries_path = get_discoveries_path()
 
     if not state_path.exists():
         return "⚪", "未启动", 0
 
-    try:
-        with open(state_path, "r") as f:
-            state = json.load(f)
-
-        status = state.get("status", "unknown")
-        last_hb = state.get("last_heartbeat")
-
-        if status == "running" and last_hb:
-            last_heartbeat = datetime.fromisoformat(last_hb)
-            if (datetime.now() - last_heartbeat).total_seconds() < 120:
-                status_emoji, status_text = "🟢", "运行中"
-            else:
-                status_emoji, status_text = "🔴", "无响应"
-        elif status == "resting":
-            status_emoji, status_text = "😴", "休眠中"
-        else:
-            status_emoji, status_text = "⚪", "已停止"
-    except (json.JSONDecodeError, KeyError):
+    from ..daemon.state import read_state, heartbeat_timeout
+
+    # 优先读 mmap 状态记录，无需解析 JSON
+    state = read_state(state_path) or {}
+    status = state.get("status", "unknown")
+    last_hb = state.get("last_heartbeat")
+
+    if not state:
         status_emoji, status_text = "⚪", "未知"
+    elif status == "running" and last_hb:
+        last_heartbeat = datetime.fromisoformat(last_hb)
+        if (datetime.now() - last_heartbeat).total_seconds() < heartbeat_timeout(state):
+            status_emoji, status_text = "🟢", "运行中"
+        else:
+            status_emoji, status_text = "🔴", "无响应"
+    elif status == "resting":
+        status_emoji, status_text = "😴", "休眠中"
+    else:
+        status_emoji, status_text = "⚪", "已停止"
+
+    return status_emoji, status_text, count_unread_discoveries()
 
-    # 统计未读发现
-    unread_count = 0
-    if discoveries_path.exists():
+
+def _discovery_backend() -> str:
+    """配置的 daemon.discovery_backend（默认 sqlite）"""
+    config_path = get_config_path()
+    if config_path.exists():
         try:
-            with open(discoveries_path, "r") as f:
-                data = json.load(f)
-            unread_count = sum(
-                1 for d in data.get("discoveries", [])
-                if not d.get("acknowledged")
-            )
-        except (json.JSONDecodeError, KeyError):
+            with open(config_path) as f:
+                return json.load(f).get("daemon", {}).get("discovery_backend", "sqlite")
+        except json.JSONDecodeError:
             pass
+    return "sqlite"
 
-    return status_emoji, status_text, unread_count
+
+def count_unread_discoveries() -> int:
+    """
+    未读发现数（只用于显示）
+
+    SQLite 后端以只读方式打开 index.db 做一次 COUNT，不建表、不迁移；
+    数据库被锁、损坏或迁移中时返回 0，不影响横幅与 status 显示。
+    """
+    if _discovery_backend() == "jsonl":
+        store = open_discovery_store()
+        try:
+            return store.unread_count() if store else 0
+        except (json.JSONDecodeError, OSError):
+            return 0
+
+    index_path = get_index_path()
+    if not index_path.exists():
+        return 0
+    try:
+        conn = sqlite3.connect(f"{index_path.as_uri()}?mode=ro", uri=True, timeout=1.0)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM discoveries WHERE acknowledged = 0").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+
+def open_discovery_store():
+    """打开发现存储（按配置的 daemon.discovery_backend）；还没有任何发现时返回 None"""
+    path = get_discoveries_path()
+    has_log = path.exists() or path.with_suffix(".json").exists()
+
+    if _discovery_backend() == "jsonl":
+        if not has_log:
+            return None
+        from ..daemon.discovery import DiscoveryStore
+        return DiscoveryStore(str(path))
+
+    index_path = get_index_path()
+    if not index_path.exists() and not has_log:
+        return None
+    from ..memory import MemoryIndex
+    from ..daemon.discovery import SQLiteDiscoveryStore
+    return SQLiteDiscoveryStore(MemoryIndex(index_path), import_path=str(path))
 
 
 def get_unread_discoveries(limit: int = 3) -> list[dict]:
     """获取未读发现列表（按重要性排序）"""
-    discoveries_path = get_discoveries_path()
-    if not discoveries_path.exists():
+    store = open_discovery_store()
+    if store is None:
         return []
-
     try:
-        with open(discoveries_path, "r") as f:
-            data = json.load(f)
-
-        unread = [
-            d for d in data.get("discoveries", [])
-            if not d.get("acknowledged")
-        ]
-        unread.sort(key=lambda x: x.get("importance", 3), reverse=True)
-        return unread[:limit]
-    except (json.JSONDecodeError, KeyError):
+        return store.unread_records(limit)
+    except (json.JSONDecodeError, OSError, sqlite3.Error):
         return []
 
 
@@ -166,6 +210,15 @@ def detect_natural_intent(text: str) -> Optional[str]:
     return None
 
 
+def load_memory_config() -> dict:
+    """加载记忆配置，返回 {vector_index, embedding_model}"""
+    config_path = get_config_path()
+    if config_path.exists():
+        with open(config_path) as f:
+            return json.load(f).get("memory", {})
+    return {}
+
+
 def load_llm_config() -> dict:
     """加载 LLM 配置，返回 {base_url, model, auth_token}"""
     config_path = get_config_path()
@@ -16,8 +16,8 @@ from rich.panel import Panel
 
 from .common import (
     console, JARVIS_HOME, VERSION,
-    get_config_path, get_state_path, get_discoveries_path, get_pid_path,
-    ensure_jarvis_home, get_status_summary,
+    get_config_path, get_state_path, get_pid_path,
+    get_llm_cache_path, ensure_jarvis_home, get_status_summary, open_discovery_store,
 )
 
 
@@ -27,18 +27,14 @@ def _do_status():
     """查看 Jarvis 状态"""
     status_emoji, status_text, unread = get_status_summary()
 
-    state_path = get_state_path()
+    from ..daemon.state import read_state
+
     hb_str = "无"
-    if state_path.exists():
-        try:
-            with open(state_path, "r") as f:
-                state = json.load(f)
-            last_hb = state.get("last_heartbeat")
-            if last_hb:
-                time_since = (datetime.now() - datetime.fromisoformat(last_hb)).total_seconds()
-                hb_str = f"{int(time_since)} 秒前" if time_since < 60 else f"{int(time_since // 60)} 分钟前"
-        except (json.JSONDecodeError, KeyError):
-            pass
+    state = read_state(get_state_path())
+    last_hb = state.get("last_heartbeat") if state else None
+    if last_hb:
+        time_since = (datetime.now() - datetime.fromisoformat(last_hb)).total_seconds()
+        hb_str = f"{int(time_since)} 秒前" if time_since < 60 else f"{int(time_since // 60)} 分钟前"
 
     console.print(f"\n{status_emoji} 状态: [bold]{status_text}[/bold]")
     console.print(f"   心跳: {hb_str}")
@@ -112,14 +108,12 @@ def _do_rest():
     if not pid_path.exists():
         # 检查残留状态
         if state_path.exists():
+            from ..daemon.state import read_state, mark_stopped
             try:
-                with open(state_path, "r") as f:
-                    state = json.load(f)
-                if state.get("status") == "running":
+                state = read_state(state_path)
+                if state and state.get("status") == "running":
                     console.print("[yellow]⚠️  发现残留状态，正在清理...[/yellow]")
-                    state["status"] = "stopped"
-                    with open(state_path, "w") as f:
-                        json.dump(state, f, indent=2)
+                    mark_stopped(state_path)
                     console.print("[green]✅ 状态已清理[/green]")
                     return
             except Exception:
@@ -210,10 +204,14 @@ def register(app: typer.Typer):
             ))
             return
 
-        try:
-            with open(state_path, "r") as f:
-                state = json.load(f)
+        from ..daemon.state import read_state, heartbeat_timeout
+
+        state = read_state(state_path)
+        if state is None:
+            console.print("[red]读取状态失败: state.json 无法解析[/red]")
+            return
 
+        try:
             status_text = state.get("status", "unknown")
             last_heartbeat = datetime.fromisoformat(state.get("last_heartbeat", datetime.now().isoformat()))
             started_at = datetime.fromisoformat(state.get("started_at", datetime.now().isoformat()))
@@ -221,7 +219,7 @@ def register(app: typer.Typer):
             important_today = state.get("important_discoveries_today", 0)
 
             time_since_heartbeat = (datetime.now() - last_heartbeat).total_seconds()
-            if status_text == "running" and time_since_heartbeat > 120:
+            if status_text == "running" and time_since_heartbeat > heartbeat_timeout(state):
                 actual_status, status_color = "🔴 无响应", "red"
             elif status_text == "running":
                 actual_status, status_color = "🟢 运行中", "green"
@@ -247,25 +245,30 @@ def register(app: typer.Typer):
                 f"今日发现: {discoveries_today} 条（{important_today} 条重要）\n"
             )
 
+            cache_path = get_llm_cache_path()
+            if cache_path.exists():
+                from ..memory import LLMCache
+                stats = LLMCache(cache_path).stats()
+                content += (
+                    f"LLM 缓存: 今日命中 {stats['hits']} / 未命中 {stats['misses']}"
+                    f"（命中率 {stats['hit_rate']:.0%}）\n"
+                )
+
             console.print(Panel(content, title="🫀 Jarvis 生命体征", border_style=status_color))
 
             # 显示最近发现
-            discoveries_path = get_discoveries_path()
-            if discoveries_path.exists():
+            store = open_discovery_store()
+            if store is not None:
                 try:
-                    with open(discoveries_path, "r") as f:
-                        data = json.load(f)
-                    discoveries = data.get("discoveries", [])[:3]
+                    discoveries = store.get_recent(3)
                     if discoveries:
                         console.print("\n[bold]📋 最近发现:[/bold]")
                         for d in discoveries:
-                            stars = "⭐" * d.get("importance", 3)
-                            title = d.get("title", "未知")
-                            ts = datetime.fromisoformat(d.get("timestamp", datetime.now().isoformat()))
-                            ack = "✓" if d.get("acknowledged") else ""
-                            console.print(f"  • [{ts.strftime('%H:%M')}] {title} {stars} {ack}")
+                            stars = "⭐" * d.importance
+                            ack = "✓" if d.acknowledged else ""
+                            console.print(f"  • [{d.timestamp.strftime('%H:%M')}] {d.title} {stars} {ack}")
                         console.print("\n[dim]使用 [bold]jarvis discoveries[/bold] 查看更多[/dim]")
-                except (json.JSONDecodeError, KeyError):
+                except (json.JSONDecodeError, KeyError, ValueError, OSError):
                     pass
 
         except (json.JSONDecodeError, KeyError) as e:
@@ -27,18 +27,10 @@ from .common import console, JARVIS_HOME, ensure_jarvis_home, load_llm_config
 # ── 内部实现 ──────────────────────────────────────────────
 
 def _get_evolution_components():
-    """延迟加载 Evolution 组件"""
-    from ..evolution.pattern_detector import PatternDetector
-    from ..evolution.skill_registry import SkillRegistry
-    from ..evolution.preference_learner import PreferenceLearner
-    from ..evolution.metacognition import Metacognition
-
-    detector = PatternDetector(JARVIS_HOME)
-    registry = SkillRegistry(JARVIS_HOME)
-    learner = PreferenceLearner(JARVIS_HOME)
-    meta = Metacognition(JARVIS_HOME, detector, registry, learner)
+    """进程内共享的 Evolution 组件（首次使用时创建，与聊天循环共用）"""
+    from .evolution_context import get_evolution_context
 
-    return detector, registry, learner, meta
+    return get_evolution_context().components()
 
 
 def _do_reflect():
@@ -58,17 +50,9 @@ def _do_abilities():
     ensure_jarvis_home()
     detector, registry, learner, meta = _get_evolution_components()
 
-    fingerprints = detector.get_recent_fingerprints(days=30)
-    patterns = detector.get_patterns()
-    skills = registry.list_skills(include_disabled=True)
-    preferences = learner.get_all_preferences()
-
-    radar = meta.compute_ability_radar(
-        fingerprint_count=len(fingerprints),
-        pattern_count=len(patterns),
-        skill_count=len(skills),
-        preference_count=len(preferences),
-    )
+    snapshot = meta.snapshot()
+    assessment = meta.assess(snapshot)
+    radar = assessment.ability_radar
 
     radar_labels = {
         "perception": ("👁️", "感知"),
@@ -87,25 +71,29 @@ def _do_abilities():
         console.print(f"  {emoji} {label}  {bar} {pct}")
 
     console.print()
-    console.print(f"  [dim]指纹: {len(fingerprints)} | 模式: {len(patterns)} | "
-                  f"Skill: {len(skills)} | 偏好: {len(preferences)}[/dim]")
+    console.print(f"  [dim]指纹: {snapshot.fingerprint_count} | 模式: {len(snapshot.patterns)} | "
+                  f"Skill: {len(snapshot.skills)} | 偏好: {len(snapshot.preferences)}[/dim]")
+    console.print(f"  [dim]⏱️ 快照 {snapshot.build_ms:.1f} ms | 评分 {assessment.scoring_ms:.1f} ms[/dim]")
     console.print()
 
 
 def _do_patterns():
     """查看检测到的交互模式"""
     ensure_jarvis_home()
-    from ..evolution.pattern_detector import PatternDetector
+    from .evolution_context import get_evolution_context
 
-    detector = PatternDetector(JARVIS_HOME)
+    context = get_evolution_context()
+    context.flush()
+    detector = context.detector
 
     # 先显示指纹统计
-    fingerprints = detector.get_recent_fingerprints()
-    if fingerprints:
-        console.print(f"\n[dim]📊 最近 30 天共 {len(fingerprints)} 条交互指纹[/dim]")
+    fingerprint_count = detector.count_fingerprints()
+    if fingerprint_count:
+        console.print(f"\n[dim]📊 最近 30 天共 {fingerprint_count} 条交互指纹[/dim]")
 
-        # 主动触发一次模式检测
-        new_patterns = detector.detect_patterns(fingerprints)
+        # 收取记录时已触发的模式事件，再用本地聚类找近似重复
+        new_patterns = detector.detect_patterns()
+        new_patterns += detector.detect_similar_patterns()
         if new_patterns:
             console.print(f"[green]✨ 新检测到 {len(new_patterns)} 个模式！[/green]")
 
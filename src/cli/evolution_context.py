@@ -0,0 +1,151 @@
+"""
+Jarvis CLI — 进程内共享的 Evolution 组件
+
+聊天循环、单次提问与 evolution 命令共用一组 PatternDetector / SkillRegistry /
+PreferenceLearner / Metacognition，首次使用时才创建（每轮对话不再重复
+mkdir、解析 patterns.json）。
+
+指纹写入交给后台写入队列：回复结束后立即回到提示符，退出前 close() 落盘。
+其他进程（daemon）改过 skills/ 或 preferences.json 时，下次取用重新加载。
+"""
+import atexit
+import threading
+from pathlib import Path
+from typing import Optional
+
+from ..utils.write_queue import WriteBehindQueue, WriteQueueMetrics
+
+
+class EvolutionContext:
+    """一组共享的 Evolution 组件 + 指纹后台写入"""
+
+    def __init__(self, jarvis_home: Path):
+        self.jarvis_home = jarvis_home
+        self._lock = threading.RLock()
+        self._detector = None
+        self._registry = None
+        self._learner = None
+        self._meta = None
+        self._stamps: dict[str, Optional[int]] = {}
+        self._writer: Optional[WriteBehindQueue] = None
+
+    # ── 组件 ──────────────────────────────────────────────
+
+    @property
+    def detector(self):
+        with self._lock:
+            if self._detector is None:
+                from ..evolution.pattern_detector import PatternDetector
+                self._detector = PatternDetector(self.jarvis_home)
+            return self._detector
+
+    @property
+    def registry(self):
+        with self._lock:
+            if self._registry is None or self._changed("skills", self.jarvis_home / "skills"):
+                from ..evolution.skill_registry import SkillRegistry
+                self._registry = SkillRegistry(self.jarvis_home)
+                self._meta = None
+            return self._registry
+
+    @property
+    def learner(self):
+        with self._lock:
+            prefs = self.jarvis_home / "memory" / "persona" / "preferences.json"
+            if self._learner is None or self._changed("preferences", prefs):
+                from ..evolution.preference_learner import PreferenceLearner
+                self._learner = PreferenceLearner(self.jarvis_home)
+                self._meta = None
+            return self._learner
+
+    @property
+    def meta(self):
+        with self._lock:
+            detector, registry, learner = self.detector, self.registry, self.learner
+            if self._meta is None:
+                from ..evolution.metacognition import Metacognition
+                self._meta = Metacognition(self.jarvis_home, detector, registry, learner)
+            return self._meta
+
+    def components(self) -> tuple:
+        """(detector, registry, learner, meta)；先等已排队的指纹落盘"""
+        self.flush()
+        with self._lock:
+            meta = self.meta
+            return self._detector, self._registry, self._learner, meta
+
+    def _changed(self, key: str, path: Path) -> bool:
+        """path 的 mtime 与上次记录的不同（首次调用只记录）"""
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        first = key not in self._stamps
+        changed = self._stamps.get(key) != mtime
+        self._stamps[key] = mtime
+        return changed and not first
+
+    # ── 指纹后台写入 ──────────────────────────────────────
+
+    def record_fingerprint(self, fingerprint) -> None:
+        """放入写入队列立即返回"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = WriteBehindQueue(
+                    self._write_fingerprints, max_batch=32, max_delay=0.2, name="jarvis-fingerprints"
+                )
+        self._writer.submit(fingerprint)
+
+    def _write_fingerprints(self, batch: list) -> None:
+        # 逐条容错：一条失败不连累同批其他指纹；记录失败不应影响聊天体验
+        for fingerprint in batch:
+            try:
+                self.detector.record(fingerprint)
+            except Exception:
+                pass
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待排队的指纹全部写入"""
+        return self._writer.flush(timeout) if self._writer else True
+
+    def metrics(self) -> Optional[WriteQueueMetrics]:
+        return self._writer.metrics() if self._writer else None
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """写完队列并关闭指纹库"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            writer.close(timeout)
+        with self._lock:
+            if self._detector is not None:
+                self._detector.close()
+                self._detector = None
+            self._meta = None
+
+
+_context: Optional[EvolutionContext] = None
+_context_lock = threading.Lock()
+
+
+def get_evolution_context() -> EvolutionContext:
+    """进程内共享的 EvolutionContext（首次调用时创建）"""
+    global _context
+    with _context_lock:
+        if _context is None:
+            from .common import JARVIS_HOME
+            _context = EvolutionContext(JARVIS_HOME)
+        return _context
+
+
+def close_evolution_context() -> None:
+    """关闭共享的 EvolutionContext（未创建时什么也不做）"""
+    global _context
+    with _context_lock:
+        context, _context = _context, None
+    if context is not None:
+        context.close()
+
+
+# 进程退出前写完排队的指纹
+atexit.register(close_evolution_context)
@@ -3,6 +3,7 @@ Jarvis CLI — 探索、发现、技能、初始化命令
 """
 import json
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 from typing import Optional
 
@@ -13,7 +14,7 @@ from rich.table import Table
 
 from .common import (
     console, JARVIS_HOME,
-    get_config_path, get_discoveries_path, ensure_jarvis_home,
+    get_config_path, ensure_jarvis_home, open_discovery_store,
 )
 
 
@@ -21,23 +22,20 @@ from .common import (
 
 def _do_discoveries():
     """查看发现"""
-    discoveries_path = get_discoveries_path()
+    store = open_discovery_store()
 
-    if not discoveries_path.exists():
+    if store is None:
         console.print("[yellow]还没有任何发现[/yellow]")
         return
 
     try:
-        with open(discoveries_path, "r") as f:
-            data = json.load(f)
-
-        all_discoveries = data.get("discoveries", [])
-        if not all_discoveries:
+        recent = list(islice(store.iter_records(), 5))
+        if not recent:
             console.print("[yellow]还没有任何发现[/yellow]")
             return
 
         console.print("\n[bold]📋 最近发现:[/bold]")
-        for d in all_discoveries[:5]:
+        for d in recent:
             ts = datetime.fromisoformat(d.get("timestamp", datetime.now().isoformat()))
             time_str = ts.strftime("%m/%d %H:%M")
             stars = "⭐" * d.get("importance", 3)
@@ -87,20 +85,16 @@ def _do_explore(path_arg: Optional[str] = None):
 
 def _do_projects():
     """列出已发现的项目"""
-    discoveries_path = get_discoveries_path()
+    store = open_discovery_store()
 
-    if not discoveries_path.exists():
+    if store is None:
         console.print("[yellow]还没有探索过任何目录[/yellow]")
         console.print("[dim]运行 jarvis explore 开始探索[/dim]")
         return
 
     try:
-        with open(discoveries_path, "r") as f:
-            data = json.load(f)
-
-        discoveries = data.get("discoveries", [])
         # 过滤出 project_found 类型的发现
-        projects = [d for d in discoveries if d.get("type") == "project_found"]
+        projects = [d for d in store.iter_records() if d.get("type") == "project_found"]
 
         if not projects:
             console.print("[yellow]还没有发现任何项目[/yellow]")
@@ -351,34 +345,25 @@ def register(app: typer.Typer):
         count: int = typer.Option(10, "--count", "-n", help="显示数量"),
     ):
         """💡 查看 Jarvis 的发现"""
-        discoveries_path = get_discoveries_path()
+        store = open_discovery_store()
 
-        if not discoveries_path.exists():
+        if store is None:
             console.print("[yellow]还没有任何发现[/yellow]")
             return
 
         try:
-            with open(discoveries_path, "r") as f:
-                data = json.load(f)
-
-            all_discoveries = data.get("discoveries", [])
-
             if ack:
-                for d in all_discoveries:
-                    d["acknowledged"] = True
-                with open(discoveries_path, "w") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                store.acknowledge_all()
                 console.print("[green]✅ 所有发现已标记为已阅读[/green]")
                 return
 
             if today:
-                today_date = datetime.now().date()
-                filtered = [
-                    d for d in all_discoveries
-                    if datetime.fromisoformat(d.get("timestamp", "2000-01-01")).date() == today_date
-                ]
+                filtered = list(store.iter_records(today_only=True))
+                unacked = sum(1 for d in filtered if not d.get("acknowledged"))
+                filtered = filtered[:count]
             else:
-                filtered = all_discoveries
+                filtered = list(islice(store.iter_records(), count))
+                unacked = store.unread_count()
 
             if not filtered:
                 console.print("[yellow]没有发现[/yellow]")
@@ -391,7 +376,7 @@ def register(app: typer.Typer):
             table.add_column("内容", width=40)
             table.add_column("状态", width=4)
 
-            for d in filtered[:count]:
+            for d in filtered:
                 ts = datetime.fromisoformat(d.get("timestamp", datetime.now().isoformat()))
                 time_str = ts.strftime("%m/%d %H:%M")
                 stars = "⭐" * d.get("importance", 3)
@@ -402,7 +387,6 @@ def register(app: typer.Typer):
 
             console.print(table)
 
-            unacked = sum(1 for d in filtered if not d.get("acknowledged"))
             if unacked > 0:
                 console.print(f"\n[dim]{unacked} 条未阅读。使用 [bold]jarvis discoveries --ack[/bold] 标记全部已读[/dim]")
 
@@ -4,6 +4,7 @@ Jarvis CLI — 记忆相关命令
 import json
 import re
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Optional
 
 import typer
@@ -12,12 +13,65 @@ from rich.table import Table
 
 from .common import (
     console, JARVIS_HOME,
-    get_config_path, ensure_jarvis_home, load_llm_config,
+    get_config_path, get_llm_cache_path, ensure_jarvis_home, load_llm_config,
+    load_memory_config,
 )
 
 
 # ── 内部实现 ──────────────────────────────────────────────
 
+# recall 片段的命中标记（控制字符不会与 rich 标记冲突）
+_MARKS = ("\x02", "\x03")
+
+
+def _format_snippet(snippet: str) -> str:
+    """把命中标记转换成 rich 高亮"""
+    from rich.markup import escape
+
+    return (
+        escape(" ".join(snippet.split()))
+        .replace(_MARKS[0], "[bold yellow]")
+        .replace(_MARKS[1], "[/bold yellow]")
+    )
+
+
+def _content_hits(index, query: str, limit: int = 5) -> list:
+    """
+    检索 Markdown 全文索引（按索引现状，不写记忆目录）
+
+    索引由 daemon 心跳增量更新；需要立即生效时运行 jarvis memory reindex
+    """
+    from ..memory import ContentIndexer
+
+    indexer = ContentIndexer(index, JARVIS_HOME / "memory")
+    return indexer.search(query, limit=limit, marks=_MARKS)
+
+
+def _print_content_hits(hits: list):
+    """打印全文命中（文件:行号 + 片段）"""
+    from rich.markup import escape
+
+    console.print("\n[bold]📄 全文命中:[/bold]")
+    for hit in hits:
+        path = Path(hit.path)
+        console.print(f"  • [cyan]{path.parent.name}/{path.name}:{hit.line}[/cyan] [dim]{escape(hit.heading)}[/dim]")
+        console.print(f"      {_format_snippet(hit.snippet)}")
+
+
+def _open_vector_index(index):
+    """配置启用且 numpy 可用时打开语义索引（并补齐缺失的向量），否则返回 None"""
+    from ..memory.vector_index import HAS_NUMPY, VectorIndex, load_embedder
+
+    config = load_memory_config()
+    if not config.get("vector_index") or not HAS_NUMPY:
+        return None
+    vectors = VectorIndex(
+        index, JARVIS_HOME / "vectors.f32", load_embedder(config.get("embedding_model", "hashing"))
+    )
+    vectors.sync()
+    return vectors
+
+
 def _do_recall(query: Optional[str] = None):
     """搜索记忆"""
     from ..memory import MemoryIndex
@@ -49,9 +103,14 @@ def _do_recall(query: Optional[str] = None):
                 console.print(f"     {tags_str}")
     else:
         console.print(f"\n[bold]🔍 搜索: [cyan]{query}[/cyan][/bold]\n")
-        results = index.recall(query, limit=10)
+        vectors = _open_vector_index(index)
+        if vectors:
+            results = vectors.hybrid(query, limit=10, marks=_MARKS)
+        else:
+            results = index.rank(query, limit=10, marks=_MARKS)
+        hits = _content_hits(index, query)
 
-        if not results:
+        if not results and not hits:
             console.print("[yellow]未找到相关记忆[/yellow]")
             console.print("[dim]试试其他关键词？[/dim]")
             return
@@ -59,17 +118,22 @@ def _do_recall(query: Optional[str] = None):
         for i, r in enumerate(results, 1):
             stars = "⭐" * r.importance
             console.print(f"  {i}. [{r.date}] [bold]{r.title}[/bold] {stars}")
-            if r.summary:
+            if r.snippet:
+                console.print(f"      [dim]{_format_snippet(r.snippet)}[/dim]")
+            elif r.summary:
                 summary = r.summary[:80] + "..." if len(r.summary) > 80 else r.summary
                 console.print(f"      [dim]{summary}[/dim]")
 
-        console.print(f"\n[dim]共 {len(results)} 条相关记忆[/dim]")
+        if hits:
+            _print_content_hits(hits)
+
+        console.print(f"\n[dim]共 {len(results)} 条相关记忆，{len(hits)} 处全文命中[/dim]")
 
 
 def _do_think():
     """触发一次思考"""
     import httpx
-    from ..memory import MemoryIndex, MemoryWriter, MemoryEntry, IndexEntry
+    from ..memory import MemoryIndex, MemoryWriter, MemoryEntry, IndexEntry, LLMCache
 
     config_path = get_config_path()
     if not config_path.exists():
@@ -116,69 +180,77 @@ def _do_think():
 
 只返回 JSON 或 null。"""
 
+    # 与 Daemon 共用响应缓存
+    cache = LLMCache(get_llm_cache_path())
+
     # base_url 约定不含 /v1，代码中拼接完整路径
     try:
-        with httpx.Client(timeout=60.0, trust_env=False) as client:
-            response = client.post(
-                f"{base_url}/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {auth_token}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": model,
-                    "max_tokens": 1024,
-                    "messages": [{"role": "user", "content": prompt}],
-                },
+        result = cache.get(model, prompt)
+        if result is None:
+            with httpx.Client(timeout=60.0, trust_env=False) as client:
+                response = client.post(
+                    f"{base_url}/v1/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {auth_token}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": model,
+                        "max_tokens": 1024,
+                        "messages": [{"role": "user", "content": prompt}],
+                    },
+                )
+                response.raise_for_status()
+                data = response.json()
+                result = data["choices"][0]["message"]["content"]
+            cache.put(model, prompt, result)
+        result = result.strip()
+
+        if result.lower() == "null":
+            console.print("[dim]💤 没有特别的洞察，一切安好[/dim]")
+            return
+
+        json_match = re.search(r'\{[^}]+\}', result, re.DOTALL)
+        if json_match:
+            insight = json.loads(json_match.group())
+
+            stars = "⭐" * insight.get("importance", 3)
+            console.print(Panel(
+                f"[bold]{insight.get('title', '洞察')}[/bold] {stars}\n\n"
+                f"{insight.get('content', '')}\n\n"
+                f"[dim]建议: {insight.get('suggested_action', '无')}[/dim]",
+                title="💡 Jarvis 的洞察",
+                border_style="cyan",
+            ))
+
+            writer = MemoryWriter(memory_path)
+            entry = MemoryEntry(
+                timestamp=datetime.now(),
+                title=insight.get("title", "思考"),
+                content=insight.get("content", ""),
+                importance=insight.get("importance", 3),
+                entry_type="insight",
             )
-            response.raise_for_status()
-            data = response.json()
-            result = data["choices"][0]["message"]["content"].strip()
-
-            if result.lower() == "null":
-                console.print("[dim]💤 没有特别的洞察，一切安好[/dim]")
-                return
-
-            json_match = re.search(r'\{[^}]+\}', result, re.DOTALL)
-            if json_match:
-                insight = json.loads(json_match.group())
-
-                stars = "⭐" * insight.get("importance", 3)
-                console.print(Panel(
-                    f"[bold]{insight.get('title', '洞察')}[/bold] {stars}\n\n"
-                    f"{insight.get('content', '')}\n\n"
-                    f"[dim]建议: {insight.get('suggested_action', '无')}[/dim]",
-                    title="💡 Jarvis 的洞察",
-                    border_style="cyan",
-                ))
-
-                writer = MemoryWriter(memory_path)
-                entry = MemoryEntry(
-                    timestamp=datetime.now(),
+            file_path = writer.append_to_daily(entry)
+            writer.flush()
+
+            if index_path.exists():
+                index = MemoryIndex(index_path)
+                index_entry = IndexEntry(
+                    id=f"i-{datetime.now().strftime('%Y%m%d')}-{hash(insight.get('title', ''))%10000:04d}",
+                    entry_type="insight",
+                    file_path=str(file_path),
+                    date=datetime.now().date().isoformat(),
                     title=insight.get("title", "思考"),
-                    content=insight.get("content", ""),
+                    tags=[],
                     importance=insight.get("importance", 3),
-                    entry_type="insight",
+                    summary=insight.get("content", "")[:200],
                 )
-                file_path = writer.append_to_daily(entry)
-
-                if index_path.exists():
-                    index = MemoryIndex(index_path)
-                    index_entry = IndexEntry(
-                        id=f"i-{datetime.now().strftime('%Y%m%d')}-{hash(insight.get('title', ''))%10000:04d}",
-                        entry_type="insight",
-                        file_path=str(file_path),
-                        date=datetime.now().date().isoformat(),
-                        title=insight.get("title", "思考"),
-                        tags=[],
-                        importance=insight.get("importance", 3),
-                        summary=insight.get("content", "")[:200],
-                    )
-                    index.add(index_entry)
-
-                console.print(f"\n[dim]已记录到: {file_path.name}[/dim]")
-            else:
-                console.print(f"[dim]思考结果: {result}[/dim]")
+                index.add(index_entry)
+
+            console.print(f"\n[dim]已记录到: {file_path.name}[/dim]")
+        else:
+            console.print(f"[dim]思考结果: {result}[/dim]")
 
     except Exception as e:
         console.print(f"[red]思考失败: {e}[/red]")
@@ -220,6 +292,48 @@ def _do_insights():
 
 # ── Typer 子命令 ──────────────────────────────────────────
 
+# memory 子命令组
+memory_app = typer.Typer(
+    name="memory",
+    help="🧠 记忆索引管理",
+    no_args_is_help=True,
+)
+
+
+@memory_app.command("reindex")
+def memory_reindex(
+    full: bool = typer.Option(False, "--full", "-f", help="忽略 mtime/哈希，全部重建"),
+):
+    """📄 增量更新 Markdown 全文索引"""
+    from ..memory import MemoryIndex, MemoryWriter, ContentIndexer
+
+    ensure_jarvis_home()
+    MemoryWriter(JARVIS_HOME / "memory").flush()
+    index = MemoryIndex(JARVIS_HOME / "index.db")
+    indexer = ContentIndexer(index, JARVIS_HOME / "memory")
+
+    stats = indexer.reindex(full=full)
+    files, sections = indexer.count()
+
+    vector_line = ""
+    vectors = _open_vector_index(index)
+    if vectors:
+        vector_line = f"\n语义向量: {vectors.count()} 条（{vectors.embedder.name}）"
+
+    console.print(Panel(
+        f"扫描: {stats.files_scanned} 个文件\n"
+        f"重建: {stats.files_indexed} 个（{stats.sections} 段）\n"
+        f"未变化: {stats.files_scanned - stats.files_indexed - stats.files_touched} 个"
+        f"（仅 mtime 变化 {stats.files_touched} 个）\n"
+        f"删除: {stats.files_removed} 个\n"
+        f"读取: {stats.bytes_read / 1024:.1f} KB，用时 {stats.seconds * 1000:.0f} ms\n"
+        f"吞吐: {stats.files_per_second:.0f} 文件/秒，{stats.mb_per_second:.1f} MB/秒\n"
+        f"索引总量: {files} 个文件，{sections} 段{vector_line}",
+        title="📄 全文索引",
+        border_style="cyan",
+    ))
+
+
 def register(app: typer.Typer):
     """注册记忆相关子命令"""
 
@@ -228,6 +342,7 @@ def register(app: typer.Typer):
         query: Optional[str] = typer.Argument(None, help="搜索关键词"),
         limit: int = typer.Option(10, "-n", "--limit", help="结果数量"),
         important: bool = typer.Option(False, "-i", "--important", help="只显示重要记忆(⭐⭐⭐+)"),
+        tag: Optional[str] = typer.Option(None, "-t", "--tag", help="按标签过滤"),
     ):
         """🧠 搜索记忆"""
         from ..memory import MemoryIndex
@@ -240,10 +355,22 @@ def register(app: typer.Typer):
             raise typer.Exit(0)
 
         index = MemoryIndex(index_path)
+        hits = []
 
-        if query:
+        if tag:
+            console.print(f"\n[bold]🏷️  标签: [cyan]#{tag}[/cyan][/bold]\n")
+            results = index.search(query=query, tags=[tag], limit=limit)
+        elif query:
             console.print(f"\n[bold]🔍 搜索: [cyan]{query}[/cyan][/bold]\n")
-            results = index.recall(query, limit=limit)
+            vectors = _open_vector_index(index)
+            if vectors:
+                results = vectors.hybrid(query, limit=limit, marks=_MARKS)
+            else:
+                results = index.rank(query, limit=limit, marks=_MARKS)
+            hits = _content_hits(index, query, limit=limit)
+            if not results and hits:
+                _print_content_hits(hits)
+                raise typer.Exit(0)
         elif important:
             console.print("\n[bold]⭐ 重要记忆:[/bold]\n")
             results = index.get_important(min_importance=3, limit=limit)
@@ -263,10 +390,15 @@ def register(app: typer.Typer):
 
         for r in results:
             stars = "⭐" * r.importance
-            summary = r.summary[:40] + "..." if r.summary and len(r.summary) > 40 else (r.summary or "")
+            if r.snippet:
+                summary = _format_snippet(r.snippet)
+            else:
+                summary = r.summary[:40] + "..." if r.summary and len(r.summary) > 40 else (r.summary or "")
             table.add_row(r.date, r.title, stars, summary)
 
         console.print(table)
+        if hits:
+            _print_content_hits(hits)
         console.print(f"\n[dim]共 {len(results)} 条记忆[/dim]")
 
     @app.command()
@@ -309,3 +441,35 @@ def register(app: typer.Typer):
                 console.print(f"      [dim]{summary}[/dim]")
 
         console.print(f"\n[dim]共 {len(results)} 条记录[/dim]")
+
+    @app.command()
+    def tags(
+        limit: int = typer.Option(20, "-n", "--limit", help="显示前 N 个标签"),
+    ):
+        """🏷️  查看最常用的记忆标签"""
+        from ..memory import MemoryIndex
+
+        ensure_jarvis_home()
+        index_path = JARVIS_HOME / "index.db"
+
+        if not index_path.exists():
+            console.print("[yellow]💭 记忆索引尚未创建[/yellow]")
+            raise typer.Exit(0)
+
+        counts = MemoryIndex(index_path).tag_counts(limit=limit)
+        if not counts:
+            console.print("[yellow]暂无标签[/yellow]")
+            raise typer.Exit(0)
+
+        table = Table(box=None, padding=(0, 1))
+        table.add_column("标签", style="cyan")
+        table.add_column("次数", justify="right")
+        for name, n in counts:
+            table.add_row(f"#{name}", str(n))
+
+        console.print(f"\n[bold]🏷️  最常用的 {len(counts)} 个标签:[/bold]\n")
+        console.print(table)
+        console.print("\n[dim]使用 [bold]jarvis recall --tag <标签>[/bold] 查看相关记忆[/dim]")
+
+    # 注册 memory 子命令组
+    app.add_typer(memory_app, name="memory")
@@ -0,0 +1,240 @@
+"""
+文件变化合并管线
+
+watchdog 在 git checkout / npm install 时一次会产生成千上万个事件，
+逐条保存再截断只会丢掉大部分信息。这里改为：
+
+- 合并: 同一路径的多次事件折叠为一条净变化（created + modified → created）
+- 去抖: 事件停止 quiet_seconds 后才交出一批（持续不断时最多等 max_wait_seconds）
+- 聚合: 按目录、扩展名、动作计数，超出跟踪上限的路径只计入聚合
+"""
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+# 同一路径先后两个动作合并后的净动作；None 表示相互抵消（临时文件）
+_MERGE = {
+    ("created", "modified"): "created",
+    ("created", "deleted"): None,
+    ("modified", "modified"): "modified",
+    ("modified", "deleted"): "deleted",
+    ("modified", "created"): "modified",
+    ("deleted", "created"): "modified",
+    ("deleted", "modified"): "modified",
+    ("deleted", "deleted"): "deleted",
+    ("created", "created"): "created",
+}
+
+
+@dataclass
+class FileChange:
+    """一个路径在本批次内的净变化"""
+    path: str
+    action: str  # created | modified | deleted
+    count: int = 1  # 合并的原始事件数
+    first_seen: datetime = field(default_factory=datetime.now)
+    last_seen: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> dict:
+        return {
+            "action": self.action,
+            "path": self.path,
+            "count": self.count,
+            "timestamp": self.last_seen.isoformat(),
+        }
+
+
+@dataclass
+class ChangeBatch:
+    """一批合并后的变化 + 全量聚合计数"""
+    changes: list[FileChange] = field(default_factory=list)  # 按事件数降序
+    raw_events: int = 0
+    transient: int = 0  # 创建后又删除、已抵消的路径数
+    by_action: Counter = field(default_factory=Counter)
+    by_directory: Counter = field(default_factory=Counter)
+    by_extension: Counter = field(default_factory=Counter)
+
+    @property
+    def total_files(self) -> int:
+        """涉及的文件数（含超出跟踪上限、只计入聚合的部分）"""
+        return sum(self.by_action.values())
+
+    def __len__(self) -> int:
+        return self.total_files
+
+    def __bool__(self) -> bool:
+        return self.total_files > 0
+
+    def paths(self, limit: Optional[int] = None) -> list[str]:
+        return [c.path for c in self.changes[:limit]]
+
+    def to_prompt(self, max_files: int = 20, max_groups: int = 8) -> str:
+        """
+        给 LLM 的摘要：大小有上限，但聚合计数覆盖整批变化
+        """
+        actions = "，".join(
+            f"{name} {self.by_action[key]}"
+            for key, name in (("created", "新建"), ("modified", "修改"), ("deleted", "删除"))
+            if self.by_action[key]
+        )
+        lines = [f"共 {self.total_files} 个文件（{actions}），原始事件 {self.raw_events} 个"]
+        if self.transient:
+            lines[0] += f"，另有 {self.transient} 个临时文件创建后即删除"
+
+        if len(self.by_directory) > 1:
+            lines.append("\n按目录:")
+            lines.extend(_format_counter(self.by_directory, max_groups))
+        if self.by_extension:
+            lines.append("\n按类型:")
+            lines.extend(_format_counter(self.by_extension, max_groups))
+
+        lines.append("\n文件:")
+        for c in self.changes[:max_files]:
+            times = f" ×{c.count}" if c.count > 1 else ""
+            lines.append(f"- [{c.action}] {c.path}{times}")
+        rest = self.total_files - min(len(self.changes), max_files)
+        if rest > 0:
+            lines.append(f"- ……另有 {rest} 个文件（已计入上方统计）")
+        return "\n".join(lines)
+
+
+def _format_counter(counter: Counter, limit: int) -> list[str]:
+    lines = [f"- {key}: {n}" for key, n in counter.most_common(limit)]
+    if len(counter) > limit:
+        rest = sum(n for _, n in counter.most_common()[limit:])
+        lines.append(f"- 其他 {len(counter) - limit} 组: {rest}")
+    return lines
+
+
+class ChangeCoalescer:
+    """
+    线程安全的变化合并器
+
+    watchdog 子线程调用 record()，主线程调用 drain()。
+    """
+
+    def __init__(
+        self,
+        roots: Optional[list[str]] = None,
+        quiet_seconds: float = 2.0,
+        max_wait_seconds: float = 30.0,
+        max_tracked_paths: int = 2000,
+        directory_depth: int = 2,
+    ):
+        self.roots = [os.path.abspath(r) for r in (roots or [])]
+        self.quiet_seconds = quiet_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.max_tracked_paths = max_tracked_paths
+        self.directory_depth = directory_depth
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pending: dict[str, FileChange] = {}
+        self._overflow: dict[str, str] = {}  # 超出跟踪上限的路径 → 最后动作
+        self._raw_events = 0
+        self._transient = 0
+        self._first_event: Optional[float] = None
+        self._last_event: Optional[float] = None
+
+    # ── 写入（watchdog 线程）──────────────────────────────
+
+    def record(self, action: str, path: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._raw_events += 1
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+
+            existing = self._pending.get(path)
+            if existing is None:
+                if path in self._overflow:
+                    merged = _MERGE.get((self._overflow[path], action), action)
+                    if merged is None:
+                        del self._overflow[path]
+                        self._transient += 1
+                    else:
+                        self._overflow[path] = merged
+                elif len(self._pending) < self.max_tracked_paths:
+                    self._pending[path] = FileChange(path=path, action=action)
+                else:
+                    self._overflow[path] = action
+                return
+
+            merged = _MERGE.get((existing.action, action), action)
+            if merged is None:
+                del self._pending[path]
+                self._transient += 1
+                return
+            existing.action = merged
+            existing.count += 1
+            existing.last_seen = datetime.now()
+
+    # ── 读取（主线程）──────────────────────────────────────
+
+    def pending(self) -> int:
+        """尚未交出的原始事件数"""
+        with self._lock:
+            return self._raw_events
+
+    def settle_delay(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        距离这批变化可以交出还要等多久（秒）
+
+        事件已安静 quiet_seconds，或这批变化已等待超过 max_wait_seconds 时为 0；
+        没有待处理事件时返回 None。
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._last_event is None:
+                return None
+            return max(0.0, min(
+                self._last_event + self.quiet_seconds - now,
+                self._first_event + self.max_wait_seconds - now,
+            ))
+
+    def is_settled(self, now: Optional[float] = None) -> bool:
+        return self.settle_delay(now) == 0.0
+
+    def drain(self, force: bool = False) -> ChangeBatch:
+        """
+        交出当前批次并清空。
+
+        仍在突发中（未 settle）时返回空批次，除非 force=True。
+        """
+        if not force and not self.is_settled():
+            return ChangeBatch()
+
+        with self._lock:
+            pending, overflow = self._pending, self._overflow
+            raw_events, transient = self._raw_events, self._transient
+            self._reset()
+
+        batch = ChangeBatch(
+            changes=sorted(pending.values(), key=lambda c: (-c.count, c.path)),
+            raw_events=raw_events,
+            transient=transient,
+        )
+        for path, action in [(c.path, c.action) for c in pending.values()] + list(overflow.items()):
+            batch.by_action[action] += 1
+            batch.by_directory[self._directory_key(path)] += 1
+            batch.by_extension[os.path.splitext(path)[1].lower() or "(无扩展名)"] += 1
+        return batch
+
+    def _directory_key(self, path: str) -> str:
+        """相对监控根目录的前 directory_depth 级目录"""
+        parent = os.path.dirname(os.path.abspath(path))
+        for root in self.roots:
+            if parent == root or parent.startswith(root + os.sep):
+                rel = os.path.relpath(parent, root)
+                if rel == ".":
+                    return os.path.basename(root) or root
+                parts = rel.split(os.sep)[: self.directory_depth]
+                return os.path.join(os.path.basename(root), *parts)
+        return parent
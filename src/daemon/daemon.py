@@ -14,7 +14,7 @@ import json
 import os
 import sys
 import signal
-import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
@@ -36,9 +36,14 @@ except ImportError:
     HAS_HTTPX = False
     print("[Daemon] 警告: httpx 未安装，LLM 调用功能将不可用")
 
-from .discovery import Discovery, DiscoveryType, DiscoveryStore
+from .changes import ChangeBatch, ChangeCoalescer
+from .discovery import Discovery, DiscoveryType, DiscoveryStore, SQLiteDiscoveryStore
+from .state import LifeSigns, StateWriter
+from ..utils.write_queue import WriteBehindQueue
+from ..explorer.ignore import IGNORE_FILES, IgnoreMatcher, plan_watches
 from .notifier import Notifier, NotificationConfig
-from ..memory import MemoryWriter, MemoryEntry, MemoryIndex, IndexEntry
+from ..memory import MemoryWriter, MemoryEntry, MemoryIndex, IndexEntry, ContentIndexer, LLMCache
+from ..memory.vector_index import HAS_NUMPY, VectorIndex, entry_text, load_embedder
 from ..evolution.pattern_detector import PatternDetector
 from ..evolution.preference_learner import PreferenceLearner
 
@@ -47,8 +52,17 @@ from ..evolution.preference_learner import PreferenceLearner
 class DaemonConfig:
     """Daemon 配置"""
     # 思考间隔
-    think_interval_seconds: int = 60       # 测试：1分钟
-    self_reflect_interval_seconds: int = 3600  # 无变化时自省：1小时
+    think_interval_seconds: int = 60       # 两次变化分析的最小间隔
+    self_reflect_interval_seconds: int = 3600  # 定时自省：1小时
+    heartbeat_interval_seconds: int = 60   # 写 state.json 的心跳间隔
+    content_reindex_max_files: int = 20    # 每次心跳最多重建多少个 Markdown 文件的全文索引
+    write_batch_size: int = 64             # 发现写入队列每批最多提交的条数
+    write_batch_delay_seconds: float = 0.5 # 攒批最多等待的时间
+    status_record: bool = True             # 同时维护 mmap 状态记录 state.bin
+    
+    # 文件变化去抖：安静 N 秒后才分析，持续变化时最多等 M 秒
+    change_quiet_seconds: float = 2.0
+    change_max_wait_seconds: float = 30.0
     
     # 监控路径
     watch_paths: list[str] = field(default_factory=list)
@@ -59,11 +73,22 @@ class DaemonConfig:
     llm_auth_token: str = "Powered by Agent Maestro"
     llm_model: str = "claude-sonnet-4"
     
+    # LLM 响应缓存（相同 prompt 在 TTL 内不重复调用）
+    llm_cache_ttl_seconds: int = 3600
+    llm_cache_max_entries: int = 500
+    
     # 通知配置
     notification_terminal: bool = True
     notification_macos: bool = True
     notification_min_importance: int = 3
     
+    # 发现存储："sqlite"（index.db 的 discoveries 表）或 "jsonl"（追加日志）
+    discovery_backend: str = "sqlite"
+    
+    # 语义向量索引（需要 numpy）：embedding_model 为 "hashing" 或本地 sentence-transformers 模型名
+    vector_index: bool = False
+    embedding_model: str = "hashing"
+    
     # 存储路径
     jarvis_home: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis"))
     
@@ -80,11 +105,23 @@ class DaemonConfig:
             return cls(
                 think_interval_seconds=data.get("daemon", {}).get("think_interval_seconds", 60),
                 self_reflect_interval_seconds=data.get("daemon", {}).get("self_reflect_interval", 3600),
+                heartbeat_interval_seconds=data.get("daemon", {}).get("heartbeat_interval_seconds", 60),
+                content_reindex_max_files=data.get("daemon", {}).get("content_reindex_max_files", 20),
+                write_batch_size=data.get("daemon", {}).get("write_batch_size", 64),
+                write_batch_delay_seconds=data.get("daemon", {}).get("write_batch_delay_seconds", 0.5),
+                status_record=data.get("daemon", {}).get("status_record", True),
+                change_quiet_seconds=data.get("daemon", {}).get("change_quiet_seconds", 2.0),
+                change_max_wait_seconds=data.get("daemon", {}).get("change_max_wait_seconds", 30.0),
+                discovery_backend=data.get("daemon", {}).get("discovery_backend", "sqlite"),
                 watch_paths=data.get("watch_paths", []),
                 llm_provider=data.get("llm", {}).get("provider", "openai"),
                 llm_base_url=data.get("llm", {}).get("base_url", "http://localhost:23335/api/openai"),
                 llm_auth_token=data.get("llm", {}).get("auth_token", "Powered by Agent Maestro"),
                 llm_model=data.get("llm", {}).get("model", "claude-sonnet-4"),
+                llm_cache_ttl_seconds=data.get("llm", {}).get("cache_ttl_seconds", 3600),
+                llm_cache_max_entries=data.get("llm", {}).get("cache_max_entries", 500),
+                vector_index=data.get("memory", {}).get("vector_index", False),
+                embedding_model=data.get("memory", {}).get("embedding_model", "hashing"),
                 notification_terminal=data.get("notification", {}).get("terminal", True),
                 notification_macos=data.get("notification", {}).get("macos_notification", True),
                 notification_min_importance=data.get("notification", {}).get("min_importance", 3),
@@ -105,12 +142,26 @@ class DaemonConfig:
             "daemon": {
                 "think_interval_seconds": self.think_interval_seconds,
                 "self_reflect_interval": self.self_reflect_interval_seconds,
+                "heartbeat_interval_seconds": self.heartbeat_interval_seconds,
+                "content_reindex_max_files": self.content_reindex_max_files,
+                "write_batch_size": self.write_batch_size,
+                "write_batch_delay_seconds": self.write_batch_delay_seconds,
+                "status_record": self.status_record,
+                "change_quiet_seconds": self.change_quiet_seconds,
+                "change_max_wait_seconds": self.change_max_wait_seconds,
+                "discovery_backend": self.discovery_backend,
             },
             "watch_paths": self.watch_paths,
             "llm": {
                 "base_url": self.llm_base_url,
                 "auth_token": self.llm_auth_token,
                 "model": self.llm_model,
+                "cache_ttl_seconds": self.llm_cache_ttl_seconds,
+                "cache_max_entries": self.llm_cache_max_entries,
+            },
+            "memory": {
+                "vector_index": self.vector_index,
+                "embedding_model": self.embedding_model,
             },
             "notification": {
                 "terminal": self.notification_terminal,
@@ -123,69 +174,23 @@ class DaemonConfig:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
 
-@dataclass
-class LifeSigns:
-    """生命体征"""
-    status: str = "running"  # running, resting, stopped
-    last_heartbeat: datetime = field(default_factory=datetime.now)
-    discoveries_today: int = 0
-    important_discoveries_today: int = 0
-    active_skills: int = 0
-    started_at: datetime = field(default_factory=datetime.now)
-    
-    def to_dict(self) -> dict:
-        return {
-            "status": self.status,
-            "last_heartbeat": self.last_heartbeat.isoformat(),
-            "discoveries_today": self.discoveries_today,
-            "important_discoveries_today": self.important_discoveries_today,
-            "active_skills": self.active_skills,
-            "started_at": self.started_at.isoformat(),
-        }
-    
-    def save(self, path: str):
-        """保存状态"""
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
-    
-    @classmethod
-    def load(cls, path: str) -> "LifeSigns":
-        """加载状态"""
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return cls(
-                status=data.get("status", "stopped"),
-                last_heartbeat=datetime.fromisoformat(data["last_heartbeat"]),
-                discoveries_today=data.get("discoveries_today", 0),
-                important_discoveries_today=data.get("important_discoveries_today", 0),
-                active_skills=data.get("active_skills", 0),
-                started_at=datetime.fromisoformat(data.get("started_at", datetime.now().isoformat())),
-            )
-        except (FileNotFoundError, json.JSONDecodeError, KeyError):
-            return cls()
-
-
 class JarvisEventHandler(FileSystemEventHandler):
     """文件系统事件处理器"""
     
     def __init__(self, daemon: "JarvisDaemon"):
         super().__init__()
         self.daemon = daemon
-        self._recent_changes: list[dict] = []
-        self._lock = threading.Lock()  # watchdog 回调在子线程，需要线程安全
-        self._ignore_patterns = [
-            ".git", "__pycache__", ".DS_Store", "node_modules",
-            ".pyc", ".pyo", ".swp", ".swo", "~"
-        ]
+        # watchdog 回调在子线程，合并器内部加锁
+        self._coalescer = ChangeCoalescer(
+            roots=daemon.config.watch_paths,
+            quiet_seconds=daemon.config.change_quiet_seconds,
+            max_wait_seconds=daemon.config.change_max_wait_seconds,
+        )
+        self._matcher = daemon.ignore_matcher
     
     def _should_ignore(self, path: str) -> bool:
-        """检查是否应该忽略"""
-        for pattern in self._ignore_patterns:
-            if pattern in path:
-                return True
-        return False
+        """检查是否应该忽略（预编译的 gitignore 规则）"""
+        return self._matcher.is_ignored(path)
     
     def on_modified(self, event: "FileSystemEvent"):
         if event.is_directory or self._should_ignore(event.src_path):
@@ -193,33 +198,50 @@ class JarvisEventHandler(FileSystemEventHandler):
         self._record_change("modified", event.src_path)
     
     def on_created(self, event: "FileSystemEvent"):
-        if event.is_directory or self._should_ignore(event.src_path):
+        if event.is_directory:
+            self.daemon._on_directory_created(event.src_path)
+            return
+        if self._should_ignore(event.src_path):
             return
         self._record_change("created", event.src_path)
     
     def on_deleted(self, event: "FileSystemEvent"):
-        if event.is_directory or self._should_ignore(event.src_path):
+        if event.is_directory:
+            self.daemon._on_directory_deleted(event.src_path)
+            return
+        if self._should_ignore(event.src_path):
             return
         self._record_change("deleted", event.src_path)
     
+    def on_moved(self, event: "FileSystemEvent"):
+        """重命名 = 删除旧路径 + 新建新路径（git checkout 大量使用）"""
+        if event.is_directory:
+            self.daemon._on_directory_deleted(event.src_path)
+            self.daemon._on_directory_created(event.dest_path)
+            return
+        if not self._should_ignore(event.src_path):
+            self._record_change("deleted", event.src_path)
+        if not self._should_ignore(event.dest_path):
+            self._record_change("created", event.dest_path)
+    
     def _record_change(self, action: str, path: str):
-        """记录变化（watchdog 子线程调用，需要加锁）"""
-        with self._lock:
-            self._recent_changes.append({
-                "action": action,
-                "path": path,
-                "timestamp": datetime.now().isoformat()
-            })
-            # 只保留最近 50 条
-            if len(self._recent_changes) > 50:
-                self._recent_changes = self._recent_changes[-50:]
-    
-    def get_and_clear_changes(self) -> list[dict]:
-        """获取并清空变化记录（主线程调用，需要加锁）"""
-        with self._lock:
-            changes = self._recent_changes.copy()
-            self._recent_changes = []
-        return changes
+        """记录变化（watchdog 子线程调用）"""
+        if os.path.basename(path) in IGNORE_FILES:
+            self._matcher.load_dir(os.path.dirname(path), reload=True)
+        self._coalescer.record(action, path)
+        self.daemon._signal_change()
+    
+    def settle_delay(self) -> Optional[float]:
+        """距离当前这批变化安静下来还要多久；没有变化时为 None"""
+        return self._coalescer.settle_delay()
+    
+    def get_and_clear_changes(self, force: bool = False) -> ChangeBatch:
+        """
+        取出合并后的变化批次（主线程调用）
+        
+        仍在突发中时返回空批次，等安静下来再一起分析。
+        """
+        return self._coalescer.drain(force=force)
 
 
 class JarvisDaemon:
@@ -229,6 +251,15 @@ class JarvisDaemon:
     🫀 让 Jarvis 真正"活"起来
     """
     
+    # 每条发现最多关联的源文件数
+    MAX_SOURCE_FILES = 50
+    
+    # 文件监控的内置忽略规则（gitignore 语法，另读取 .gitignore / .jarvisignore）
+    WATCH_IGNORE_PATTERNS = [
+        ".git/", "__pycache__/", ".DS_Store", "node_modules/",
+        "*.pyc", "*.pyo", "*.swp", "*.swo", "*~",
+    ]
+    
     def __init__(self, config: Optional[DaemonConfig] = None):
         self.config = config or DaemonConfig.load()
         self.alive = False
@@ -241,15 +272,41 @@ class JarvisDaemon:
             min_importance=self.config.notification_min_importance,
         ))
         
-        discoveries_path = os.path.join(self.config.jarvis_home, "discoveries.json")
-        self.discovery_store = DiscoveryStore(discoveries_path)
-        
         # 🆕 Phase 2: 混合记忆系统
         # Markdown 存内容，SQLite 做索引
         memory_path = Path(self.config.jarvis_home) / "memory"
         index_path = Path(self.config.jarvis_home) / "index.db"
         self.memory_writer = MemoryWriter(memory_path)
         self.memory_index = MemoryIndex(index_path)
+        self.content_indexer = ContentIndexer(self.memory_index, memory_path)
+        self.vector_index = None
+        if self.config.vector_index:
+            if HAS_NUMPY:
+                self.vector_index = VectorIndex(
+                    self.memory_index,
+                    Path(self.config.jarvis_home) / "vectors.f32",
+                    load_embedder(self.config.embedding_model),
+                )
+            else:
+                print("[Daemon] 警告: numpy 未安装，语义索引不可用")
+        
+        discoveries_path = os.path.join(self.config.jarvis_home, "discoveries.jsonl")
+        if self.config.discovery_backend == "jsonl":
+            self.discovery_store = DiscoveryStore(discoveries_path)
+        else:
+            self.discovery_store = SQLiteDiscoveryStore(self.memory_index, import_path=discoveries_path)
+        # 发现的落盘在后台线程批量提交，事件循环不等磁盘
+        self.write_queue = WriteBehindQueue(
+            self._commit_discoveries,
+            max_batch=self.config.write_batch_size,
+            max_delay=self.config.write_batch_delay_seconds,
+        )
+        self._queue_batches_reported = 0
+        self.llm_cache = LLMCache(
+            Path(self.config.jarvis_home) / "llm_cache.db",
+            ttl_seconds=self.config.llm_cache_ttl_seconds,
+            max_entries=self.config.llm_cache_max_entries,
+        )
         
         # 🆕 Phase 4: 进化系统
         jarvis_home_path = Path(self.config.jarvis_home)
@@ -258,17 +315,27 @@ class JarvisDaemon:
         
         self.life_signs = LifeSigns()
         self._state_path = os.path.join(self.config.jarvis_home, "state.json")
+        self._state_writer: Optional[StateWriter] = None
         self._pid_path = os.path.join(self.config.jarvis_home, "daemon.pid")
         
         # Watchdog
         self._observer: Optional[Observer] = None
         self._event_handler: Optional[JarvisEventHandler] = None
+        self.ignore_matcher = IgnoreMatcher(self.WATCH_IGNORE_PATTERNS, roots=self.config.watch_paths)
+        self._watches: dict = {}  # 目录 → ObservedWatch
+        self._shallow_watches: set[str] = set()  # 非递归监控的目录
+        self._unsplittable_watches: set[str] = set()  # 拆分后监控点超上限、保持递归的目录
         
         # HTTP 客户端
         self._http_client: Optional[httpx.AsyncClient] = None
         
-        # 用于中断 sleep 的 task 引用
-        self._sleep_task: Optional[asyncio.Task] = None
+        # 调度：watchdog 线程通过 call_soon_threadsafe 设置 _wake 唤醒分析任务
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._change_signaled = False  # 本批事件是否已投递过唤醒
+        self._think_lock: Optional[asyncio.Lock] = None  # 变化分析与自省互斥
+        self._last_think = 0.0  # 上次变化分析的 monotonic 时间
+        self._tasks: list[asyncio.Task] = []
     
     async def start(self):
         """启动心跳"""
@@ -284,13 +351,28 @@ class JarvisDaemon:
         """)
         
         self.alive = True
-        self.life_signs = LifeSigns(status="running", started_at=datetime.now())
-        self.life_signs.save(self._state_path)
+        self.life_signs = LifeSigns(
+            status="running",
+            started_at=datetime.now(),
+            heartbeat_interval_seconds=self.config.heartbeat_interval_seconds,
+        )
+        self._state_writer = StateWriter(
+            self._state_path,
+            heartbeat_interval=self.config.heartbeat_interval_seconds,
+            status_record=self.config.status_record,
+        )
+        self._state_writer.write(self.life_signs, force=True)
+        self.write_queue.start()
         
         # 写入 PID 文件
         with open(self._pid_path, "w") as f:
             f.write(str(os.getpid()))
         
+        # 调度原语需在事件循环内创建
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._think_lock = asyncio.Lock()
+        
         # 启动文件监控
         self._start_file_watcher()
         
@@ -312,7 +394,7 @@ class JarvisDaemon:
         )
         
         try:
-            await self._think_loop()
+            await self._run()
         finally:
             await self.stop()
     
@@ -330,9 +412,25 @@ class JarvisDaemon:
         if self._http_client:
             await self._http_client.aclose()
         
+        # 排队中的发现全部落盘，再把发现索引、日志视图写到最新位置
+        await asyncio.to_thread(self.write_queue.close)
+        print(f"[Daemon] 写入队列: {self.write_queue.metrics().summary()}")
+        self.discovery_store.flush()
+        try:
+            self.memory_writer.flush()
+        except OSError as e:
+            print(f"[Daemon] 日志物化失败: {e}")
+        if self.vector_index:
+            self.vector_index.close()
+        self.memory_index.close()
+        
         # 更新状态
         self.life_signs.status = "stopped"
-        self.life_signs.save(self._state_path)
+        if self._state_writer:
+            self._state_writer.write(self.life_signs, force=True)
+            self._state_writer.close()
+        else:
+            self.life_signs.save(self._state_path)
         
         # 清理 PID 文件
         try:
@@ -341,15 +439,18 @@ class JarvisDaemon:
         except Exception:
             pass
         
+        stats = self.llm_cache.stats()
+        print(f"📦 LLM 缓存: 今日命中 {stats['hits']} 次 / 未命中 {stats['misses']} 次")
         print("👋 Jarvis 已休眠，随时可以唤醒")
     
     def _handle_signal_async(self):
         """处理系统信号（asyncio 兼容）"""
         print(f"\n[Daemon] 收到停止信号，正在优雅退出...")
         self.alive = False
-        # 取消 sleep task 使其立即退出
-        if self._sleep_task and not self._sleep_task.done():
-            self._sleep_task.cancel()
+        # 取消调度任务使其立即退出
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
     
     def _start_file_watcher(self):
         """启动文件监控"""
@@ -365,57 +466,208 @@ class JarvisDaemon:
         
         for path in self.config.watch_paths:
             if os.path.exists(path):
-                self._observer.schedule(self._event_handler, path, recursive=True)
-                print(f"[Daemon] 监控: {path}")
+                # 跳过被忽略的子树（node_modules 等），减少 inotify 监控数与事件量
+                plan = plan_watches(path, self.ignore_matcher)
+                for directory, recursive in plan:
+                    self._schedule_watch(directory, recursive)
+                print(f"[Daemon] 监控: {path}（{len(plan)} 个监控点）")
             else:
                 print(f"[Daemon] 警告: 路径不存在 {path}")
         
         self._observer.start()
     
+    def _schedule_watch(self, directory: str, recursive: bool):
+        watch = self._observer.schedule(self._event_handler, directory, recursive=recursive)
+        self._watches[directory] = watch
+        if not recursive:
+            self._shallow_watches.add(directory)
+    
+    def _on_directory_created(self, path: str):
+        """
+        新建目录时调整监控点（watchdog 线程调用）
+        
+        - 非递归监控的目录下新建了子目录：为它补一个监控点
+          （补监控之前已写入的文件按新建记录）
+        - 递归监控的子树里新建了被忽略的目录（npm install 的 node_modules 等）：
+          重新规划该监控点，不再递归监控被忽略的子树
+        """
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        if self.ignore_matcher.is_ignored(path, is_dir=True):
+            if parent not in self._shallow_watches:
+                self._replan_watch(parent, path)
+            return
+        if parent not in self._shallow_watches or not os.path.isdir(path):
+            return
+        try:
+            self._schedule_watch(path, recursive=True)
+        except OSError as e:
+            print(f"[Daemon] 无法监控新目录 {path}: {e}")
+            return
+        
+        for dirpath, dirnames, filenames in os.walk(path):
+            self.ignore_matcher.load_dir(dirpath)
+            dirnames[:] = [
+                d for d in dirnames
+                if not self.ignore_matcher.is_ignored(os.path.join(dirpath, d), is_dir=True)
+            ]
+            for name in filenames:
+                file_path = os.path.join(dirpath, name)
+                if not self.ignore_matcher.is_ignored(file_path):
+                    self._event_handler._record_change("created", file_path)
+    
+    def _replan_watch(self, directory: str, ignored: str):
+        """把覆盖 directory 的递归监控点按 plan_watches 拆开（先建新监控点再撤旧的）"""
+        root = directory
+        while root not in self._watches:
+            parent = os.path.dirname(root)
+            if parent == root:
+                return
+            root = parent
+        if root in self._shallow_watches or root in self._unsplittable_watches:
+            return
+        
+        plan = plan_watches(root, self.ignore_matcher)
+        if plan == [(root, True)]:
+            # 被忽略的目录还在却无法拆分：监控点超上限，保持递归监控
+            # （事件仍会被过滤），以后不再重试
+            if os.path.isdir(ignored):
+                self._unsplittable_watches.add(root)
+            return
+        
+        old = self._watches.pop(root)
+        for sub, recursive in plan:
+            try:
+                self._schedule_watch(sub, recursive)
+            except OSError as e:
+                print(f"[Daemon] 无法监控 {sub}: {e}")
+        try:
+            self._observer.unschedule(old)
+        except (KeyError, OSError):
+            pass
+        print(f"[Daemon] 出现被忽略的目录，重新规划监控: {root}（{len(plan)} 个监控点）")
+    
+    def _on_directory_deleted(self, path: str):
+        """被删除的目录如果有自己的监控点，一并移除"""
+        path = os.path.abspath(path)
+        watch = self._watches.pop(path, None)
+        self._shallow_watches.discard(path)
+        self._unsplittable_watches.discard(path)
+        if watch is not None and self._observer:
+            try:
+                self._observer.unschedule(watch)
+            except (KeyError, OSError):
+                pass
+    
+    async def _run(self):
+        """
+        调度器 - 心跳的核心
+        
+        三个独立任务，空闲时都在等待，不做轮询：
+        - 变化分析：等 watchdog 唤醒 → 安静期 → 最小间隔 → 分析
+        - 定时自省：每 self_reflect_interval_seconds 一次
+        - 心跳：每 heartbeat_interval_seconds 写一次 state.json
+        """
+        self._tasks = [
+            asyncio.ensure_future(self._think_loop()),
+            asyncio.ensure_future(self._reflect_loop()),
+            asyncio.ensure_future(self._heartbeat_loop()),
+        ]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass  # 收到停止信号
+        finally:
+            for task in self._tasks:
+                task.cancel()
+    
+    def _signal_change(self):
+        """有新的文件变化（watchdog 线程调用）：唤醒分析任务，同一批只投递一次"""
+        if self._change_signaled or self._loop is None:
+            return
+        self._change_signaled = True
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+    
     async def _think_loop(self):
-        """思考循环 - 心跳的核心"""
+        """变化分析任务"""
         while self.alive:
+            await self._wake.wait()
+            self._wake.clear()
+            self._change_signaled = False
+            
             try:
-                # 更新心跳时间
-                self.life_signs.last_heartbeat = datetime.now()
-                self.life_signs.save(self._state_path)
+                # 等这批变化安静下来，并与上次分析保持最小间隔
+                while self.alive and self._event_handler:
+                    settle = self._event_handler.settle_delay()
+                    if settle is None:
+                        break
+                    spacing = self._last_think + self.config.think_interval_seconds - time.monotonic()
+                    delay = max(settle, spacing)
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
                 
-                # 收集文件变化
-                changes = []
-                if self._event_handler:
-                    changes = self._event_handler.get_and_clear_changes()
+                if not self.alive or not self._event_handler:
+                    continue
+                changes = self._event_handler.get_and_clear_changes(force=True)
+                if not changes:
+                    continue
                 
-                discovery = None
-                
-                if changes:
-                    # 有变化时进行分析
-                    print(f"[Daemon] 检测到 {len(changes)} 个文件变化，开始分析...")
+                async with self._think_lock:
+                    self._last_think = time.monotonic()
+                    print(f"[Daemon] 检测到 {len(changes)} 个文件变化（{changes.raw_events} 个事件），开始分析...")
                     discovery = await self._think(changes)
-                else:
-                    # 检查是否需要自省
-                    time_since_reflect = datetime.now() - self._last_self_reflect
-                    if time_since_reflect.total_seconds() > self.config.self_reflect_interval_seconds:
-                        print("[Daemon] 触发定时自省...")
-                        discovery = await self._self_reflect()
-                        self._last_self_reflect = datetime.now()
-                
-                # 处理发现
-                if discovery:
-                    self._process_discovery(discovery)
-                
+                    if discovery:
+                        self._process_discovery(discovery)
+                self._save_life_signs()
             except Exception as e:
                 print(f"[Daemon] 思考循环错误: {e}")
+    
+    async def _reflect_loop(self):
+        """定时自省任务"""
+        while self.alive:
+            due = self._last_self_reflect + timedelta(seconds=self.config.self_reflect_interval_seconds)
+            await asyncio.sleep(max(0.0, (due - datetime.now()).total_seconds()))
             
-            # 等待下一次心跳（可被信号中断）
             try:
-                self._sleep_task = asyncio.ensure_future(
-                    asyncio.sleep(self.config.think_interval_seconds)
+                async with self._think_lock:
+                    print("[Daemon] 触发定时自省...")
+                    discovery = await self._self_reflect()
+                    if discovery:
+                        self._process_discovery(discovery)
+            except Exception as e:
+                print(f"[Daemon] 自省错误: {e}")
+            finally:
+                self._last_self_reflect = datetime.now()
+    
+    async def _heartbeat_loop(self):
+        """心跳任务：定期刷新生命体征，顺带物化日志并增量更新 Markdown 全文索引"""
+        while self.alive:
+            try:
+                self.life_signs.last_heartbeat = datetime.now()
+                self._state_writer.write(self.life_signs)
+            except Exception as e:
+                print(f"[Daemon] 心跳写入失败: {e}")
+            metrics = self.write_queue.metrics()
+            if metrics.batches != self._queue_batches_reported:
+                self._queue_batches_reported = metrics.batches
+                print(f"[Daemon] 写入队列: {metrics.summary()}")
+            try:
+                await asyncio.to_thread(self.memory_writer.flush)
+                stats = await asyncio.to_thread(
+                    self.content_indexer.reindex,
+                    max_files=self.config.content_reindex_max_files,
                 )
-                await self._sleep_task
-            except asyncio.CancelledError:
-                break  # 收到停止信号，退出循环
+                if stats.files_indexed or stats.files_removed:
+                    print(f"[Memory] 全文索引: {stats.summary()}")
+            except Exception as e:
+                print(f"[Daemon] 全文索引失败: {e}")
+            await asyncio.sleep(self.config.heartbeat_interval_seconds)
     
-    async def _think(self, changes: list[dict]) -> Optional[Discovery]:
+    async def _think(self, changes: ChangeBatch) -> Optional[Discovery]:
         """
         调用 Claude 分析文件变化
         
@@ -424,11 +676,8 @@ class JarvisDaemon:
         if not HAS_HTTPX or not self._http_client:
             return self._fallback_analysis(changes)
         
-        # 格式化变化列表
-        changes_text = "\n".join([
-            f"- [{c['action']}] {c['path']}"
-            for c in changes[:20]  # 最多 20 条
-        ])
+        # 合并后的变化摘要（文件列表有上限，统计覆盖全部变化）
+        changes_text = changes.to_prompt()
         
         prompt = f"""你是 Jarvis，Polly 的 AI 助手。你正在监控她的工作目录。
 
@@ -456,7 +705,7 @@ class JarvisDaemon:
 
         try:
             response = await self._call_claude(prompt)
-            return self._parse_discovery_response(response, changes)
+            return self._parse_discovery_response(response, changes.paths(self.MAX_SOURCE_FILES))
         except Exception as e:
             print(f"[Daemon] Claude 调用失败: {e}")
             return self._fallback_analysis(changes)
@@ -476,6 +725,9 @@ class JarvisDaemon:
         # Phase 4: 模式检测
         try:
             new_patterns = self.pattern_detector.detect_patterns()
+            if not new_patterns:
+                # 精确分组没有新模式时，本地聚类找近似重复
+                new_patterns = self.pattern_detector.detect_similar_patterns()
             if new_patterns:
                 pattern = new_patterns[0]
                 return Discovery(
@@ -520,6 +772,20 @@ class JarvisDaemon:
             return None
     
     async def _call_claude(self, prompt: str) -> str:
+        """
+        调用 LLM（先查响应缓存）
+        
+        签名与 evolution 模块的 llm_call 一致，可直接传入。
+        """
+        cached = self.llm_cache.get(self.config.llm_model, prompt)
+        if cached is not None:
+            return cached
+        
+        response = await self._request_llm(prompt)
+        self.llm_cache.put(self.config.llm_model, prompt, response)
+        return response
+    
+    async def _request_llm(self, prompt: str) -> str:
         """
         调用 LLM API（支持 OpenAI 和 Anthropic 格式）
         
@@ -559,7 +825,7 @@ class JarvisDaemon:
     def _parse_discovery_response(
         self,
         response: str,
-        changes: list[dict],
+        source_files: list[str],
         discovery_type: DiscoveryType = DiscoveryType.FILE_INSIGHT
     ) -> Optional[Discovery]:
         """解析 Claude 响应"""
@@ -578,14 +844,14 @@ class JarvisDaemon:
                 title=data.get("title", "新发现"),
                 content=data.get("content", ""),
                 importance=data.get("importance", 3),
-                source_files=[c["path"] for c in changes] if changes else [],
+                source_files=source_files,
                 suggested_action=data.get("suggested_action")
             )
         except (json.JSONDecodeError, KeyError) as e:
             print(f"[Daemon] 解析响应失败: {e}")
             return None
     
-    def _fallback_analysis(self, changes: list[dict]) -> Optional[Discovery]:
+    def _fallback_analysis(self, changes: ChangeBatch) -> Optional[Discovery]:
         """
         后备分析（当 LLM 不可用时）
         
@@ -595,16 +861,12 @@ class JarvisDaemon:
             return None
         
         # 统计变化类型
-        modified_count = sum(1 for c in changes if c["action"] == "modified")
-        created_count = sum(1 for c in changes if c["action"] == "created")
-        deleted_count = sum(1 for c in changes if c["action"] == "deleted")
+        modified_count = changes.by_action["modified"]
+        created_count = changes.by_action["created"]
+        deleted_count = changes.by_action["deleted"]
         
         # 分析文件类型
-        extensions = set()
-        for c in changes:
-            ext = os.path.splitext(c["path"])[1]
-            if ext:
-                extensions.add(ext)
+        extensions = [ext for ext, _ in changes.by_extension.most_common(8) if ext.startswith(".")]
         
         title = f"检测到 {len(changes)} 个文件变化"
         content = f"修改 {modified_count} 个，新建 {created_count} 个，删除 {deleted_count} 个。"
@@ -616,54 +878,79 @@ class JarvisDaemon:
             title=title,
             content=content,
             importance=2,
-            source_files=[c["path"] for c in changes]
+            source_files=changes.paths(self.MAX_SOURCE_FILES)
         )
     
+    def _save_life_signs(self):
+        """字段变化时立即写生命体征（内容未变且未到心跳间隔时 StateWriter 会跳过）"""
+        if not self._state_writer:
+            return
+        try:
+            self._state_writer.write(self.life_signs)
+        except Exception as e:
+            print(f"[Daemon] 状态写入失败: {e}")
+
     def _process_discovery(self, discovery: Discovery):
-        """处理发现"""
-        # 1. 保存到 discoveries.json（保持向后兼容）
-        self.discovery_store.add(discovery)
-        
-        # 2. 🆕 写入 Markdown 日志（编年体）
-        entry = MemoryEntry(
-            timestamp=discovery.timestamp,
-            title=discovery.title,
-            content=discovery.content,
-            importance=discovery.importance,
-            entry_type="discovery",
-            tags=discovery.source_files[:5] if discovery.source_files else None,
-        )
-        file_path = self.memory_writer.append_to_daily(entry)
-        
-        # 3. 🆕 添加到搜索索引
-        index_entry = IndexEntry(
-            id=discovery.id,
-            entry_type="discovery",
-            file_path=str(file_path),
-            date=discovery.timestamp.date().isoformat(),
-            title=discovery.title,
-            tags=discovery.source_files[:5] if discovery.source_files else [],
-            importance=discovery.importance,
-            summary=discovery.content[:200] if discovery.content else ""
-        )
-        self.memory_index.add(index_entry)
-        
-        # 4. 更新统计
+        """处理发现：更新统计后放入写入队列，落盘与通知在后台线程批量完成"""
         self.life_signs.discoveries_today += 1
         if discovery.importance >= 4:
             self.life_signs.important_discoveries_today += 1
-        
-        # 5. 发送通知
-        if discovery.importance >= self.config.notification_min_importance:
-            self.notifier.notify(
+        self._save_life_signs()
+        self.write_queue.submit(discovery)
+        print(f"[Daemon] 新发现: {discovery.title} (重要性: {discovery.importance})")
+    
+    def _commit_discoveries(self, batch: list[Discovery]):
+        """提交一批发现（写入队列的工作线程调用）"""
+        # 1. 🆕 写入 Markdown 日志（编年体），每个 segment 一次追加
+        file_paths = self.memory_writer.append_many([
+            MemoryEntry(
+                timestamp=discovery.timestamp,
                 title=discovery.title,
-                message=discovery.content,
+                content=discovery.content,
                 importance=discovery.importance,
-                subtitle=discovery.suggested_action
+                entry_type="discovery",
+                tags=discovery.source_files[:5] if discovery.source_files else None,
             )
+            for discovery in batch
+        ])
         
-        print(f"[Daemon] 新发现: {discovery.title} (重要性: {discovery.importance})")
-        print(f"[Daemon]   └─ 已记录到: {file_path.name}")
+        # 2. 🆕 搜索索引与发现存储：SQLite 后端在同一个事务里提交
+        index_entries = [
+            IndexEntry(
+                id=discovery.id,
+                entry_type="discovery",
+                file_path=str(file_path),
+                date=discovery.timestamp.date().isoformat(),
+                title=discovery.title,
+                tags=discovery.source_files[:5] if discovery.source_files else [],
+                importance=discovery.importance,
+                summary=discovery.content[:200] if discovery.content else ""
+            )
+            for discovery, file_path in zip(batch, file_paths)
+        ]
+        if isinstance(self.discovery_store, SQLiteDiscoveryStore):
+            self.memory_index.bulk_add(index_entries, discoveries=[d.to_dict() for d in batch])
+        else:
+            self.discovery_store.add_many(batch)
+            self.memory_index.bulk_add(index_entries)
+        if self.vector_index:
+            try:
+                self.vector_index.add([
+                    (e.id, entry_text(e.title, e.summary, e.tags)) for e in index_entries
+                ])
+            except Exception as e:
+                print(f"[Daemon] 语义索引写入失败: {e}")
+        
+        # 3. 发送通知
+        for discovery, file_path in zip(batch, file_paths):
+            if discovery.importance >= self.config.notification_min_importance:
+                self.notifier.notify(
+                    title=discovery.title,
+                    message=discovery.content,
+                    importance=discovery.importance,
+                    subtitle=discovery.suggested_action
+                )
+            print(f"[Daemon]   └─ 已记录到: {file_path.name}")
 
 
 async def run_daemon():
@@ -6,10 +6,17 @@ Discovery 数据模型
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
 import json
+import os
 import uuid
 
+from ..utils.fileio import atomic_write_json, atomic_write_text
+
+if TYPE_CHECKING:
+    from ..memory import MemoryIndex
+
 
 class DiscoveryType(Enum):
     """发现类型"""
@@ -73,72 +80,396 @@ class Discovery:
 
 class DiscoveryStore:
     """
-    发现存储
-    
-    持久化保存到 ~/.jarvis/discoveries.json
+    发现存储（追加日志）
+
+    - discoveries.jsonl: 只追加的操作日志（add / ack / ack_all），写入是 O(1) 追加
+    - discoveries.index.json: 小索引，每条发现一行 [id, 偏移, 重要性, 已读, 时间戳]，
+      未读数、排序都只看索引，只有真正要展示的条目才按偏移读取。
+      索引记录了它覆盖到的日志位置，读者只需重放其后的尾部，所以每追加
+      INDEX_EVERY 行才重写一次
+    - 垃圾记录（已读标记、超出保留数量的旧发现）过多时整体压缩
+
+    daemon 与 CLI 可能同时写：每次操作前按日志的 (inode, size) 判断是否有
+    其他进程追加或压缩过，并增量重放。
     """
-    
+
+    # 压缩时保留的发现数量
+    MAX_ENTRIES = 1000
+    # 日志中无效行超过该数量（且超过有效行数）时压缩
+    COMPACT_MIN_GARBAGE = 200
+    # 每追加多少行日志重写一次索引
+    INDEX_EVERY = 50
+    INDEX_VERSION = 1
+
     def __init__(self, storage_path: str):
-        self.storage_path = storage_path
-        self._discoveries: list[Discovery] = []
-        self._load()
-    
-    def _load(self):
-        """加载已有发现"""
+        path = Path(storage_path)
+        # 兼容旧配置传入的 discoveries.json
+        self.log_path = path.with_suffix(".jsonl")
+        self.index_path = path.with_name(path.stem + ".index.json")
+        self._legacy_path = path.with_suffix(".json")
+
+        self._rows: list[list] = []  # [id, offset, importance, acknowledged, timestamp]
+        self._by_id: dict[str, list] = {}
+        self._lines = 0  # 日志总行数
+        self._index_lines = 0  # 上次写索引时的日志行数
+        self._log_state: Optional[tuple[int, int]] = None  # 已同步到的 (inode, size)
+
+        self._migrate_legacy()
+        self._sync()
+
+    # ── 同步 ──────────────────────────────────────────────
+
+    def _stat_log(self) -> Optional[tuple[int, int]]:
         try:
-            with open(self.storage_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self._discoveries = [
-                    Discovery.from_dict(d) for d in data.get("discoveries", [])
-                ]
+            st = os.stat(self.log_path)
+            return st.st_ino, st.st_size
         except FileNotFoundError:
-            self._discoveries = []
-        except json.JSONDecodeError:
-            self._discoveries = []
-    
-    def _save(self):
-        """保存发现"""
-        import os
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-        with open(self.storage_path, "w", encoding="utf-8") as f:
-            json.dump(
-                {"discoveries": [d.to_dict() for d in self._discoveries]},
-                f,
-                ensure_ascii=False,
-                indent=2
-            )
-    
+            return None
+
+    def _sync(self) -> None:
+        """让内存索引追上磁盘上的日志"""
+        current = self._stat_log()
+        if current == self._log_state:
+            return
+        if current is None:
+            self._reset()
+            self._log_state = None
+            return
+        if self._log_state and current[0] == self._log_state[0] and current[1] > self._log_state[1]:
+            self._replay(self._log_state[1])  # 其他进程追加了几行
+            return
+        if self._load_index(current):
+            if self._log_state != current:
+                self._replay(self._log_state[1])
+        else:
+            self._reset()
+            self._replay(0)
+            self._save_index()
+
+    def _reset(self) -> None:
+        self._rows = []
+        self._by_id = {}
+        self._lines = 0
+        self._index_lines = 0
+
+    def _load_index(self, log_state: tuple[int, int]) -> bool:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        indexed = tuple(data.get("log", ()))
+        # 索引必须对应同一个日志文件（压缩会换 inode），且没有超出日志长度
+        if (
+            data.get("version") != self.INDEX_VERSION
+            or len(indexed) != 2
+            or indexed[0] != log_state[0]
+            or indexed[1] > log_state[1]
+        ):
+            return False
+        self._rows = data.get("rows", [])
+        self._by_id = {row[0]: row for row in self._rows}
+        self._lines = self._index_lines = data.get("lines", len(self._rows))
+        self._log_state = indexed
+        return True
+
+    def _replay(self, start: int) -> None:
+        """从 start 偏移开始重放日志"""
+        with open(self.log_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for raw in f:
+                line_offset, offset = offset, offset + len(raw)
+                if not raw.endswith(b"\n"):
+                    offset = line_offset  # 写了一半的行，等下次再读
+                    break
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                self._lines += 1
+                self._apply(record, line_offset)
+        st = os.stat(self.log_path)
+        self._log_state = (st.st_ino, offset)
+
+    def _apply(self, record: dict, offset: int) -> None:
+        op = record.get("op", "add")
+        if op == "add":
+            timestamp = record.get("timestamp") or datetime.now().isoformat()
+            row = [
+                record.get("id", ""),
+                offset,
+                record.get("importance", 3),
+                bool(record.get("acknowledged", False)),
+                datetime.fromisoformat(timestamp).timestamp(),
+            ]
+            self._rows.append(row)
+            self._by_id[row[0]] = row
+        elif op == "ack":
+            row = self._by_id.get(record.get("id"))
+            if row:
+                row[3] = True
+        elif op == "ack_all":
+            for row in self._rows:
+                row[3] = True
+
+    def _save_index(self) -> None:
+        atomic_write_json(self.index_path, {
+            "version": self.INDEX_VERSION,
+            "log": list(self._log_state) if self._log_state else [],
+            "lines": self._lines,
+            "rows": self._rows,
+        })
+        self._index_lines = self._lines
+
+    # ── 写入 ──────────────────────────────────────────────
+
+    def _append(self, *records: dict) -> int:
+        """追加若干行（一次写入），返回第一行的偏移"""
+        self._sync()
+        os.makedirs(self.log_path.parent, exist_ok=True)
+        lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records]
+        with open(self.log_path, "ab") as f:
+            offset = f.tell()
+            f.write(b"".join(lines))
+        st = os.stat(self.log_path)
+        if self._log_state and self._log_state[1] != offset:
+            # 另一个进程在我们 _sync 之后又追加了内容：直接整体重放
+            self._log_state = None
+            self._reset()
+            self._replay(0)
+        else:
+            position = offset
+            for record, line in zip(records, lines):
+                self._lines += 1
+                self._apply(record, position)
+                position += len(line)
+            self._log_state = (st.st_ino, position)
+        return offset
+
+    def _commit(self) -> None:
+        if self._needs_compaction():
+            self.compact()
+        elif self._lines - self._index_lines >= self.INDEX_EVERY:
+            self._save_index()
+
+    def flush(self) -> None:
+        """把索引写到当前位置（退出前调用，下次打开无需重放尾部）"""
+        self._sync()
+        if self._log_state and self._lines != self._index_lines:
+            self._save_index()
+
     def add(self, discovery: Discovery):
         """添加新发现"""
-        self._discoveries.insert(0, discovery)  # 最新的在前面
-        # 只保留最近 100 条
-        if len(self._discoveries) > 100:
-            self._discoveries = self._discoveries[:100]
-        self._save()
-    
+        self.add_many([discovery])
+
+    def add_many(self, discoveries: list[Discovery]):
+        """批量添加（一次追加写入）"""
+        if discoveries:
+            self._append(*({"op": "add", **d.to_dict()} for d in discoveries))
+            self._commit()
+
+    def acknowledge(self, discovery_id: str):
+        """确认发现"""
+        self._sync()
+        row = self._by_id.get(discovery_id)
+        if row and not row[3]:
+            self._append({"op": "ack", "id": discovery_id})
+            self._commit()
+
+    def acknowledge_all(self):
+        """确认所有发现"""
+        self._sync()
+        if any(not row[3] for row in self._rows):
+            self._append({"op": "ack_all", "timestamp": datetime.now().isoformat()})
+            self._commit()
+
+    # ── 压缩 ──────────────────────────────────────────────
+
+    def _needs_compaction(self) -> bool:
+        garbage = self._lines - len(self._rows)
+        return (
+            len(self._rows) > self.MAX_ENTRIES + self.COMPACT_MIN_GARBAGE
+            or (garbage > self.COMPACT_MIN_GARBAGE and garbage > len(self._rows))
+        )
+
+    def compact(self) -> None:
+        """重写日志：只保留最近 MAX_ENTRIES 条发现，已读状态并入记录"""
+        self._sync()
+        keep = self._rows[-self.MAX_ENTRIES:]
+        records = self._read_rows(keep)
+
+        lines = []
+        for row, record in zip(keep, records):
+            record["acknowledged"] = row[3]
+            lines.append(json.dumps({"op": "add", **record}, ensure_ascii=False) + "\n")
+        atomic_write_text(self.log_path, "".join(lines))
+
+        self._log_state = None
+        self._reset()
+        self._replay(0)
+        self._save_index()
+
+    # ── 读取 ──────────────────────────────────────────────
+
+    def _read_rows(self, rows: list[list]) -> list[dict]:
+        """按偏移读取完整记录（已读状态以索引为准）"""
+        if not rows:
+            return []
+        records = []
+        with open(self.log_path, "rb") as f:
+            for row in rows:
+                f.seek(row[1])
+                record = json.loads(f.readline())
+                record.pop("op", None)
+                record["acknowledged"] = row[3]
+                records.append(record)
+        return records
+
+    def count(self) -> int:
+        self._sync()
+        return len(self._rows)
+
+    def unread_count(self) -> int:
+        """未读数（只看索引）"""
+        self._sync()
+        return sum(1 for row in self._rows if not row[3])
+
+    def iter_records(self, today_only: bool = False, batch: int = 50) -> Iterator[dict]:
+        """从新到旧逐批读取原始记录（dict）"""
+        self._sync()
+        rows = self._rows
+        if today_only:
+            midnight = datetime.combine(datetime.now().date(), datetime.min.time()).timestamp()
+            rows = [row for row in rows if row[4] >= midnight]
+        for end in range(len(rows), 0, -batch):
+            chunk = rows[max(0, end - batch):end]
+            yield from reversed(self._read_rows(chunk))
+
+    def unread_records(self, limit: int = 3) -> list[dict]:
+        """按重要性（再按时间）排序的未读记录"""
+        self._sync()
+        unread = [row for row in self._rows if not row[3]]
+        unread.sort(key=lambda row: (row[2], row[4]), reverse=True)
+        return self._read_rows(unread[:limit])
+
     def get_recent(self, count: int = 10) -> list[Discovery]:
         """获取最近的发现"""
-        return self._discoveries[:count]
-    
+        self._sync()
+        return [Discovery.from_dict(r) for r in reversed(self._read_rows(self._rows[-count:]))]
+
     def get_today(self) -> list[Discovery]:
         """获取今日发现"""
-        today = datetime.now().date()
-        return [d for d in self._discoveries if d.timestamp.date() == today]
-    
+        return [Discovery.from_dict(r) for r in self.iter_records(today_only=True)]
+
     def get_unacknowledged(self) -> list[Discovery]:
         """获取未确认的发现"""
-        return [d for d in self._discoveries if not d.acknowledged]
-    
+        self._sync()
+        unread = [row for row in self._rows if not row[3]]
+        return [Discovery.from_dict(r) for r in reversed(self._read_rows(unread))]
+
+    # ── 迁移 ──────────────────────────────────────────────
+
+    def _migrate_legacy(self) -> None:
+        """旧版 discoveries.json（整文件重写）→ 追加日志"""
+        if self.log_path.exists() or not self._legacy_path.exists():
+            return
+        try:
+            with open(self._legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f).get("discoveries", [])
+        except (json.JSONDecodeError, OSError):
+            return
+
+        os.makedirs(self.log_path.parent, exist_ok=True)
+        with open(self.log_path, "wb") as f:
+            for record in reversed(legacy):  # 旧文件最新在前，日志按时间顺序
+                f.write((json.dumps({"op": "add", **record}, ensure_ascii=False) + "\n").encode("utf-8"))
+        os.replace(self._legacy_path, self._legacy_path.with_suffix(".json.migrated"))
+
+
+class SQLiteDiscoveryStore:
+    """
+    发现存储（MemoryIndex 的 discoveries 表）
+
+    与 DiscoveryStore 接口一致。未读数、按重要性排序、今日发现都是带索引的
+    单条查询；确认单条发现是一次单行 UPDATE。
+
+    首次打开时把 discoveries.jsonl（及更早的 discoveries.json）导入数据库，
+    原文件改名为 *.migrated。
+    """
+
+    def __init__(self, index: "MemoryIndex", import_path: Optional[str] = None):
+        self.index = index
+        if import_path:
+            self._import(Path(import_path))
+
+    def _import(self, path: Path) -> None:
+        log_path = path.with_suffix(".jsonl")
+        if not log_path.exists() and not log_path.with_suffix(".json").exists():
+            return
+        legacy = DiscoveryStore(str(log_path))
+        records = list(legacy.iter_records())
+        self.index.add_discoveries(records, replace=False)
+        os.replace(log_path, log_path.with_suffix(".jsonl.migrated"))
+        try:
+            os.unlink(legacy.index_path)
+        except FileNotFoundError:
+            pass
+        print(f"[Discovery] 已导入 {len(records)} 条发现到 {self.index.db_path}")
+
+    # ── 写入 ──────────────────────────────────────────────
+
+    def add(self, discovery: Discovery):
+        """添加新发现"""
+        self.add_many([discovery])
+
+    def add_many(self, discoveries: list[Discovery]):
+        """批量添加（单个事务）"""
+        self.index.add_discoveries([d.to_dict() for d in discoveries])
+
     def acknowledge(self, discovery_id: str):
         """确认发现"""
-        for d in self._discoveries:
-            if d.id == discovery_id:
-                d.acknowledged = True
-                self._save()
-                break
-    
+        self.index.acknowledge_discovery(discovery_id)
+
     def acknowledge_all(self):
         """确认所有发现"""
-        for d in self._discoveries:
-            d.acknowledged = True
-        self._save()
+        self.index.acknowledge_all_discoveries()
+
+    def flush(self) -> None:
+        """每次写入都已提交，无需刷新"""
+
+    # ── 读取 ──────────────────────────────────────────────
+
+    def count(self) -> int:
+        return self.index.count_discoveries()
+
+    def unread_count(self) -> int:
+        return self.index.count_discoveries(unread_only=True)
+
+    def iter_records(self, today_only: bool = False, batch: int = 50) -> Iterator[dict]:
+        """从新到旧逐批读取记录（dict）"""
+        since = datetime.combine(datetime.now().date(), datetime.min.time()) if today_only else None
+        offset = 0
+        while True:
+            records = self.index.query_discoveries(since=since, limit=batch, offset=offset)
+            yield from records
+            if len(records) < batch:
+                return
+            offset += batch
+
+    def unread_records(self, limit: int = 3) -> list[dict]:
+        """按重要性（再按时间）排序的未读记录"""
+        return self.index.query_discoveries(unread_only=True, by_importance=True, limit=limit)
+
+    def get_recent(self, count: int = 10) -> list[Discovery]:
+        """获取最近的发现"""
+        return [Discovery.from_dict(r) for r in self.index.query_discoveries(limit=count)]
+
+    def get_today(self) -> list[Discovery]:
+        """获取今日发现"""
+        return [Discovery.from_dict(r) for r in self.iter_records(today_only=True)]
+
+    def get_unacknowledged(self) -> list[Discovery]:
+        """获取未确认的发现"""
+        unread = self.index.query_discoveries(unread_only=True, limit=-1)
+        return [Discovery.from_dict(r) for r in unread]
@@ -0,0 +1,233 @@
+"""
+生命体征持久化
+
+- state.json: 原子替换（utils.fileio），读者不会读到半截文件
+- StateWriter: 内容变化时才写；内容不变时只按心跳间隔刷新时间戳
+- state.bin: 可选的定长 mmap 状态记录（seqlock），`jarvis status` 无需解析 JSON
+"""
+import json
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from ..utils.fileio import PathLike, atomic_write_json
+
+
+@dataclass
+class LifeSigns:
+    """生命体征"""
+    status: str = "running"  # running, resting, stopped
+    last_heartbeat: datetime = field(default_factory=datetime.now)
+    discoveries_today: int = 0
+    important_discoveries_today: int = 0
+    active_skills: int = 0
+    started_at: datetime = field(default_factory=datetime.now)
+    heartbeat_interval_seconds: int = 60
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "last_heartbeat": self.last_heartbeat.isoformat(),
+            "discoveries_today": self.discoveries_today,
+            "important_discoveries_today": self.important_discoveries_today,
+            "active_skills": self.active_skills,
+            "started_at": self.started_at.isoformat(),
+            "heartbeat_interval_seconds": self.heartbeat_interval_seconds,
+        }
+
+    def save(self, path: str):
+        """保存状态（原子写入）"""
+        atomic_write_json(path, self.to_dict())
+
+    @classmethod
+    def load(cls, path: str) -> "LifeSigns":
+        """加载状态"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(
+                status=data.get("status", "stopped"),
+                last_heartbeat=datetime.fromisoformat(data["last_heartbeat"]),
+                discoveries_today=data.get("discoveries_today", 0),
+                important_discoveries_today=data.get("important_discoveries_today", 0),
+                active_skills=data.get("active_skills", 0),
+                started_at=datetime.fromisoformat(data.get("started_at", datetime.now().isoformat())),
+                heartbeat_interval_seconds=data.get("heartbeat_interval_seconds", 60),
+            )
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return cls()
+
+
+# ── mmap 状态记录 ─────────────────────────────────────────
+#
+# 定长二进制记录，写者原地更新，读者只读映射：
+#   magic | seq | status | heartbeat | started_at | interval | 今日发现 | 重要 | 活跃 skill
+# seq 为奇数表示正在写入（seqlock），读者读到前后 seq 一致且为偶数才采用。
+
+_RECORD = struct.Struct("<4sIB3xdddIII")
+_MAGIC = b"JVS1"
+_SEQ = struct.Struct("<I")
+_STATUS_CODES = {"running": 1, "resting": 2, "stopped": 3}
+_STATUS_NAMES = {v: k for k, v in _STATUS_CODES.items()}
+
+
+def status_record_path(state_path: PathLike) -> Path:
+    return Path(state_path).with_suffix(".bin")
+
+
+class StatusRecord:
+    """state.bin 的写者（daemon 进程独占）"""
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        if os.fstat(self._file.fileno()).st_size != _RECORD.size:
+            self._file.truncate(_RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), _RECORD.size)
+        magic, seq = struct.unpack_from("<4sI", self._map)
+        self._seq = seq + (seq & 1) if magic == _MAGIC else 0
+
+    def write(self, signs: LifeSigns) -> None:
+        self._seq += 1  # 奇数：写入中
+        _SEQ.pack_into(self._map, 4, self._seq)
+        self._seq += 1
+        _RECORD.pack_into(
+            self._map, 0,
+            _MAGIC,
+            self._seq - 1,
+            _STATUS_CODES.get(signs.status, 0),
+            signs.last_heartbeat.timestamp(),
+            signs.started_at.timestamp(),
+            float(signs.heartbeat_interval_seconds),
+            signs.discoveries_today,
+            signs.important_discoveries_today,
+            signs.active_skills,
+        )
+        _SEQ.pack_into(self._map, 4, self._seq)  # 偶数：写入完成
+
+    def close(self) -> None:
+        try:
+            self._map.flush()
+            self._map.close()
+        finally:
+            self._file.close()
+
+
+def read_status_record(path: PathLike, retries: int = 5) -> Optional[dict]:
+    """
+    读取 state.bin，返回与 state.json 同结构的 dict；不存在或无效时返回 None
+    """
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != _RECORD.size:
+                return None
+            with mmap.mmap(f.fileno(), _RECORD.size, access=mmap.ACCESS_READ) as m:
+                for _ in range(retries):
+                    fields = _RECORD.unpack_from(m)
+                    seq_after = _SEQ.unpack_from(m, 4)[0]
+                    if fields[0] != _MAGIC:
+                        return None
+                    if fields[1] % 2 == 0 and fields[1] == seq_after:
+                        break
+                else:
+                    return None
+    except (OSError, ValueError):
+        return None
+
+    _, _, status, heartbeat, started_at, interval, today, important, skills = fields
+    return {
+        "status": _STATUS_NAMES.get(status, "unknown"),
+        "last_heartbeat": datetime.fromtimestamp(heartbeat).isoformat(),
+        "discoveries_today": today,
+        "important_discoveries_today": important,
+        "active_skills": skills,
+        "started_at": datetime.fromtimestamp(started_at).isoformat(),
+        "heartbeat_interval_seconds": interval,
+    }
+
+
+def read_state(state_path: PathLike) -> Optional[dict]:
+    """读取生命体征：优先 mmap 状态记录，没有时回退到 state.json"""
+    record = read_status_record(status_record_path(state_path))
+    if record is not None:
+        return record
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def heartbeat_timeout(state: dict) -> float:
+    """多久没有心跳视为无响应（至少 120 秒，且覆盖 2.5 个心跳间隔）"""
+    return max(120.0, 2.5 * float(state.get("heartbeat_interval_seconds", 60)))
+
+
+def mark_stopped(state_path: PathLike) -> None:
+    """把残留的 running 状态改为 stopped（JSON 与 mmap 记录一起更新）"""
+    signs = LifeSigns.load(str(state_path))
+    signs.status = "stopped"
+    signs.save(str(state_path))
+    record_path = status_record_path(state_path)
+    if record_path.exists():
+        record = StatusRecord(record_path)
+        try:
+            record.write(signs)
+        finally:
+            record.close()
+
+
+class StateWriter:
+    """
+    批量化的生命体征写入
+
+    - 除心跳时间外的字段变化时立即写
+    - 否则距上次写入超过 heartbeat_interval 才写（刷新心跳）
+    - 同时更新 mmap 状态记录（可选）
+    """
+
+    def __init__(self, path: PathLike, heartbeat_interval: float = 60, status_record: bool = True):
+        self.path = str(path)
+        self.heartbeat_interval = heartbeat_interval
+        self.writes = 0
+        self.skipped = 0
+        self._last_content: Optional[dict] = None
+        self._last_write: Optional[datetime] = None
+        self._record: Optional[StatusRecord] = None
+        if status_record:
+            try:
+                self._record = StatusRecord(status_record_path(path))
+            except (OSError, ValueError) as e:
+                print(f"[Daemon] 状态记录不可用，仅写 state.json: {e}")
+
+    def write(self, signs: LifeSigns, force: bool = False) -> bool:
+        """Returns: 是否写了 state.json"""
+        if self._record is not None:
+            self._record.write(signs)
+
+        data = signs.to_dict()
+        content = {k: v for k, v in data.items() if k != "last_heartbeat"}
+        # 留 10% 余量，避免定时抖动导致某次心跳被跳过
+        heartbeat_due = (
+            self._last_write is None
+            or (signs.last_heartbeat - self._last_write).total_seconds() >= self.heartbeat_interval * 0.9
+        )
+        if not force and content == self._last_content and not heartbeat_due:
+            self.skipped += 1
+            return False
+
+        atomic_write_json(self.path, data)
+        self._last_content = content
+        self._last_write = signs.last_heartbeat
+        self.writes += 1
+        return True
+
+    def close(self) -> None:
+        if self._record is not None:
+            self._record.close()
+            self._record = None
@@ -5,6 +5,7 @@ Phase 4: 让 Jarvis 学会"长大"——自我进化系统
 
 子模块:
 - pattern_detector: 交互模式检测
+- fingerprint_cluster: 指纹相似度聚类（MinHash/LSH）
 - skill_generator: Skill 自动生成
 - skill_registry: Skill 生命周期管理
 - sandbox: 沙盒验证
@@ -17,7 +18,7 @@ from .skill_registry import SkillRegistry, SkillInfo
 from .skill_generator import SkillGenerator
 from .sandbox import SkillSandbox, ValidationReport
 from .preference_learner import PreferenceLearner, UserPreference
-from .metacognition import Metacognition, ReflectionReport
+from .metacognition import Metacognition, ReflectionReport, ReflectionSnapshot
 
 __all__ = [
     "PatternDetector",
@@ -32,4 +33,5 @@ __all__ = [
     "UserPreference",
     "Metacognition",
     "ReflectionReport",
+    "ReflectionSnapshot",
 ]
@@ -0,0 +1,192 @@
+"""
+Pattern Detector - 指纹相似度聚类（本地，无网络调用）
+
+(domain, tool_chain) 精确分组漏掉近似重复（"翻译 README" / "把文档翻成英文"
+配上略有不同的工具链）；detect_patterns_llm 又要把指纹整批发给 LLM。
+这里用 MinHash + LSH 在本地把相似的指纹聚成簇，LLM 只负责给簇起名。
+
+- 特征: 意图的英文词 / 中文相邻双字、领域、工具链中的每个工具（集合）
+- MinHash: 每个特征的签名按特征缓存，指纹签名 = 各特征签名逐位取最小
+- LSH: 签名分 BANDS 段，任一段相同即为候选对；候选对再用精确 Jaccard 确认
+- 聚类: 特征完全相同的指纹先合并；相似度 >= threshold 的用并查集连成簇
+"""
+import re
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+# Mersenne 素数 2^31 - 1：32 位哈希乘以 31 位系数不会超过 64 位
+_PRIME = (1 << 31) - 1
+_TOKEN = re.compile(r"[a-z][a-z0-9_]+|[㐀-鿿]+")
+
+
+def fingerprint_features(intent: str, domain: str = "", tool_chain: str = "") -> frozenset:
+    """指纹的特征集合"""
+    features = set()
+    for run in _TOKEN.findall(intent.lower()):
+        if run[0].isascii():
+            features.add(run)
+        elif len(run) == 1:
+            features.add(run)
+        else:
+            features.update(run[i:i + 2] for i in range(len(run) - 1))
+    if domain:
+        features.add(f"domain:{domain}")
+    for tool in tool_chain.split("→"):
+        if tool:
+            features.add(f"tool:{tool}")
+    return frozenset(features)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+@dataclass
+class FingerprintCluster:
+    """一簇相似的指纹"""
+    fingerprint_ids: list[str] = field(default_factory=list)   # 按输入顺序
+    intents: list[str] = field(default_factory=list)
+    domain: str = ""                 # 簇内最常见的领域
+    tool_chain: str = ""             # 簇内最常见的工具链
+    representative: str = ""         # 最接近簇中心的意图
+    cohesion: float = 0.0            # 成员与代表指纹的平均 Jaccard 相似度
+
+    @property
+    def size(self) -> int:
+        return len(self.fingerprint_ids)
+
+
+class MinHashClusterer:
+    """
+    MinHash / LSH 聚类
+
+    默认 64 个哈希、16 段 × 4 行，LSH 的候选阈值约为 (1/16)^(1/4) ≈ 0.5，
+    与默认的 Jaccard 阈值一致。
+    """
+
+    # 同一 LSH 桶内，每个成员最多与多少个不同簇的成员做精确比较
+    MAX_CHECKS = 8
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        # 线性同余生成确定的哈希系数（a 为奇数，保证与 2^31 - 1 互素）
+        state = seed
+        self._coeffs = []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) & 0xFFFFFFFFFFFFFFFF
+            a = (state >> 33) | 1
+            state = (state * 6364136223846793005 + 1442695040888963407) & 0xFFFFFFFFFFFFFFFF
+            self._coeffs.append((a, state >> 33))
+        self._feature_sigs: dict[str, tuple] = {}
+
+    def _feature_signature(self, feature: str) -> tuple:
+        sig = self._feature_sigs.get(feature)
+        if sig is None:
+            h = zlib.crc32(feature.encode("utf-8"))
+            sig = tuple((a * h + b) % _PRIME for a, b in self._coeffs)
+            self._feature_sigs[feature] = sig
+        return sig
+
+    def signature(self, features: Iterable[str]) -> Optional[tuple]:
+        """MinHash 签名；特征为空时返回 None"""
+        sigs = [self._feature_signature(f) for f in features]
+        if not sigs:
+            return None
+        return tuple(map(min, zip(*sigs)))
+
+    def cluster(self, items: list[frozenset], min_size: int = 2) -> list[list[int]]:
+        """
+        聚类
+
+        Args:
+            items: 每个指纹的特征集合
+        Returns:
+            每簇的成员下标，按簇大小降序
+        """
+        # 特征完全相同的指纹只算一次签名
+        unique: dict[frozenset, list[int]] = defaultdict(list)
+        for i, features in enumerate(items):
+            if features:
+                unique[features].append(i)
+        sets = list(unique)
+
+        buckets: dict[tuple, list[int]] = defaultdict(list)
+        for u, features in enumerate(sets):
+            sig = self.signature(features)
+            for band in range(self.bands):
+                buckets[(band, sig[band * self.rows:(band + 1) * self.rows])].append(u)
+
+        parent = list(range(len(sets)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # 桶内逐个确认：已在同一簇的跳过，每个成员最多比较 MAX_CHECKS 次，
+        # 大桶不会退化成两两比较
+        for members in buckets.values():
+            for x in range(1, len(members)):
+                u = members[x]
+                checks = 0
+                for v in members[:x]:
+                    if find(u) == find(v):
+                        break
+                    if jaccard(sets[u], sets[v]) >= self.threshold:
+                        parent[find(u)] = find(v)
+                        break
+                    checks += 1
+                    if checks >= self.MAX_CHECKS:
+                        break
+
+        groups: dict[int, list[int]] = defaultdict(list)
+        for u, features in enumerate(sets):
+            groups[find(u)].extend(unique[features])
+        clusters = [sorted(members) for members in groups.values() if len(members) >= min_size]
+        clusters.sort(key=len, reverse=True)
+        return clusters
+
+
+def cluster_fingerprints(
+    fingerprints: list,
+    min_size: int = 3,
+    threshold: float = 0.5,
+    clusterer: Optional[MinHashClusterer] = None,
+) -> list[FingerprintCluster]:
+    """
+    把成功的指纹按意图 + 工具链相似度聚类
+
+    Args:
+        fingerprints: InteractionFingerprint 列表
+        min_size: 簇的最小指纹数（即模式阈值）
+    """
+    clusterer = clusterer or MinHashClusterer(threshold=threshold)
+    fps = [fp for fp in fingerprints if fp.success]
+    features = [fingerprint_features(fp.intent, fp.domain, fp.tool_chain) for fp in fps]
+
+    result = []
+    for members in clusterer.cluster(features, min_size=min_size):
+        group = [fps[i] for i in members]
+        # 代表：特征在簇内出现频率之和最高（最接近簇中心）的指纹
+        freq = Counter(f for i in members for f in features[i])
+        center = max(members, key=lambda i: sum(freq[f] for f in features[i]) / len(features[i]))
+        result.append(FingerprintCluster(
+            fingerprint_ids=[fp.id for fp in group],
+            intents=[fp.intent for fp in group],
+            domain=Counter(fp.domain for fp in group).most_common(1)[0][0],
+            tool_chain=Counter(fp.tool_chain for fp in group).most_common(1)[0][0],
+            representative=fps[center].intent,
+            cohesion=sum(jaccard(features[i], features[center]) for i in members) / len(members),
+        ))
+    return result
@@ -11,18 +11,60 @@ Phase 4.5: 让 Jarvis "知道自己知道什么，不知道什么"
 触发时机:
 - jarvis reflect 手动命令
 - Daemon _self_reflect 周期性触发
+
+数据流: snapshot() 一次性收集只读快照（指纹按领域的 SQL 汇总、模式、Skill、
+偏好、记忆目录统计），assess() 在快照上一遍算出五维雷达与领域强弱项，
+不再重复读取指纹或遍历记忆目录。两步耗时写入报告。
 """
 
 import json
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from dataclasses import dataclass, field
 
+from ..memory.catalog import MemoryCatalog
 from .pattern_detector import PatternDetector
 from .skill_registry import SkillRegistry
 from .preference_learner import PreferenceLearner
 
 
+@dataclass(frozen=True)
+class ReflectionSnapshot:
+    """反思所需数据的只读快照"""
+
+    taken_at: datetime
+    days: int
+    domain_stats: tuple[tuple[str, int, int], ...]  # (domain, 次数, 成功次数)
+    recent_fingerprints: tuple  # 最近若干条指纹（LLM 摘要用）
+    patterns: tuple
+    skills: tuple
+    preferences: tuple
+    memory_files: int
+    memory_bytes: int
+    build_ms: float = 0.0
+
+    @property
+    def fingerprint_count(self) -> int:
+        return sum(count for _, count, _ in self.domain_stats)
+
+    @property
+    def success_count(self) -> int:
+        return sum(success for _, _, success in self.domain_stats)
+
+
+@dataclass
+class Assessment:
+    """在快照上算出的评估结果"""
+
+    ability_radar: dict[str, float]
+    domain_stats: dict[str, dict]
+    strengths: list[str]
+    weaknesses: list[str]
+    blind_spots: list[str]
+    scoring_ms: float = 0.0
+
+
 @dataclass
 class ReflectionReport:
     """元认知反思报告"""
@@ -37,6 +79,7 @@ class ReflectionReport:
     fingerprints_total: int = 0
     patterns_total: int = 0
     preferences_total: int = 0
+    timings: dict[str, float] = field(default_factory=dict)  # snapshot_ms / scoring_ms
 
     def to_dict(self) -> dict:
         return {
@@ -50,6 +93,7 @@ class ReflectionReport:
             "fingerprints_total": self.fingerprints_total,
             "patterns_total": self.patterns_total,
             "preferences_total": self.preferences_total,
+            "timings": self.timings,
         }
 
     def render(self) -> str:
@@ -104,6 +148,11 @@ class ReflectionReport:
             f"{self.preferences_total} 偏好 | "
             f"{len(self.skills_summary)} Skills"
         )
+        if self.timings:
+            lines.append(
+                f"  ⏱️ 耗时: 快照 {self.timings.get('snapshot_ms', 0.0):.1f} ms | "
+                f"评分 {self.timings.get('scoring_ms', 0.0):.1f} ms"
+            )
 
         return "\n".join(lines)
 
@@ -136,33 +185,76 @@ class Metacognition:
         self._reports_dir = jarvis_home / "evolution" / "reflections"
         self._reports_dir.mkdir(parents=True, exist_ok=True)
 
-    async def reflect(self, llm_call=None) -> ReflectionReport:
+    # 交给 LLM 的最近指纹条数
+    LLM_SAMPLE = 15
+
+    def snapshot(self, days: int = 30) -> ReflectionSnapshot:
+        """收集一次反思所需的全部数据（指纹只做 SQL 汇总，不逐条加载）"""
+        started = time.perf_counter()
+        memory_files = memory_bytes = 0
+        memory_dir = self._home / "memory"
+        if memory_dir.exists():
+            # 文件数与大小由记忆目录回答，不遍历整个记忆树
+            entries = MemoryCatalog(memory_dir).files()
+            memory_files = len(entries)
+            memory_bytes = sum(e.size for e in entries)
+
+        data = dict(
+            taken_at=datetime.now(),
+            days=days,
+            domain_stats=tuple(self._detector.domain_stats(days=days)),
+            recent_fingerprints=tuple(self._detector.get_recent_fingerprints(days=days, limit=self.LLM_SAMPLE)),
+            patterns=tuple(self._detector.get_patterns()),
+            skills=tuple(self._registry.list_skills(include_disabled=True)),
+            preferences=tuple(self._learner.get_all_preferences()),
+            memory_files=memory_files,
+            memory_bytes=memory_bytes,
+        )
+        return ReflectionSnapshot(**data, build_ms=(time.perf_counter() - started) * 1000)
+
+    def assess(self, snapshot: ReflectionSnapshot) -> Assessment:
+        """在快照上一遍算出五维雷达与领域强弱项"""
+        started = time.perf_counter()
+        radar = self.compute_ability_radar(
+            fingerprint_count=snapshot.fingerprint_count,
+            pattern_count=len(snapshot.patterns),
+            skill_count=len(snapshot.skills),
+            preference_count=len(snapshot.preferences),
+            success_count=snapshot.success_count,
+            memory_files=snapshot.memory_files,
+        )
+
+        domain_stats: dict[str, dict] = {}
+        strengths, weaknesses = [], []
+        for domain, count, success in snapshot.domain_stats:
+            rate = success / count if count else 0.0
+            domain_stats[domain] = {"count": count, "success": success, "success_rate": rate}
+            if rate > 0.7 and count >= 3:
+                strengths.append(domain)
+            elif rate < 0.5 and count >= 2:
+                weaknesses.append(domain)
+        blind_spots = [d for d in self.ALL_DOMAINS if d not in domain_stats]
+
+        return Assessment(
+            ability_radar=radar,
+            domain_stats=domain_stats,
+            strengths=strengths,
+            weaknesses=weaknesses,
+            blind_spots=blind_spots,
+            scoring_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    async def reflect(self, llm_call=None, snapshot: ReflectionSnapshot = None) -> ReflectionReport:
         """
         执行元认知反思
 
         Args:
             llm_call: 可选，用于 LLM 增强分析
+            snapshot: 可选，复用已收集的快照
         """
-        # 收集数据
-        fingerprints = self._detector.get_recent_fingerprints(days=30)
-        patterns = self._detector.get_patterns()
-        skills = self._registry.list_skills(include_disabled=True)
-        preferences = self._learner.get_all_preferences()
-
-        # 计算五维雷达
-        radar = self.compute_ability_radar(
-            fingerprint_count=len(fingerprints),
-            pattern_count=len(patterns),
-            skill_count=len(skills),
-            preference_count=len(preferences),
-        )
-
-        # 分析强弱项
-        domain_stats = self._analyze_domains(fingerprints)
-        strengths = [d for d, s in domain_stats.items() if s["success_rate"] > 0.7 and s["count"] >= 3]
-        weaknesses = [d for d, s in domain_stats.items() if s["success_rate"] < 0.5 and s["count"] >= 2]
-        active_domains = set(domain_stats.keys())
-        blind_spots = [d for d in self.ALL_DOMAINS if d not in active_domains]
+        if snapshot is None:
+            snapshot = self.snapshot()
+        assessment = self.assess(snapshot)
 
         # Skill 统计
         skills_summary = {
@@ -171,30 +263,34 @@ class Metacognition:
                 "used_count": s.used_count,
                 "source": s.source,
             }
-            for s in skills
+            for s in snapshot.skills
         }
 
         # 成长建议
-        suggestions = self._generate_suggestions(strengths, weaknesses, blind_spots, skills)
+        suggestions = self._generate_suggestions(
+            assessment.strengths, assessment.weaknesses, assessment.blind_spots, snapshot.skills
+        )
 
         # LLM 增强分析（可选）
-        if llm_call and fingerprints:
-            llm_suggestions = await self._llm_enhanced_reflect(
-                fingerprints, patterns, skills, preferences, llm_call
-            )
+        if llm_call and snapshot.recent_fingerprints:
+            llm_suggestions = await self._llm_enhanced_reflect(snapshot, llm_call)
             if llm_suggestions:
                 suggestions = llm_suggestions
 
         report = ReflectionReport(
-            strengths=strengths,
-            weaknesses=weaknesses,
-            blind_spots=blind_spots,
+            strengths=assessment.strengths,
+            weaknesses=assessment.weaknesses,
+            blind_spots=assessment.blind_spots,
             growth_suggestions=suggestions,
-            ability_radar=radar,
+            ability_radar=assessment.ability_radar,
             skills_summary=skills_summary,
-            fingerprints_total=len(fingerprints),
-            patterns_total=len(patterns),
-            preferences_total=len(preferences),
+            fingerprints_total=snapshot.fingerprint_count,
+            patterns_total=len(snapshot.patterns),
+            preferences_total=len(snapshot.preferences),
+            timings={
+                "snapshot_ms": round(snapshot.build_ms, 2),
+                "scoring_ms": round(assessment.scoring_ms, 2),
+            },
         )
 
         # 保存报告
@@ -208,6 +304,8 @@ class Metacognition:
         pattern_count: int = 0,
         skill_count: int = 0,
         preference_count: int = 0,
+        success_count: int = None,
+        memory_files: int = None,
     ) -> dict[str, float]:
         """
         计算五维能力分数 (0.0 ~ 1.0)
@@ -218,12 +316,19 @@ class Metacognition:
         - 思考: 模式检测 + 偏好学习
         - 行动: 指纹中的工具使用
         - 进化: Skill 数量 + 偏好覆盖度
+
+        success_count / memory_files 未传入时现查（assess() 从快照传入）
         """
+        if success_count is None:
+            success_count = self._detector.count_fingerprints(days=30, success_only=True)
+        if memory_files is None:
+            memory_dir = self._home / "memory"
+            memory_files = MemoryCatalog(memory_dir).file_count() if memory_dir.exists() else 0
         return {
             "perception": self._score_perception(fingerprint_count),
-            "memory": self._score_memory(),
+            "memory": self._score_memory(memory_files),
             "thinking": self._score_thinking(pattern_count, preference_count),
-            "action": self._score_action(fingerprint_count),
+            "action": self._score_action(success_count),
             "evolution": self._score_evolution(skill_count, preference_count),
         }
 
@@ -233,15 +338,9 @@ class Metacognition:
         # 30 个指纹 = 满分
         return min(fingerprint_count / 30.0, 1.0)
 
-    def _score_memory(self) -> float:
+    def _score_memory(self, file_count: int) -> float:
         """记忆能力分数"""
-        # 检查记忆目录中的文件数量
-        memory_dir = self._home / "memory"
-        if not memory_dir.exists():
-            return 0.0
-        
-        file_count = sum(1 for _ in memory_dir.rglob("*.md"))
-        # 20 个文件 = 满分
+        # 记忆目录中的文件数量，20 个文件 = 满分
         return min(file_count / 20.0, 1.0)
 
     def _score_thinking(self, pattern_count: int, preference_count: int) -> float:
@@ -251,13 +350,9 @@ class Metacognition:
         pref_score = min(preference_count / 10.0, 0.5)
         return pattern_score + pref_score
 
-    def _score_action(self, fingerprint_count: int) -> float:
+    def _score_action(self, success_count: int) -> float:
         """行动能力分数"""
-        # 基于成功完成的交互数
-        fingerprints = self._detector.get_recent_fingerprints(days=30)
-        if not fingerprints:
-            return 0.0
-        success_count = sum(1 for fp in fingerprints if fp.success)
+        # 基于成功完成的交互数，20 次 = 满分
         return min(success_count / 20.0, 1.0)
 
     def _score_evolution(self, skill_count: int, preference_count: int) -> float:
@@ -267,24 +362,7 @@ class Metacognition:
         pref_score = min(preference_count / 10.0, 0.5)
         return skill_score + pref_score
 
-    # ── 领域分析 ──────────────────────────────────────────
-
-    def _analyze_domains(self, fingerprints) -> dict[str, dict]:
-        """按领域分析交互统计"""
-        stats: dict[str, dict] = {}
-        for fp in fingerprints:
-            domain = fp.domain or "other"
-            if domain not in stats:
-                stats[domain] = {"count": 0, "success": 0}
-            stats[domain]["count"] += 1
-            if fp.success:
-                stats[domain]["success"] += 1
-
-        # 计算成功率
-        for domain, s in stats.items():
-            s["success_rate"] = s["success"] / s["count"] if s["count"] > 0 else 0.0
-
-        return stats
+    # ── 成长建议 ──────────────────────────────────────────
 
     def _generate_suggestions(
         self,
@@ -315,29 +393,27 @@ class Metacognition:
 
         return suggestions
 
-    async def _llm_enhanced_reflect(
-        self, fingerprints, patterns, skills, preferences, llm_call
-    ) -> list[str]:
+    async def _llm_enhanced_reflect(self, snapshot: ReflectionSnapshot, llm_call) -> list[str]:
         """LLM 增强反思分析"""
         fp_summary = "\n".join(
             f"- [{fp.domain}] {fp.intent} ({'✅' if fp.success else '❌'})"
-            for fp in fingerprints[:15]
+            for fp in snapshot.recent_fingerprints
         )
 
         skill_summary = "\n".join(
             f"- {s.name} (使用 {s.used_count} 次, {'启用' if s.enabled else '禁用'})"
-            for s in skills
+            for s in snapshot.skills
         ) or "无"
 
         prompt = f"""你是 Jarvis 的元认知引擎。基于以下数据进行自我反思。
 
-最近 30 天交互 ({len(fingerprints)} 条):
+最近 {snapshot.days} 天交互 ({snapshot.fingerprint_count} 条):
 {fp_summary}
 
-检测到的模式: {len(patterns)} 个
+检测到的模式: {len(snapshot.patterns)} 个
 已有 Skill: 
 {skill_summary}
-用户偏好: {len(preferences)} 条
+用户偏好: {len(snapshot.preferences)} 条
 
 请给出 3-5 条具体的成长建议。
 每条建议应该具体、可操作。
@@ -415,6 +491,7 @@ class Metacognition:
         else:
             with open(path, "a", encoding="utf-8") as f:
                 f.write(entry)
+        MemoryCatalog(self._home / "memory").record(path)
 
     def get_latest_report(self) -> ReflectionReport | None:
         """获取最近的反思报告"""
@@ -434,6 +511,7 @@ class Metacognition:
             report.fingerprints_total = data.get("fingerprints_total", 0)
             report.patterns_total = data.get("patterns_total", 0)
             report.preferences_total = data.get("preferences_total", 0)
+            report.timings = data.get("timings", {})
             return report
         except (json.JSONDecodeError, IOError):
             return None
@@ -5,19 +5,26 @@ Phase 4.1: 从交互历史中发现重复模式
 
 核心流程:
 1. 每次对话后提取 InteractionFingerprint
-2. 持久化到 fingerprints/ 目录 + SQLite 索引
-3. 定期检测：同类指纹 >= 3 次 → DetectedPattern
-4. 通知用户，询问是否创建 Skill
+2. 持久化到 fingerprints/fingerprints.db（SQLite，按时间 / 领域 + 工具链建索引）
+3. 记录时更新 (domain, tool_chain) 的按天计数桶；窗口内累计达到阈值（>= 3 次）
+   立即产生 DetectedPattern 事件，不必等下一次全量检测
+4. 近似重复（意图相近、工具链略有不同）由本地 MinHash/LSH 聚类发现，
+   LLM 只负责给簇起名
+5. 通知用户，询问是否创建 Skill
 """
 
 import json
+import sqlite3
 import uuid
 from collections import defaultdict
 from datetime import datetime, date, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 from dataclasses import dataclass, field
 
+from ..utils.fileio import atomic_write_json
+from .fingerprint_cluster import FingerprintCluster, MinHashClusterer, cluster_fingerprints
+
 
 @dataclass
 class InteractionFingerprint:
@@ -131,7 +138,8 @@ class PatternDetector:
 
     职责:
     1. 记录交互指纹
-    2. 检测重复模式（基于 LLM 语义聚类）
+    2. 检测重复模式：记录时按 (domain, tool_chain) 的窗口计数触发；
+       近似重复由本地 MinHash/LSH 聚类发现，LLM 只给簇起名
     3. 管理模式生命周期
     """
 
@@ -139,78 +147,290 @@ class PatternDetector:
     PATTERN_THRESHOLD = 3
     # 检索指纹的时间窗口（天）
     LOOKBACK_DAYS = 30
-    # 最大保留指纹数
+    # 每个自然月最多保留的指纹数
     MAX_FINGERPRINTS = 500
+    # 计数桶的时间粒度（秒）
+    BUCKET_SECONDS = 86400
+
+    _COLUMNS = (
+        "id, timestamp, intent, domain, tools_used, tool_chain,"
+        " input_pattern, output_pattern, success, rounds"
+    )
 
     def __init__(self, jarvis_home: Path):
         self._home = jarvis_home
         self._fingerprints_dir = jarvis_home / "memory" / "fingerprints"
+        self._db_path = self._fingerprints_dir / "fingerprints.db"
         self._patterns_path = jarvis_home / "evolution" / "patterns.json"
 
         # 确保目录存在
         self._fingerprints_dir.mkdir(parents=True, exist_ok=True)
         self._patterns_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # 加载已检测到的模式
+        self._conn = self._open_db()
+        if self._import_monthly_files() or self._conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self._rebuild_counters()
+
+        # 加载已检测到的模式；已知模式名放进集合，O(1) 判重
+        self._patterns_mtime: Optional[int] = None
         self._patterns: list[DetectedPattern] = self._load_patterns()
+        self._known: set[str] = set()
+        self._covered: set[str] = set()   # 已有模式关联的指纹 ID
+        self._rebuild_known()
+        self._clusterer = MinHashClusterer()  # 缓存特征签名，多次聚类复用
+
+        # 阈值穿越事件：记录时产生，detect_patterns() 取走；也可注册回调
+        self._pending: list[DetectedPattern] = []
+        self._listeners: list[Callable[[DetectedPattern], None]] = []
+
+    def _open_db(self) -> sqlite3.Connection:
+        """打开指纹库（WAL：chat 与 daemon 可同时读写）"""
+        conn = sqlite3.connect(self._db_path, timeout=5.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    id TEXT PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    intent TEXT,
+                    domain TEXT,
+                    tools_used TEXT,
+                    tool_chain TEXT,
+                    input_pattern TEXT,
+                    output_pattern TEXT,
+                    success INTEGER DEFAULT 1,
+                    rounds INTEGER DEFAULT 1
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_fp_ts ON fingerprints(ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_fp_group ON fingerprints(domain, tool_chain, ts)")
+            # 滑动窗口计数：每个 (domain, tool_chain) 每天一个桶，只统计成功的指纹
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprint_groups (
+                    domain TEXT NOT NULL,
+                    tool_chain TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (domain, tool_chain, bucket)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_fpg_bucket ON fingerprint_groups(bucket)")
+        return conn
+
+    def _rebuild_counters(self) -> None:
+        """从指纹表重建计数桶（首次升级或导入旧文件后）"""
+        with self._conn:
+            self._conn.execute("DELETE FROM fingerprint_groups")
+            self._conn.execute(f"""
+                INSERT INTO fingerprint_groups (domain, tool_chain, bucket, count)
+                SELECT domain, tool_chain, CAST(ts / {self.BUCKET_SECONDS} AS INTEGER), COUNT(*)
+                FROM fingerprints
+                WHERE success = 1 AND domain != '' AND tool_chain != ''
+                GROUP BY 1, 2, 3
+            """)
+            self._conn.execute("PRAGMA user_version = 1")
+
+    def _import_monthly_files(self) -> int:
+        """
+        导入旧版的按月 JSON 文件（YYYY-MM.json），导入后改名为 .json.migrated
+        Returns: 导入的文件数
+        """
+        imported = 0
+        for fp_path in sorted(self._fingerprints_dir.glob("*.json")):
+            try:
+                records = json.loads(fp_path.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, IOError):
+                continue
+            fingerprints = [InteractionFingerprint.from_dict(r) for r in records if isinstance(r, dict)]
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO fingerprints (ts, {self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(fp) for fp in fingerprints],
+                )
+            fp_path.rename(fp_path.with_suffix(".json.migrated"))
+            imported += 1
+        return imported
 
-    # ── 指纹管理 ──────────────────────────────────────────
+    @staticmethod
+    def _row(fp: InteractionFingerprint) -> tuple:
+        return (
+            fp.timestamp.timestamp(),
+            fp.id,
+            fp.timestamp.isoformat(),
+            fp.intent,
+            fp.domain,
+            json.dumps(fp.tools_used, ensure_ascii=False),
+            fp.tool_chain,
+            fp.input_pattern,
+            fp.output_pattern,
+            1 if fp.success else 0,
+            fp.rounds,
+        )
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> InteractionFingerprint:
+        return InteractionFingerprint(
+            id=row["id"],
+            timestamp=datetime.fromisoformat(row["timestamp"]),
+            intent=row["intent"] or "",
+            domain=row["domain"] or "",
+            tools_used=json.loads(row["tools_used"] or "[]"),
+            tool_chain=row["tool_chain"] or "",
+            input_pattern=row["input_pattern"] or "",
+            output_pattern=row["output_pattern"] or "",
+            success=bool(row["success"]),
+            rounds=row["rounds"] or 1,
+        )
 
-    def record(self, fingerprint: InteractionFingerprint) -> None:
-        """记录一条交互指纹"""
-        # 按月份分文件存储
-        month_key = fingerprint.timestamp.strftime("%Y-%m")
-        fp_path = self._fingerprints_dir / f"{month_key}.json"
+    def close(self) -> None:
+        self._conn.close()
 
-        # 加载当月指纹
-        fingerprints = self._load_fingerprints_file(fp_path)
-        fingerprints.append(fingerprint.to_dict())
+    # ── 指纹管理 ──────────────────────────────────────────
 
-        # 限制单文件大小
-        if len(fingerprints) > self.MAX_FINGERPRINTS:
-            fingerprints = fingerprints[-self.MAX_FINGERPRINTS:]
+    def _bucket(self, when: datetime) -> int:
+        return int(when.timestamp() // self.BUCKET_SECONDS)
 
-        # 保存
-        fp_path.write_text(
-            json.dumps(fingerprints, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+    def _window_start(self) -> int:
+        return self._bucket(datetime.now() - timedelta(days=self.LOOKBACK_DAYS))
 
-    def get_recent_fingerprints(self, days: int = None) -> list[InteractionFingerprint]:
-        """获取最近 N 天的指纹"""
-        if days is None:
-            days = self.LOOKBACK_DAYS
+    @staticmethod
+    def _countable(domain: str, tool_chain: str, success) -> bool:
+        return bool(success and domain and tool_chain)
 
-        cutoff = datetime.now() - timedelta(days=days)
-        result = []
+    def _bump(self, domain: str, tool_chain: str, bucket: int, delta: int) -> None:
+        self._conn.execute("""
+            INSERT INTO fingerprint_groups (domain, tool_chain, bucket, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT (domain, tool_chain, bucket) DO UPDATE SET count = count + excluded.count
+        """, (domain, tool_chain, bucket, delta))
 
-        # 扫描指纹文件
-        for fp_path in sorted(self._fingerprints_dir.glob("*.json"), reverse=True):
-            fingerprints = self._load_fingerprints_file(fp_path)
-            for fp_data in fingerprints:
-                fp = InteractionFingerprint.from_dict(fp_data)
-                if fp.timestamp >= cutoff:
-                    result.append(fp)
+    def record(self, fingerprint: InteractionFingerprint) -> Optional[DetectedPattern]:
+        """
+        记录一条交互指纹（单行插入 + 计数桶 +1；当月超过上限时删掉最旧的）
 
-            # 如果文件日期早于截止日期，提前退出
+        Returns: 这条指纹让所在组首次达到阈值时，返回新检测到的模式
+        """
+        ts = fingerprint.timestamp
+        month_start = datetime(ts.year, ts.month, 1)
+        month_end = datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1)
+        month = (month_start.timestamp(), month_end.timestamp())
+        countable = self._countable(fingerprint.domain, fingerprint.tool_chain, fingerprint.success)
+        total = 0
+
+        with self._conn:
+            cursor = self._conn.execute(
+                f"INSERT OR IGNORE INTO fingerprints (ts, {self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._row(fingerprint),
+            )
+            if cursor.rowcount and countable:
+                self._bump(fingerprint.domain, fingerprint.tool_chain, self._bucket(ts), 1)
+
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM fingerprints WHERE ts >= ? AND ts < ?", month
+            ).fetchone()[0]
+            if count > self.MAX_FINGERPRINTS:
+                evicted = self._conn.execute("""
+                    SELECT id, domain, tool_chain, success, ts FROM fingerprints
+                    WHERE ts >= ? AND ts < ? ORDER BY ts LIMIT ?
+                """, (*month, count - self.MAX_FINGERPRINTS)).fetchall()
+                for row in evicted:
+                    if self._countable(row["domain"], row["tool_chain"], row["success"]):
+                        self._bump(row["domain"], row["tool_chain"], int(row["ts"] // self.BUCKET_SECONDS), -1)
+                self._conn.executemany("DELETE FROM fingerprints WHERE id = ?", [(row["id"],) for row in evicted])
+
+            # 过期窗口外的计数桶
+            window_start = self._window_start()
+            self._conn.execute("DELETE FROM fingerprint_groups WHERE bucket < ?", (window_start,))
+            if countable:
+                total = self._conn.execute("""
+                    SELECT COALESCE(SUM(count), 0) FROM fingerprint_groups
+                    WHERE domain = ? AND tool_chain = ? AND bucket >= ?
+                """, (fingerprint.domain, fingerprint.tool_chain, window_start)).fetchone()[0]
+
+        if total >= self.PATTERN_THRESHOLD:
+            return self._emit(fingerprint.domain, fingerprint.tool_chain)
+        return None
+
+    def on_pattern(self, callback: Callable[[DetectedPattern], None]) -> None:
+        """注册模式事件回调（阈值穿越时在 record() 中同步调用）"""
+        self._listeners.append(callback)
+
+    def _emit(self, domain: str, tool_chain: str) -> Optional[DetectedPattern]:
+        """组达到阈值：未知模式则生成、保存并通知"""
+        self._refresh_patterns()
+        if self._is_pattern_known(domain, tool_chain):
+            return None
+        cutoff = (datetime.now() - timedelta(days=self.LOOKBACK_DAYS)).timestamp()
+        fp_ids = [row[0] for row in self._conn.execute("""
+            SELECT id FROM fingerprints
+            WHERE domain = ? AND tool_chain = ? AND success = 1 AND ts >= ?
+            ORDER BY ts DESC
+        """, (domain, tool_chain, cutoff))]
+        if len(fp_ids) < self.PATTERN_THRESHOLD:
+            return None  # 桶按天对齐，窗口边缘可能多算，以精确时间为准
+        if self._is_covered(fp_ids):
+            return None  # 已被相似度聚类出的模式覆盖
+
+        pattern = self._make_pattern(domain, tool_chain, fp_ids)
+        self._remember(pattern)
+        self._save_patterns()
+        self._pending.append(pattern)
+        for callback in self._listeners:
             try:
-                file_month = fp_path.stem  # "2026-02"
-                file_date = datetime.strptime(file_month + "-01", "%Y-%m-%d")
-                if file_date < cutoff:
-                    break
-            except ValueError:
-                continue
+                callback(pattern)
+            except Exception as e:
+                print(f"[PatternDetector] 模式回调失败: {e}")
+        return pattern
 
-        return sorted(result, key=lambda x: x.timestamp, reverse=True)
+    def get_recent_fingerprints(self, days: int = None, limit: int = None) -> list[InteractionFingerprint]:
+        """获取最近 N 天的指纹（从新到旧，limit 限制条数）"""
+        if days is None:
+            days = self.LOOKBACK_DAYS
 
-    def _load_fingerprints_file(self, path: Path) -> list[dict]:
-        """加载指纹文件"""
-        if not path.exists():
-            return []
-        try:
-            return json.loads(path.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, IOError):
-            return []
+        cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+        rows = self._conn.execute(
+            f"SELECT {self._COLUMNS} FROM fingerprints WHERE ts >= ? ORDER BY ts DESC LIMIT ?",
+            (cutoff, -1 if limit is None else limit),
+        ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def domain_stats(self, days: int = None) -> list[tuple[str, int, int]]:
+        """
+        最近 N 天按领域汇总（一次 GROUP BY，不构造指纹对象）
+
+        Returns: [(domain, 次数, 成功次数)]，按次数降序；空领域记为 "other"
+        """
+        if days is None:
+            days = self.LOOKBACK_DAYS
+        cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+        rows = self._conn.execute("""
+            SELECT COALESCE(NULLIF(domain, ''), 'other') AS d, COUNT(*), SUM(success)
+            FROM fingerprints WHERE ts >= ?
+            GROUP BY d ORDER BY 2 DESC, d
+        """, (cutoff,)).fetchall()
+        return [(row[0], row[1], row[2] or 0) for row in rows]
+
+    def count_fingerprints(self, days: int = None, success_only: bool = False) -> int:
+        """最近 N 天的指纹数（只走索引，不构造对象）"""
+        if days is None:
+            days = self.LOOKBACK_DAYS
+        cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+        sql = "SELECT COUNT(*) FROM fingerprints WHERE ts >= ?"
+        if success_only:
+            sql += " AND success = 1"
+        return self._conn.execute(sql, (cutoff,)).fetchone()[0]
+
+    def _crossed_groups(self) -> list[tuple[str, str]]:
+        """计数桶中窗口内累计达到阈值的组"""
+        rows = self._conn.execute("""
+            SELECT domain, tool_chain FROM fingerprint_groups
+            WHERE bucket >= ?
+            GROUP BY domain, tool_chain
+            HAVING SUM(count) >= ?
+        """, (self._window_start(), self.PATTERN_THRESHOLD)).fetchall()
+        return [(row["domain"], row["tool_chain"]) for row in rows]
 
     # ── 模式检测 ──────────────────────────────────────────
 
@@ -219,53 +439,106 @@ class PatternDetector:
         检测重复模式（规则版本，不依赖 LLM）
 
         策略：按 (domain, tool_chain) 分组，同组 >= PATTERN_THRESHOLD 则触发
+
+        未传入指纹时不再重新分组：返回自上次调用以来的模式事件（本进程 record()
+        产生的，以及其他进程写入 patterns.json 的），并用计数桶兜底检查一遍
         """
         if fingerprints is None:
-            fingerprints = self.get_recent_fingerprints()
-
-        if not fingerprints:
-            return []
+            self._refresh_patterns()
+            for domain, tool_chain in self._crossed_groups():
+                if not self._is_pattern_known(domain, tool_chain):
+                    self._emit(domain, tool_chain)
+            new_patterns, self._pending = self._pending, []
+            return new_patterns
 
         # 按 (domain, tool_chain) 分组
-        groups: dict[tuple[str, str], list[InteractionFingerprint]] = defaultdict(list)
+        groups: dict[tuple[str, str], list[str]] = defaultdict(list)
         for fp in fingerprints:
             if fp.success and fp.domain and fp.tool_chain:
-                key = (fp.domain, fp.tool_chain)
-                groups[key].append(fp)
+                groups[(fp.domain, fp.tool_chain)].append(fp.id)
 
         new_patterns = []
-        for (domain, tool_chain), fps in groups.items():
-            if len(fps) < self.PATTERN_THRESHOLD:
+        for (domain, tool_chain), fp_ids in groups.items():
+            if len(fp_ids) < self.PATTERN_THRESHOLD:
                 continue
 
             # 检查是否已有对应的模式
             if self._is_pattern_known(domain, tool_chain):
                 continue
 
-            # 从指纹中提炼模式
-            pattern = DetectedPattern(
-                name=f"{domain} ({tool_chain})",
-                description=f"检测到你经常进行 {domain} 类型的任务，"
-                            f"工具链为 {tool_chain}，"
-                            f"已重复 {len(fps)} 次。",
-                frequency=len(fps),
-                fingerprint_ids=[fp.id for fp in fps],
-                typical_tool_chain=tool_chain.split("→"),
-                suggested_skill_name=self._suggest_skill_name(domain),
-                confidence=min(len(fps) / 10.0, 1.0),
-                status="detected",
-            )
+            pattern = self._make_pattern(domain, tool_chain, fp_ids)
             new_patterns.append(pattern)
-            self._patterns.append(pattern)
+            self._remember(pattern)
 
         if new_patterns:
             self._save_patterns()
 
         return new_patterns
 
+    def _make_pattern(self, domain: str, tool_chain: str, fp_ids: list[str]) -> DetectedPattern:
+        """从同组指纹中提炼模式"""
+        return DetectedPattern(
+            name=f"{domain} ({tool_chain})",
+            description=f"检测到你经常进行 {domain} 类型的任务，"
+                        f"工具链为 {tool_chain}，"
+                        f"已重复 {len(fp_ids)} 次。",
+            frequency=len(fp_ids),
+            fingerprint_ids=fp_ids,
+            typical_tool_chain=tool_chain.split("→"),
+            suggested_skill_name=self._suggest_skill_name(domain),
+            confidence=min(len(fp_ids) / 10.0, 1.0),
+            status="detected",
+        )
+
+    # ── 相似度聚类 ──────────────────────────────────────────
+
+    def detect_clusters(self, fingerprints: list[InteractionFingerprint] = None) -> list[FingerprintCluster]:
+        """
+        本地相似度聚类（MinHash/LSH），返回尚未被已有模式覆盖的簇
+
+        Args:
+            fingerprints: 默认为最近 LOOKBACK_DAYS 天的指纹
+        """
+        self._refresh_patterns()
+        if fingerprints is None:
+            fingerprints = self.get_recent_fingerprints()
+        clusters = cluster_fingerprints(
+            fingerprints, min_size=self.PATTERN_THRESHOLD, clusterer=self._clusterer
+        )
+        return [c for c in clusters if not self._is_covered(c.fingerprint_ids)]
+
+    def detect_similar_patterns(self, fingerprints: list[InteractionFingerprint] = None) -> list[DetectedPattern]:
+        """把未覆盖的相似簇保存为模式（不调用 LLM，名称取簇的代表意图）"""
+        new_patterns = [self._cluster_pattern(c) for c in self.detect_clusters(fingerprints)]
+        for pattern in new_patterns:
+            self._remember(pattern)
+        if new_patterns:
+            self._save_patterns()
+        return new_patterns
+
+    def _cluster_pattern(self, cluster: FingerprintCluster, named: dict = None) -> DetectedPattern:
+        """从簇生成模式；named 为 LLM 给出的 name / description / suggested_skill_name"""
+        named = named or {}
+        return DetectedPattern(
+            name=named.get("name") or f"{cluster.domain or '通用'}: {cluster.representative}",
+            description=named.get("description") or (
+                f"检测到 {cluster.size} 次相似的交互，如「{cluster.representative}」，"
+                f"常用工具链为 {cluster.tool_chain or '无'}。"
+            ),
+            frequency=cluster.size,
+            fingerprint_ids=cluster.fingerprint_ids,
+            typical_tool_chain=cluster.tool_chain.split("→") if cluster.tool_chain else [],
+            suggested_skill_name=named.get("suggested_skill_name") or self._suggest_skill_name(cluster.domain),
+            confidence=round(min(cluster.size / 10.0, 1.0) * cluster.cohesion, 3),
+            status="detected",
+        )
+
     async def detect_patterns_llm(self, fingerprints: list[InteractionFingerprint], llm_call) -> list[DetectedPattern]:
         """
-        用 LLM 做语义聚类检测模式（更智能）
+        相似度聚类检测模式，LLM 只给簇起名
+
+        聚类在本地完成（指纹归属由聚类决定，不再用 intent 子串回配）；
+        LLM 调用失败时使用簇的代表意图作为名称。
 
         Args:
             fingerprints: 最近的指纹列表
@@ -273,96 +546,79 @@ class PatternDetector:
         """
         if not fingerprints or len(fingerprints) < self.PATTERN_THRESHOLD:
             return []
+        clusters = self.detect_clusters(fingerprints)
+        if not clusters:
+            return []
 
-        # 格式化指纹给 LLM
-        fp_summaries = []
-        for fp in fingerprints[:30]:  # 最多 30 条
-            fp_summaries.append(
-                f"- [{fp.timestamp.strftime('%m-%d %H:%M')}] "
-                f"意图: {fp.intent} | 领域: {fp.domain} | "
-                f"工具链: {fp.tool_chain} | 成功: {fp.success}"
+        # 每簇只给 LLM 看少量样例
+        summaries = []
+        for i, c in enumerate(clusters):
+            samples = "；".join(dict.fromkeys(c.intents))
+            if len(samples) > 200:
+                samples = samples[:200] + "…"
+            summaries.append(
+                f"{i}. {c.size} 次 | 领域: {c.domain} | 工具链: {c.tool_chain} | 意图样例: {samples}"
             )
 
-        prompt = f"""你是 Jarvis 的模式分析引擎。分析以下交互指纹，找出重复的行为模式。
+        prompt = f"""你是 Jarvis 的模式分析引擎。以下是本地聚类得到的重复行为簇（最近 {self.LOOKBACK_DAYS} 天），请为每个簇命名。
 
-交互指纹（最近 {self.LOOKBACK_DAYS} 天）:
-{chr(10).join(fp_summaries)}
-
-已有模式（避免重复检测）:
-{chr(10).join(f"- {p.name} (状态: {p.status})" for p in self._patterns) or "无"}
+{chr(10).join(summaries)}
 
 要求:
-1. 只报告出现 >= {self.PATTERN_THRESHOLD} 次的模式
-2. 给出具体的 Skill 名称建议（英文、小写、连字符）
-3. 不要重复已有模式
+1. 名称简短具体（中文）
+2. 给出 Skill 名称建议（英文、小写、连字符）
 
-返回 JSON 数组（如果没有新模式返回空数组）:
+返回 JSON 数组，每个簇一项:
 [
   {{
+    "cluster": 簇编号,
     "name": "模式名称（中文）",
     "description": "描述",
-    "frequency": 出现次数,
-    "suggested_skill_name": "skill-name",
-    "confidence": 0.0-1.0,
-    "fingerprint_intents": ["匹配的 intent 列表"]
+    "suggested_skill_name": "skill-name"
   }}
 ]
 
 只返回 JSON 数组。"""
 
+        named: dict[int, dict] = {}
         try:
-            response = await llm_call(prompt)
-            response = response.strip()
+            response = (await llm_call(prompt)).strip()
             if response.startswith("```"):
                 response = response.split("```")[1]
                 if response.startswith("json"):
                     response = response[4:]
-            
             data = json.loads(response)
-            if not isinstance(data, list):
-                return []
-
-            new_patterns = []
-            for item in data:
-                # 匹配指纹 ID
-                matched_ids = []
-                intents = item.get("fingerprint_intents", [])
-                for fp in fingerprints:
-                    if fp.intent in intents or any(i in fp.intent for i in intents):
-                        matched_ids.append(fp.id)
-
-                pattern = DetectedPattern(
-                    name=item.get("name", "未命名模式"),
-                    description=item.get("description", ""),
-                    frequency=item.get("frequency", 0),
-                    fingerprint_ids=matched_ids,
-                    suggested_skill_name=item.get("suggested_skill_name", ""),
-                    confidence=item.get("confidence", 0.5),
-                    status="detected",
-                )
-                new_patterns.append(pattern)
-                self._patterns.append(pattern)
+            if isinstance(data, list):
+                for item in data:
+                    if isinstance(item, dict) and isinstance(item.get("cluster"), int):
+                        named[item["cluster"]] = item
+        except Exception as e:
+            print(f"[PatternDetector] LLM 模式命名失败，使用默认名称: {e}")
+
+        new_patterns = [self._cluster_pattern(c, named.get(i)) for i, c in enumerate(clusters)]
+        for pattern in new_patterns:
+            self._remember(pattern)
+        self._save_patterns()
+        return new_patterns
 
-            if new_patterns:
-                self._save_patterns()
+    def _is_pattern_known(self, domain: str, tool_chain: str) -> bool:
+        """检查模式是否已存在（name 格式为 "domain (tool_chain)"，rejected 的不算）"""
+        return f"{domain} ({tool_chain})" in self._known
 
-            return new_patterns
+    def _is_covered(self, fp_ids: list[str]) -> bool:
+        """过半指纹已关联到已有模式"""
+        return sum(1 for fp_id in fp_ids if fp_id in self._covered) * 2 >= len(fp_ids)
 
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"[PatternDetector] LLM 模式检测失败: {e}")
-            # 降级到规则检测
-            return self.detect_patterns(fingerprints)
+    def _remember(self, pattern: DetectedPattern) -> None:
+        self._patterns.append(pattern)
+        if pattern.status != "rejected":
+            self._known.add(pattern.name)
+            self._covered.update(pattern.fingerprint_ids)
 
-    def _is_pattern_known(self, domain: str, tool_chain: str) -> bool:
-        """检查模式是否已存在"""
-        for p in self._patterns:
-            if p.status in ("rejected",):
-                continue
-            # 比较 name 格式为 "domain (tool_chain)"
-            expected_name = f"{domain} ({tool_chain})"
-            if p.name == expected_name:
-                return True
-        return False
+    def _rebuild_known(self) -> None:
+        active = [p for p in self._patterns if p.status != "rejected"]
+        self._known = {p.name for p in active}
+        self._covered = {fp_id for p in active for fp_id in p.fingerprint_ids}
 
     def _suggest_skill_name(self, domain: str) -> str:
         """基于领域建议 Skill 名称"""
@@ -378,13 +634,15 @@ class PatternDetector:
     # ── 模式生命周期 ──────────────────────────────────────
 
     def get_patterns(self, status: str = None) -> list[DetectedPattern]:
-        """获取模式列表"""
+        """获取模式列表（patterns.json 被其他进程改过时先重新加载）"""
+        self._refresh_patterns()
         if status:
             return [p for p in self._patterns if p.status == status]
         return list(self._patterns)
 
     def get_actionable_patterns(self) -> list[DetectedPattern]:
         """获取可操作的模式（detected 且未被处理）"""
+        self._refresh_patterns()
         return [p for p in self._patterns if p.status == "detected"]
 
     def update_pattern_status(self, pattern_id: str, status: str) -> bool:
@@ -392,6 +650,7 @@ class PatternDetector:
         for p in self._patterns:
             if p.id == pattern_id:
                 p.status = status
+                self._rebuild_known()
                 self._save_patterns()
                 return True
         return False
@@ -403,18 +662,32 @@ class PatternDetector:
         if not self._patterns_path.exists():
             return []
         try:
+            self._patterns_mtime = self._patterns_path.stat().st_mtime_ns
             data = json.loads(self._patterns_path.read_text(encoding="utf-8"))
             return [DetectedPattern.from_dict(p) for p in data]
         except (json.JSONDecodeError, IOError):
             return []
 
+    def _refresh_patterns(self) -> None:
+        """
+        patterns.json 被其他进程（chat 记录指纹时）改过则重新加载；
+        新出现的 detected 模式作为事件交给下一次 detect_patterns()
+        """
+        try:
+            mtime = self._patterns_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._patterns_mtime:
+            return
+        seen = {p.id for p in self._patterns}
+        self._patterns = self._load_patterns()
+        self._rebuild_known()
+        self._pending.extend(p for p in self._patterns if p.id not in seen and p.status == "detected")
+
     def _save_patterns(self) -> None:
-        """保存模式"""
-        data = [p.to_dict() for p in self._patterns]
-        self._patterns_path.write_text(
-            json.dumps(data, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        """原子保存模式（后台写入线程也会调用，中途退出不会截断文件）"""
+        atomic_write_json(self._patterns_path, [p.to_dict() for p in self._patterns], indent=2)
+        self._patterns_mtime = self._patterns_path.stat().st_mtime_ns
 
     # ── LLM 辅助：从对话中提取指纹 ────────────────────────
 
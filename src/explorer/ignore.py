@@ -0,0 +1,293 @@
+"""
+探索器 - 忽略规则（gitignore 语义）
+
+Daemon 文件监控与目录扫描共用一套忽略引擎:
+- 规则只编译一次：连续的同向规则合并成一个正则
+- 支持 .gitignore / .jarvisignore（放在哪个目录就相对哪个目录生效）
+- 支持 `!` 取反、`/` 锚定、尾部 `/` 仅匹配目录、`*` `?` `**` `[...]`
+- 被忽略目录下的所有内容都被忽略（与 git 一致，子项无法用 `!` 取回）
+"""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+IGNORE_FILES = (".gitignore", ".jarvisignore")
+
+PathLike = Union[str, Path]
+
+
+def translate_pattern(pattern: str) -> Optional[tuple[str, bool]]:
+    """
+    把一行 gitignore 规则翻译成正则
+
+    匹配对象是相对规则所在目录的路径，目录以 `/` 结尾。
+    Returns: (regex, negated)，空行/注释返回 None
+    """
+    pattern = pattern.rstrip("\n")
+    if not pattern.strip() or pattern.startswith("#"):
+        return None
+    pattern = pattern.rstrip()
+
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+        pattern = pattern[1:]
+
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # 中间或开头带 / 的规则相对所在目录锚定，否则匹配任意层级的名字
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+
+    i, n = 0, len(pattern)
+    body = []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            body.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            body.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            body.append(".*")
+            i += 2
+        elif c == "*":
+            body.append("[^/]*")
+            i += 1
+        elif c == "?":
+            body.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                body.append(re.escape(c))
+                i += 1
+            else:
+                cls = pattern[i + 1:end]
+                if cls.startswith("!"):
+                    cls = "^" + cls[1:]
+                body.append(f"[{cls.replace(chr(92), chr(92) * 2)}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < n:
+            body.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            body.append(re.escape(c))
+            i += 1
+
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/" if dir_only else "/?"
+    return f"{prefix}{''.join(body)}{suffix}", negated
+
+
+class IgnoreRules:
+    """
+    一组按顺序生效的规则（后出现的优先）
+
+    连续的同向规则合并成一个正则，匹配时从后往前找第一个命中的段。
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._segments: list[tuple[re.Pattern, bool]] = []
+        run: list[str] = []
+        run_negated = False
+        for pattern in patterns:
+            translated = translate_pattern(pattern)
+            if translated is None:
+                continue
+            regex, negated = translated
+            if run and negated != run_negated:
+                self._segments.append((self._compile(run), run_negated))
+                run = []
+            run.append(regex)
+            run_negated = negated
+        if run:
+            self._segments.append((self._compile(run), run_negated))
+
+    @staticmethod
+    def _compile(regexes: list[str]) -> re.Pattern:
+        return re.compile("(?:" + "|".join(regexes) + r")\Z")
+
+    def __bool__(self) -> bool:
+        return bool(self._segments)
+
+    def match(self, rel_path: str) -> Optional[bool]:
+        """True=忽略，False=被 `!` 取回，None=没有规则命中"""
+        for regex, negated in reversed(self._segments):
+            if regex.match(rel_path):
+                return not negated
+        return None
+
+    @classmethod
+    def from_file(cls, path: Path) -> "IgnoreRules":
+        try:
+            return cls(path.read_text(encoding="utf-8", errors="replace").splitlines())
+        except OSError:
+            return cls()
+
+
+class IgnoreMatcher:
+    """
+    忽略引擎
+
+    Args:
+        patterns: 全局规则（gitignore 语法，相对各 root 生效）
+        roots: 监控/扫描的根目录；root 之上的路径段不参与匹配
+    """
+
+    # 目录判定缓存上限（超出后整体清空）
+    MAX_CACHE = 20000
+
+    def __init__(self, patterns: Iterable[str] = (), roots: Iterable[PathLike] = ()):
+        self._global = IgnoreRules(patterns)
+        self._roots = sorted({os.path.abspath(str(r)) for r in roots}, key=len, reverse=True)
+        self._local: dict[str, IgnoreRules] = {}  # 目录 → 该目录下 ignore 文件的规则
+        self._loaded: set[str] = set()
+        self._dir_cache: dict[str, bool] = {}
+
+    # ── 规则加载 ──────────────────────────────────────────
+
+    def load_dir(self, directory: PathLike, reload: bool = False) -> bool:
+        """
+        读取目录下的 .gitignore / .jarvisignore（每个目录只读一次）
+        Returns: 该目录是否有规则
+        """
+        directory = os.path.abspath(str(directory))
+        if directory in self._loaded and not reload:
+            return directory in self._local
+
+        patterns: list[str] = []
+        for name in IGNORE_FILES:
+            path = Path(directory) / name
+            if path.is_file():
+                try:
+                    patterns.extend(path.read_text(encoding="utf-8", errors="replace").splitlines())
+                except OSError as e:
+                    logger.debug("读取 %s 失败: %s", path, e)
+
+        self._loaded.add(directory)
+        rules = IgnoreRules(patterns)
+        had_rules = directory in self._local
+        if rules:
+            self._local[directory] = rules
+        else:
+            self._local.pop(directory, None)
+        if rules or had_rules:
+            self._dir_cache.clear()
+        return bool(rules)
+
+    # ── 匹配 ──────────────────────────────────────────────
+
+    def is_ignored(self, path: PathLike, is_dir: bool = False) -> bool:
+        path = os.path.abspath(str(path))
+        root = self._root_of(path)
+        if path == root:
+            return False
+        parent = os.path.dirname(path)
+        if parent != root and self._is_dir_ignored(parent, root):
+            return True
+        return self._match(path, root, is_dir)
+
+    def _root_of(self, path: str) -> str:
+        for root in self._roots:
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return os.path.dirname(path)
+
+    def _is_dir_ignored(self, directory: str, root: str) -> bool:
+        cached = self._dir_cache.get(directory)
+        if cached is not None:
+            return cached
+
+        parent = os.path.dirname(directory)
+        ignored = (
+            (parent != root and len(parent) > len(root) and self._is_dir_ignored(parent, root))
+            or self._match(directory, root, True)
+        )
+        if len(self._dir_cache) >= self.MAX_CACHE:
+            self._dir_cache.clear()
+        self._dir_cache[directory] = ignored
+        return ignored
+
+    def _match(self, path: str, root: str, is_dir: bool) -> bool:
+        """按 全局 → 浅层 ignore 文件 → 深层 ignore 文件 的顺序，最后命中的规则生效"""
+        tail = "/" if is_dir else ""
+        rel = path[len(root) + 1:].replace(os.sep, "/")
+        decision = self._global.match(rel + tail) if self._global else None
+
+        if self._local:
+            base = root
+            rest = rel
+            while True:
+                rules = self._local.get(base)
+                if rules is not None:
+                    result = rules.match(rest + tail)
+                    if result is not None:
+                        decision = result
+                head, sep, rest = rest.partition("/")
+                if not sep:
+                    break
+                base = os.path.join(base, head)
+
+        return bool(decision)
+
+
+def plan_watches(
+    root: PathLike,
+    matcher: IgnoreMatcher,
+    max_watches: int = 64,
+) -> list[tuple[str, bool]]:
+    """
+    为 root 规划 watchdog 监控点，避免递归监控被忽略的子树（如 node_modules）
+
+    - 子树里没有被忽略目录的 → 一个递归监控
+    - 否则该目录非递归监控，再对未忽略的子目录分别规划
+    - 遍历时顺带加载各目录的 ignore 文件
+    - 规划结果超过 max_watches 时退回单个递归监控（事件仍会被过滤）
+
+    Returns: [(path, recursive), ...]
+    """
+    root = os.path.abspath(str(root))
+    children: dict[str, list[str]] = {}
+    tainted: set[str] = set()  # 子树中含有被忽略目录
+
+    for dirpath, dirnames, _ in os.walk(root):
+        matcher.load_dir(dirpath)
+        kept = []
+        for name in dirnames:
+            child = os.path.join(dirpath, name)
+            if os.path.islink(child):
+                continue
+            if matcher.is_ignored(child, is_dir=True):
+                ancestor = dirpath
+                while ancestor not in tainted:
+                    tainted.add(ancestor)
+                    if ancestor == root:
+                        break
+                    ancestor = os.path.dirname(ancestor)
+            else:
+                kept.append(name)
+        dirnames[:] = kept
+        children[dirpath] = [os.path.join(dirpath, name) for name in kept]
+
+    plan: list[tuple[str, bool]] = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        if directory not in tainted:
+            plan.append((directory, True))
+        else:
+            plan.append((directory, False))
+            stack.extend(children.get(directory, ()))
+        if len(plan) > max_watches:
+            logger.info("%s 需要的监控点超过 %d 个，改为递归监控", root, max_watches)
+            return [(root, True)]
+    return plan
@@ -8,6 +8,7 @@ import logging
 
 from .signatures import PROJECT_SIGNATURES, ProjectSignature, ProjectType
 from .context_extractor import extract_project_context
+from .ignore import IgnoreMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +30,7 @@ def scan_directory(
     Args:
         root_path: 根目录路径
         max_depth: 最大扫描深度
-        ignore_patterns: 忽略的目录模式
+        ignore_patterns: 忽略规则（gitignore 语法；目录下的 .gitignore / .jarvisignore 也会生效）
         
     Returns:
         识别到的项目列表
@@ -44,15 +45,13 @@ def scan_directory(
     
     projects: List = []
     visited: set = set()
-    
-    def should_ignore(path: Path) -> bool:
-        return any(pattern in path.parts for pattern in ignore_patterns)
+    matcher = IgnoreMatcher(ignore_patterns, roots=[root_path])
     
     def scan_recursive(current_path: Path, depth: int):
         if depth > max_depth:
             return
         
-        if not current_path.is_dir() or should_ignore(current_path):
+        if not current_path.is_dir() or matcher.is_ignored(current_path, is_dir=True):
             return
         
         # 检查当前目录是否匹配某个项目类型
@@ -65,6 +64,7 @@ def scan_directory(
             return
         
         # 继续扫描子目录
+        matcher.load_dir(current_path)
         try:
             for child in current_path.iterdir():
                 if child.is_dir():
@@ -5,6 +5,7 @@ Phase 3: 让 Jarvis 在对话中调用工具
 Phase 4.5: 三层防御 — token-aware 窗口 + LLM 压缩 + graceful fallback
 """
 
+import asyncio
 import json
 import logging
 from dataclasses import dataclass, field
@@ -13,6 +14,15 @@ from typing import Optional
 import httpx
 
 from ..skills.loader import discover_skills, format_skills_prompt
+from .context import (
+    TokenLedger,
+    estimate_tokens,
+    find_window_start,
+    drop_orphan_tool_messages,
+    format_for_summary,
+    is_cut_point,
+    RollingSummarizer,
+)
 from ..tools.registry import get_registry, ToolRegistry
 from ..tools.base import ToolResult
 
@@ -55,6 +65,7 @@ class JarvisLLMClient:
     )
 
     MAX_TOOL_ROUNDS = 10  # 防止无限循环
+    MAX_TOOL_CONCURRENCY = 4  # 同一轮内并发执行的工具数上限
 
     # ── Phase 4.5: Context Window Management ──
     MODEL_CONTEXT = {
@@ -67,6 +78,8 @@ class JarvisLLMClient:
     }
     DEFAULT_CONTEXT_LIMIT = 128_000  # 未知模型的保守默认值
     RESPONSE_RESERVE = 4096  # 预留给回复的 token
+    BACKGROUND_COMPACTION_RATIO = 0.5  # 超过此比例，轮次之间后台压缩
+    PROACTIVE_COMPACTION_RATIO = 0.7  # 超过此比例，请求中立即启动后台压缩
     SYSTEM_RESERVE = 8000  # 预留给 system prompt + tools schema
 
     COMPACTION_SUMMARY_PROMPT = (
@@ -77,18 +90,93 @@ class JarvisLLMClient:
     # 技能缓存（启动时发现一次，整个生命周期复用）
     _skills_prompt_cache: Optional[str] = None
 
+    # ── 连接池：所有轮次 / 压缩 / simple_ask 共用一个长连接客户端 ──
+    REQUEST_TIMEOUT = 120.0  # streaming 对话
+    COMPACTION_TIMEOUT = 30.0  # 摘要调用
+    POOL_MAX_CONNECTIONS = 10
+    POOL_MAX_KEEPALIVE = 5
+    POOL_KEEPALIVE_EXPIRY = 60.0  # 秒
+
     def __init__(
         self,
         base_url: str = "http://localhost:23335/api/openai",
         model: str = "claude-sonnet-4",
         auth_token: str = "",
         registry: Optional[ToolRegistry] = None,
+        http2: bool = False,
+        pool_limits: Optional[httpx.Limits] = None,
+        max_tool_concurrency: Optional[int] = None,
     ):
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.auth_token = auth_token
         self.registry = registry or get_registry()
         self._system_prompt: Optional[str] = None  # 延迟构建
+        self.max_tool_concurrency = max_tool_concurrency or self.MAX_TOOL_CONCURRENCY
+        self._ledger = TokenLedger()  # 当前对话的 token 账本
+        self._summarizer = RollingSummarizer(
+            self._compact_summarize, self.COMPACTION_SUMMARY_PROMPT,
+        )
+
+        # HTTP 连接池（延迟创建，绑定到创建时的事件循环）
+        self.http2 = http2
+        self.pool_limits = pool_limits or httpx.Limits(
+            max_connections=self.POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=self.POOL_MAX_KEEPALIVE,
+            keepalive_expiry=self.POOL_KEEPALIVE_EXPIRY,
+        )
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ── HTTP 连接池 ──
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """
+        获取共享的 AsyncClient（keep-alive 连接池）。
+
+        httpx 的连接绑定在事件循环上：如果调用方换了循环
+        （例如每轮 asyncio.run），旧连接池不可再用，直接重建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is not None and not self._http.is_closed and self._http_loop is loop:
+            return self._http
+
+        if self.http2:
+            try:
+                import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+            except ImportError:
+                logger.warning("未安装 h2，HTTP/2 不可用，回退到 HTTP/1.1")
+                self.http2 = False
+
+        # base_url 约定不含 /v1，代码中拼接完整路径
+        self._http = httpx.AsyncClient(
+            timeout=self.REQUEST_TIMEOUT,
+            limits=self.pool_limits,
+            http2=self.http2,
+            trust_env=False,
+        )
+        self._http_loop = loop
+        return self._http
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.auth_token}",
+            "Content-Type": "application/json",
+        }
+
+    async def aclose(self) -> None:
+        """关闭连接池（并取消未完成的后台压缩）"""
+        self._summarizer.cancel()
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+        self._http_loop = None
+
+    async def __aenter__(self) -> "JarvisLLMClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
 
     def reload_skills(self) -> None:
         """清除缓存，下次调用时重新发现技能。支持热加载。"""
@@ -122,11 +210,7 @@ class JarvisLLMClient:
         保守估算 token 数。
         中文字符按 1 token，ASCII 字符按 0.25 token。
         """
-        if not text:
-            return 0
-        cjk = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
-        ascii_chars = len(text) - cjk
-        return cjk + ascii_chars // 4
+        return estimate_tokens(text)
 
     def _get_context_limit(self) -> int:
         """获取当前模型的 context window 大小"""
@@ -140,25 +224,19 @@ class JarvisLLMClient:
         """
         按 token 预算从后往前填充消息。
         替代 messages[-20:] 硬截断。
+
+        基于账本前缀和线性求起点；assistant 的 tool_calls 与其 tool 结果
+        作为一个整体保留或丢弃，绝不发送孤立的 tool 消息。
         """
         budget = max_tokens - self.RESPONSE_RESERVE - self.SYSTEM_RESERVE
 
-        fitted: list[dict] = []
-        used = 0
-
-        for msg in reversed(messages):
-            content = msg.get("content", "") or ""
-            msg_tokens = self._estimate_tokens(content)
-
-            if used + msg_tokens > budget:
-                break
-
-            fitted.insert(0, msg)
-            used += msg_tokens
+        self._ledger.sync(messages)
+        prefix = self._ledger.prefix
 
-        # 至少保留最近 2 条消息（一问一答），即使超预算
-        if len(fitted) < 2 and len(messages) >= 2:
-            fitted = messages[-2:]
+        # 至少保留最近 2 个单元（一问一答），即使超预算
+        start = find_window_start(messages, prefix, budget, min_units=2)
+        fitted = drop_orphan_tool_messages(messages[start:])
+        used = prefix[len(messages)] - prefix[start]
 
         logger.debug(
             "Context window: %d messages fitted, ~%d tokens used (budget: %d)",
@@ -176,6 +254,7 @@ class JarvisLLMClient:
 
         保留最近 keep_recent 条原始消息，
         前面的压缩为一条 system message。
+        同步阻塞，仅用于 context 超限 (400) 的兜底；常规压缩由后台 RollingSummarizer 完成。
 
         Returns:
             (压缩后的消息列表, 是否执行了压缩)
@@ -183,15 +262,18 @@ class JarvisLLMClient:
         if len(messages) <= keep_recent:
             return messages, False
 
-        old_messages = messages[:-keep_recent]
-        recent_messages = messages[-keep_recent:]
+        # 切分点不能落在 tool 结果上，否则保留部分以孤立的 tool 消息开头
+        split = len(messages) - keep_recent
+        while split > 0 and not is_cut_point(messages[split]):
+            split -= 1
+        if split == 0:
+            return messages, False
+
+        old_messages = messages[:split]
+        recent_messages = messages[split:]
 
         # 只提取 user/assistant 的内容（跳过 tool results 等）
-        conversation = "\n".join(
-            f"[{m['role']}]: {(m.get('content') or '')[:500]}"
-            for m in old_messages
-            if m.get("role") in ("user", "assistant") and m.get("content")
-        )
+        conversation = format_for_summary(old_messages)
 
         if not conversation.strip():
             return recent_messages, True
@@ -215,28 +297,31 @@ class JarvisLLMClient:
         )
         return [summary_msg] + recent_messages, True
 
+    def _schedule_background_compaction(self, messages: list[dict]) -> None:
+        """一轮结束后，历史超过软阈值就在后台摘要旧消息段，供下一轮使用"""
+        limit = self._get_context_limit() * self.BACKGROUND_COMPACTION_RATIO
+        if self._ledger.sync(messages) > limit and self._summarizer.schedule(messages):
+            logger.info("历史超过 %d%% 上下文，已启动后台摘要", self.BACKGROUND_COMPACTION_RATIO * 100)
+
     async def _compact_summarize(self, prompt: str) -> str:
         """
         独立的摘要 LLM 调用。
         不走 chat_with_tools，避免递归触发 compaction。
         """
-        async with httpx.AsyncClient(timeout=30.0, trust_env=False) as client:
-            response = await client.post(
-                f"{self.base_url}/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.auth_token}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": self.model,
-                    "max_tokens": 512,
-                    "messages": [{"role": "user", "content": prompt}],
-                },
-            )
-            if response.status_code != 200:
-                raise RuntimeError(f"Compaction API 错误: {response.status_code}")
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
+        response = await self._get_http().post(
+            f"{self.base_url}/v1/chat/completions",
+            headers=self._headers(),
+            json={
+                "model": self.model,
+                "max_tokens": 512,
+                "messages": [{"role": "user", "content": prompt}],
+            },
+            timeout=self.COMPACTION_TIMEOUT,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Compaction API 错误: {response.status_code}")
+        data = response.json()
+        return data["choices"][0]["message"]["content"]
 
     async def chat_with_tools(
         self,
@@ -245,6 +330,7 @@ class JarvisLLMClient:
         on_tool_start=None,
         on_tool_end=None,
         on_compaction=None,
+        background_compaction: bool = True,
     ) -> str:
         """
         带工具调用的完整对话流程
@@ -260,6 +346,8 @@ class JarvisLLMClient:
             on_tool_start: 回调——开始执行工具 (tool_name, args -> None)
             on_tool_end: 回调——工具执行完毕 (tool_name, ToolResult -> None)
             on_compaction: 回调——对话被压缩时调用 (None -> None)
+            background_compaction: 是否在后台摘要旧历史（单次提问不会复用历史，
+                应传 False，免得发出随即被取消的摘要请求；超长时仍由窗口裁剪兜底）
 
         Returns:
             最终的助手回复文本
@@ -273,16 +361,15 @@ class JarvisLLMClient:
         MAX_COMPACTION_RETRIES = 2
 
         for _round in range(self.MAX_TOOL_ROUNDS):
-            # Phase 4.5: 主动压缩 — 消息过多时先压缩再发送
-            total_tokens = sum(
-                self._estimate_tokens(m.get("content", "") or "")
-                for m in messages
-            )
-            if total_tokens > self._get_context_limit() * 0.7:
-                logger.info("主动压缩: ~%d tokens 超过 70%% 限制", total_tokens)
-                messages[:], was_compacted = await self._compact_messages(messages)
-                if was_compacted and on_compaction:
-                    on_compaction()
+            # 后台摘要已完成 → 替换早期消息；未完成则不等待
+            if self._summarizer.apply(messages) and on_compaction:
+                on_compaction()
+
+            # Phase 4.5: 主动压缩 — 消息过多时启动后台摘要，本轮由窗口裁剪兜底
+            total_tokens = self._ledger.sync(messages)
+            if background_compaction and total_tokens > self._get_context_limit() * self.PROACTIVE_COMPACTION_RATIO:
+                if self._summarizer.schedule(messages):
+                    logger.info("主动压缩: ~%d tokens 超过 70%% 限制，后台摘要中", total_tokens)
 
             # Phase 4.5: Token-aware 窗口替代 messages[-20:]
             context_limit = self._get_context_limit()
@@ -300,89 +387,86 @@ class JarvisLLMClient:
             content_parts = []
             tool_calls_acc: dict[int, dict] = {}
 
-            # base_url 约定不含 /v1，代码中拼接完整路径
-            async with httpx.AsyncClient(timeout=120.0, trust_env=False) as client:
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.auth_token}",
-                        "Content-Type": "application/json",
-                    },
-                    json=payload,
-                ) as response:
-                    if response.status_code != 200:
-                        error_body = ""
-                        async for chunk in response.aiter_text():
-                            error_body += chunk
-
-                        # Phase 4.5: Context window 爆了 → 压缩后重试
-                        error_lower = error_body.lower()
-                        if response.status_code == 400 and (
-                            "context" in error_lower
-                            or "token" in error_lower
-                            or "too long" in error_lower
-                            or "maximum" in error_lower
-                        ):
-                            logger.warning(
-                                "Context window exceeded (status=%d), compacting...",
-                                response.status_code,
-                            )
-                            if compaction_retries >= MAX_COMPACTION_RETRIES:
-                                raise RuntimeError(
-                                    f"多次压缩后仍超出 context window，"
-                                    f"请缩短单条消息长度或开新对话"
-                                )
-                            compaction_retries += 1
-                            messages[:], compacted = await self._compact_messages(messages)
-                            if compacted and on_compaction:
-                                on_compaction()
-                            continue  # 重试当前 round
-
-                        raise RuntimeError(
-                            f"API 错误 {response.status_code}: {error_body[:500]}"
+            # 复用共享连接池（keep-alive），不再每轮握手
+            async with self._get_http().stream(
+                "POST",
+                f"{self.base_url}/v1/chat/completions",
+                headers=self._headers(),
+                json=payload,
+            ) as response:
+                if response.status_code != 200:
+                    error_body = ""
+                    async for chunk in response.aiter_text():
+                        error_body += chunk
+
+                    # Phase 4.5: Context window 爆了 → 压缩后重试
+                    error_lower = error_body.lower()
+                    if response.status_code == 400 and (
+                        "context" in error_lower
+                        or "token" in error_lower
+                        or "too long" in error_lower
+                        or "maximum" in error_lower
+                    ):
+                        logger.warning(
+                            "Context window exceeded (status=%d), compacting...",
+                            response.status_code,
                         )
-
-                    async for line in response.aiter_lines():
-                        if not line or not line.startswith("data: "):
-                            continue
-                        data_str = line[6:]
-                        if data_str == "[DONE]":
-                            break
-
-                        try:
-                            chunk = json.loads(data_str)
-                        except json.JSONDecodeError:
-                            continue
-
-                        choice = chunk.get("choices", [{}])[0]
-                        delta = choice.get("delta", {})
-
-                        # 文字内容
-                        if delta.get("content"):
-                            text = delta["content"]
-                            content_parts.append(text)
-                            if on_content:
-                                on_content(text)
-
-                        # 工具调用（增量累积）
-                        if delta.get("tool_calls"):
-                            for tc in delta["tool_calls"]:
-                                idx = tc.get("index", 0)
-                                if idx not in tool_calls_acc:
-                                    tool_calls_acc[idx] = {
-                                        "id": tc.get("id", f"call_{idx}"),
-                                        "name": "",
-                                        "arguments": "",
-                                    }
-                                if tc.get("id"):
-                                    tool_calls_acc[idx]["id"] = tc["id"]
-                                if tc.get("function", {}).get("name"):
-                                    tool_calls_acc[idx]["name"] = tc["function"]["name"]
-                                if tc.get("function", {}).get("arguments"):
-                                    tool_calls_acc[idx]["arguments"] += tc["function"][
-                                        "arguments"
-                                    ]
+                        if compaction_retries >= MAX_COMPACTION_RETRIES:
+                            raise RuntimeError(
+                                f"多次压缩后仍超出 context window，"
+                                f"请缩短单条消息长度或开新对话"
+                            )
+                        compaction_retries += 1
+                        self._summarizer.cancel()
+                        messages[:], compacted = await self._compact_messages(messages)
+                        if compacted and on_compaction:
+                            on_compaction()
+                        continue  # 重试当前 round
+
+                    raise RuntimeError(
+                        f"API 错误 {response.status_code}: {error_body[:500]}"
+                    )
+
+                async for line in response.aiter_lines():
+                    if not line or not line.startswith("data: "):
+                        continue
+                    data_str = line[6:]
+                    if data_str == "[DONE]":
+                        break
+
+                    try:
+                        chunk = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+
+                    choice = chunk.get("choices", [{}])[0]
+                    delta = choice.get("delta", {})
+
+                    # 文字内容
+                    if delta.get("content"):
+                        text = delta["content"]
+                        content_parts.append(text)
+                        if on_content:
+                            on_content(text)
+
+                    # 工具调用（增量累积）
+                    if delta.get("tool_calls"):
+                        for tc in delta["tool_calls"]:
+                            idx = tc.get("index", 0)
+                            if idx not in tool_calls_acc:
+                                tool_calls_acc[idx] = {
+                                    "id": tc.get("id", f"call_{idx}"),
+                                    "name": "",
+                                    "arguments": "",
+                                }
+                            if tc.get("id"):
+                                tool_calls_acc[idx]["id"] = tc["id"]
+                            if tc.get("function", {}).get("name"):
+                                tool_calls_acc[idx]["name"] = tc["function"]["name"]
+                            if tc.get("function", {}).get("arguments"):
+                                tool_calls_acc[idx]["arguments"] += tc["function"][
+                                    "arguments"
+                                ]
 
             content_text = "".join(content_parts)
 
@@ -390,6 +474,8 @@ class JarvisLLMClient:
             if not tool_calls_acc:
                 full_reply += content_text
                 messages.append({"role": "assistant", "content": content_text})
+                if background_compaction:
+                    self._schedule_background_compaction(messages)
                 return full_reply
 
             # Case 2: 有工具调用 → 执行，追加结果，再循环
@@ -407,27 +493,43 @@ class JarvisLLMClient:
             if content_text:
                 full_reply += content_text
 
-            # 执行每个工具
-            for tc_info in tool_calls_acc.values():
-                tool_name = tc_info["name"]
-                tool_id = tc_info["id"]
-
+            # 执行工具：互不冲突的调用并发，结果按 tool_call_id 原顺序回传
+            # 参数不是 JSON 对象（如 ["a"]）的调用直接拒绝，不交给工具
+            calls = []
+            rejected: dict[int, ToolResult] = {}
+            for n, tc_info in enumerate(tool_calls_acc.values()):
                 try:
                     args = json.loads(tc_info["arguments"]) if tc_info["arguments"] else {}
                 except json.JSONDecodeError:
                     args = {}
+                if not isinstance(args, dict):
+                    rejected[n] = ToolResult(
+                        success=False,
+                        output="",
+                        error=f"Tool arguments must be a JSON object, got {type(args).__name__}",
+                    )
+                    if on_tool_start:
+                        on_tool_start(tc_info["name"], args)
+                    if on_tool_end:
+                        on_tool_end(tc_info["name"], rejected[n])
+                    continue
+                calls.append((tc_info["name"], args))
+
+            executed = iter(await self.registry.execute_many(
+                calls,
+                max_concurrency=self.max_tool_concurrency,
+                on_start=on_tool_start,
+                on_end=on_tool_end,
+            ))
+            results = [
+                rejected[n] if n in rejected else next(executed)
+                for n in range(len(tool_calls_acc))
+            ]
 
-                if on_tool_start:
-                    on_tool_start(tool_name, args)
-
-                result = await self.registry.execute(tool_name, **args)
-
-                if on_tool_end:
-                    on_tool_end(tool_name, result)
-
+            for tc_info, result in zip(tool_calls_acc.values(), results):
                 messages.append({
                     "role": "tool",
-                    "tool_call_id": tool_id,
+                    "tool_call_id": tc_info["id"],
                     "content": result.to_message(),
                 })
 
@@ -439,4 +541,4 @@ class JarvisLLMClient:
         return await self.chat_with_tools(messages)
 
 
-__all__ = ["JarvisLLMClient", "ToolCall", "StreamChunk"]
+__all__ = ["JarvisLLMClient", "ToolCall", "StreamChunk", "TokenLedger"]
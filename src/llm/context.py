@@ -0,0 +1,320 @@
+"""
+Context Window 辅助 — token 估算与账本
+
+Phase 4.5: 每条消息只在加入对话时估算一次，缓存在 TokenLedger 中，
+chat_with_tools 每轮只需处理新增消息，而不是重扫整个历史。
+"""
+
+import asyncio
+import logging
+import re
+from typing import Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 连续的 CJK 字符段（按段匹配，比逐字符判断少得多的 Python 层开销）
+_CJK_RUN = re.compile("[\u4e00-\u9fff]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    保守估算 token 数。
+    中文字符按 1 token，其余字符按 0.25 token。
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        return len(text) // 4
+    cjk = sum(map(len, _CJK_RUN.findall(text)))
+    return cjk + (len(text) - cjk) // 4
+
+
+def estimate_message_tokens(msg: dict) -> int:
+    """估算单条消息的 token 数（content + tool_calls 的函数名与参数）"""
+    tokens = estimate_tokens(msg.get("content") or "")
+    for tc in msg.get("tool_calls") or ():
+        func = tc.get("function") or {}
+        tokens += estimate_tokens(func.get("name") or "")
+        tokens += estimate_tokens(func.get("arguments") or "")
+    return tokens
+
+
+class TokenLedger:
+    """
+    对话 token 账本
+
+    与 messages 列表保持同步：
+    - 追加的消息只估算一次（缓存 + 运行总数 + 前缀和）
+    - 列表被整体替换（如压缩后 messages[:] = ...）时自动重建
+    """
+
+    def __init__(self):
+        self._messages: list[dict] = []  # 持有引用，保证身份比较可靠
+        self._counts: list[int] = []
+        self._prefix: list[int] = [0]  # _prefix[i] = 前 i 条消息的 token 总数
+
+    def reset(self) -> None:
+        self._messages = []
+        self._counts = []
+        self._prefix = [0]
+
+    def append(self, msg: dict) -> int:
+        """记录一条新消息，返回它的 token 数"""
+        tokens = estimate_message_tokens(msg)
+        self._messages.append(msg)
+        self._counts.append(tokens)
+        self._prefix.append(self._prefix[-1] + tokens)
+        return tokens
+
+    def extend(self, messages: Iterable[dict]) -> None:
+        for msg in messages:
+            self.append(msg)
+
+    def sync(self, messages: list[dict]) -> int:
+        """
+        与 messages 对齐并返回总 token 数。
+
+        只要已记录的首尾消息仍在原位，就只估算新增的尾部；
+        否则视为历史被改写，整体重建。
+        """
+        n = len(self._messages)
+        if n and (
+            len(messages) < n
+            or messages[0] is not self._messages[0]
+            or messages[n - 1] is not self._messages[n - 1]
+        ):
+            self.reset()
+            n = 0
+        if len(messages) > n:
+            self.extend(messages[n:])
+        return self.total
+
+    @property
+    def total(self) -> int:
+        return self._prefix[-1]
+
+    @property
+    def counts(self) -> list[int]:
+        """每条消息的 token 数（与已同步的 messages 一一对应）"""
+        return self._counts
+
+    @property
+    def prefix(self) -> list[int]:
+        """前缀和：prefix[j] - prefix[i] 即 messages[i:j] 的 token 数"""
+        return self._prefix
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+# ── 窗口裁剪 ──────────────────────────────────────────────
+#
+# assistant(tool_calls) 与其后的 role=tool 结果是一个整体，只能在
+# 非 tool 消息处切分，否则 API 会因孤立的 tool 消息返回 400。
+
+
+def is_cut_point(msg: dict) -> bool:
+    """messages[i:] 以该消息开头是否合法（不会留下孤立的 tool 结果）"""
+    return msg.get("role") != "tool"
+
+
+def find_window_start(
+    messages: list[dict],
+    prefix: list[int],
+    budget: int,
+    min_units: int = 2,
+) -> int:
+    """
+    找到能放进 budget 的最早切分点，返回起始下标（O(n)，不复制列表）。
+
+    prefix 为 TokenLedger.prefix（与 messages 对齐的前缀和）。
+    预算不足时至少保留最后 min_units 个完整单元（一问一答）。
+    """
+    n = len(messages)
+    total = prefix[n]
+    start = n
+    fallback = n
+    units = 0
+    fits = True
+    for i in range(n - 1, -1, -1):
+        if not is_cut_point(messages[i]):
+            continue
+        units += 1
+        if units <= min_units:
+            fallback = i
+        if fits and total - prefix[i] <= budget:
+            start = i
+        else:
+            fits = False
+            if units >= min_units:
+                break
+    return min(start, fallback)
+
+
+def drop_orphan_tool_messages(messages: list[dict]) -> list[dict]:
+    """去掉找不到对应 assistant tool_calls 的 tool 消息"""
+    result: list[dict] = []
+    open_ids: set = set()
+    for msg in messages:
+        if msg.get("role") == "tool":
+            if msg.get("tool_call_id") in open_ids:
+                result.append(msg)
+            continue
+        open_ids = {tc.get("id") for tc in msg.get("tool_calls") or ()}
+        result.append(msg)
+    return result
+
+
+# ── 后台滚动摘要 ──────────────────────────────────────────
+
+
+def format_for_summary(messages: Iterable[dict], max_chars: int = 500) -> str:
+    """把消息整理成摘要输入（只取 user/assistant 的文字，跳过 tool 结果）"""
+    return "\n".join(
+        f"[{m['role']}]: {(m.get('content') or '')[:max_chars]}"
+        for m in messages
+        if m.get("role") in ("user", "assistant") and m.get("content")
+    )
+
+
+class RollingSummarizer:
+    """
+    后台增量压缩
+
+    - 在两轮对话之间启动后台任务，只摘要上次之后新增的旧消息段
+    - 分层摘要：同层满 fan_in 段后合并为上一层的一段（摘要的摘要），
+      永远不会重新摘要整个前缀
+    - 请求路径只调用 apply()：任务已完成就替换前缀，没完成就什么也不做
+    """
+
+    SUMMARY_PREFIX = "[对话摘要]"
+
+    MERGE_PROMPT = (
+        "请把以下几段按时间顺序排列的对话摘要合并为一段 2-3 句话的摘要，"
+        "保留重要的事实、数字和结论：\n\n{summaries}"
+    )
+
+    def __init__(
+        self,
+        summarize: Callable[[str], Awaitable[str]],
+        segment_prompt: str,
+        keep_recent: int = 6,
+        min_segment: int = 4,
+        fan_in: int = 4,
+    ):
+        self._summarize = summarize
+        self._segment_prompt = segment_prompt
+        self.keep_recent = keep_recent
+        self.min_segment = min_segment
+        self.fan_in = fan_in
+
+        self._levels: list[list[str]] = []  # _levels[0] 最细，越高层越旧越粗
+        self._summary_msg: Optional[dict] = None  # 当前插在 messages[0] 的摘要消息
+        self._task: Optional[asyncio.Task] = None
+        self._segment: tuple[Optional[dict], Optional[dict]] = (None, None)  # 首尾消息
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _summary_offset(self, messages: list[dict]) -> int:
+        """messages 开头是否是本摘要器插入的摘要消息；被外部改写时重置状态"""
+        if self._summary_msg is not None and messages and messages[0] is self._summary_msg:
+            return 1
+        if self._summary_msg is not None:
+            self._levels = []
+            self._summary_msg = None
+        return 0
+
+    def schedule(self, messages: list[dict]) -> bool:
+        """
+        为尚未摘要的旧消息段启动后台任务（需在事件循环中调用）。
+        Returns: 是否启动了新任务
+        """
+        if self.running:
+            return False
+
+        start = self._summary_offset(messages)
+        end = len(messages) - self.keep_recent
+        while end > start and not is_cut_point(messages[end]):
+            end -= 1
+        if end - start < self.min_segment:
+            return False
+
+        segment = messages[start:end]
+        self._segment = (segment[0], segment[-1])
+        self._task = asyncio.ensure_future(self._build_levels(segment))
+        return True
+
+    async def _build_levels(self, segment: list[dict]) -> list[list[str]]:
+        """摘要新段并逐层合并，返回新的分层结构（由 apply 提交）"""
+        levels = [list(level) for level in self._levels]
+        conversation = format_for_summary(segment)
+        if conversation.strip():
+            summary = await self._summarize(self._segment_prompt.format(conversation=conversation))
+            if not levels:
+                levels.append([])
+            levels[0].append(summary.strip())
+
+        depth = 0
+        while depth < len(levels) and len(levels[depth]) >= self.fan_in:
+            merged = await self._summarize(
+                self.MERGE_PROMPT.format(summaries="\n".join(f"- {x}" for x in levels[depth]))
+            )
+            levels[depth] = []
+            if depth + 1 == len(levels):
+                levels.append([])
+            levels[depth + 1].append(merged.strip())
+            depth += 1
+        return levels
+
+    def apply(self, messages: list[dict]) -> bool:
+        """
+        如果后台任务已完成，用摘要替换已处理的前缀（原地修改 messages）。
+        不等待未完成的任务。Returns: 是否替换了前缀
+        """
+        task = self._task
+        if task is None or not task.done():
+            return False
+        self._task = None
+
+        if task.cancelled():
+            return False
+        if task.exception() is not None:
+            logger.warning("后台摘要失败: %s", task.exception())
+            return False
+
+        first, last = self._segment
+        start = self._summary_offset(messages)
+        try:
+            end = next(i for i in range(start, len(messages)) if messages[i] is last) + 1
+        except StopIteration:
+            return False  # 历史已被改写，丢弃这次结果
+        if messages[start] is not first:
+            return False
+
+        self._levels = task.result()
+        text = "\n".join(s for level in reversed(self._levels) for s in level)
+        self._summary_msg = {"role": "system", "content": f"{self.SUMMARY_PREFIX} {text}"}
+
+        before = len(messages)
+        messages[:] = [self._summary_msg] + messages[end:]
+        logger.info("后台压缩: %d → %d 条 (摘要 %d chars)", before, len(messages), len(text))
+        return True
+
+    def cancel(self) -> None:
+        if self.running:
+            self._task.cancel()
+        self._task = None
+
+
+__all__ = [
+    "estimate_tokens",
+    "estimate_message_tokens",
+    "TokenLedger",
+    "is_cut_point",
+    "find_window_start",
+    "drop_orphan_tool_messages",
+    "format_for_summary",
+    "RollingSummarizer",
+]
@@ -3,14 +3,27 @@
 
 Phase 2: 混合存储架构
 - Markdown: 存储内容（LLM 友好、人类可读）
-- SQLite FTS5: 轻量索引（快速全文检索）
+- SQLite FTS5: 轻量索引（快速全文检索）+ Markdown 全文内容索引
+- 可选语义向量索引（numpy 内存映射矩阵）
 """
 from .writer import MemoryWriter, MemoryEntry
+from .catalog import MemoryCatalog, CatalogEntry
 from .index import MemoryIndex, IndexEntry
+from .content_index import ContentIndexer, ContentHit, ReindexStats
+from .llm_cache import LLMCache
+from .vector_index import VectorIndex, load_embedder
 
 __all__ = [
     "MemoryWriter",
     "MemoryEntry",
+    "MemoryCatalog",
+    "CatalogEntry",
     "MemoryIndex",
     "IndexEntry",
+    "ContentIndexer",
+    "ContentHit",
+    "ReindexStats",
+    "LLMCache",
+    "VectorIndex",
+    "load_embedder",
 ]
@@ -0,0 +1,263 @@
+"""
+记忆系统 - Markdown 文件目录（catalog）
+
+记录 memory/ 下每个 Markdown 文件的日期、大小、mtime 与条目数，存于
+memory/.catalog/files.json（单独的隐藏目录，保存时不改变 memory/ 的 mtime）：
+
+- MemoryWriter 写文件后调用 record()，目录随写入更新；daily 物化只标记为脏，
+  flush() 或下次对账时才保存，files.json 不随每次写入整体重写
+- 查询前对账：只 stat 已知目录和已知文件，目录 mtime 变化（有文件新增 / 删除 /
+  原子替换）才重新列该目录；只读取大小或 mtime 变化的文件（原地编辑、>> 追加）
+- 文件数、总大小、日期范围直接从目录回答，不遍历文件系统
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from ..utils.fileio import atomic_write_json
+
+
+@dataclass
+class CatalogEntry:
+    """一个 Markdown 文件"""
+    path: str                 # 相对 memory_root
+    kind: str                 # daily | topics | persona | root | 其他子目录名
+    date: Optional[str]       # daily 日志的日期（ISO）
+    size: int
+    mtime_ns: int
+    entries: int              # 顶层列表项数（daily 即条目数）
+
+
+def count_entries(text: str) -> int:
+    """顶层列表项数（行首的 "- "）"""
+    return text.count("\n- ") + (1 if text.startswith("- ") else 0)
+
+
+class MemoryCatalog:
+    """memory/ 下 Markdown 文件的目录"""
+
+    DIRNAME = ".catalog"
+    VERSION = 1
+
+    def __init__(self, memory_root: Path):
+        self.memory_root = Path(memory_root)
+        self.path = self.memory_root / self.DIRNAME / "files.json"
+        self._files: Dict[str, CatalogEntry] = {}
+        self._dirs: Dict[str, int] = {}       # 相对路径 → 上次列目录时的 mtime_ns
+        self._loaded = False
+        self._dirty = False                   # 有未保存到 files.json 的更新
+        self._lock = threading.RLock()  # daemon 的写入线程与心跳线程都会更新
+
+    # ==================== 持久化 ====================
+
+    def _load(self):
+        self._loaded = True
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self._dirs = data.get("dirs", {})
+        self._files = {
+            entry["path"]: CatalogEntry(**entry) for entry in data.get("files", [])
+        }
+
+    def save(self):
+        """原子写入 files.json"""
+        self._dirty = False
+        data = {
+            "version": self.VERSION,
+            "dirs": self._dirs,
+            "files": [asdict(entry) for entry in self._files.values()],
+        }
+        atomic_write_json(self.path, data)
+
+    def flush(self):
+        """有未保存的更新时写入 files.json"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    # ==================== 写入 ====================
+
+    def _entry(self, rel: str, st: os.stat_result, text: str) -> CatalogEntry:
+        parts = Path(rel).parts
+        kind = parts[0] if len(parts) > 1 else "root"
+        day = None
+        if kind == "daily":
+            try:
+                day = date.fromisoformat(Path(rel).stem).isoformat()
+            except ValueError:
+                pass
+        return CatalogEntry(
+            path=rel, kind=kind, date=day,
+            size=st.st_size, mtime_ns=st.st_mtime_ns, entries=count_entries(text),
+        )
+
+    def record(self, path: Path, content: Optional[str] = None, save: bool = True):
+        """
+        写入文件后更新目录
+
+        Args:
+            content: 刚写入的完整内容（已在内存中时传入，免得再读一遍）
+            save: False 时只标记为脏，由 flush() / 对账统一保存
+        """
+        path = Path(path)
+        try:
+            st = path.stat()
+            if content is None:
+                content = path.read_text(encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            self.forget(path, save=save)
+            return
+        rel = path.relative_to(self.memory_root).as_posix()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._files[rel] = self._entry(rel, st, content)
+            if save:
+                self.save()
+            else:
+                self._dirty = True
+
+    def forget(self, path: Path, save: bool = True):
+        rel = Path(path).relative_to(self.memory_root).as_posix()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._files.pop(rel, None) is not None:
+                if save:
+                    self.save()
+                else:
+                    self._dirty = True
+
+    # ==================== 对账 ====================
+
+    def reconcile(self, force: bool = False) -> bool:
+        """
+        与文件系统对账
+
+        只重新列出 mtime 变化的目录（force=True 时全部重列）；目录没变时
+        只 stat 其中已知的文件。大小和 mtime 都没变的文件不读取。
+        Returns: 目录是否有变化
+        """
+        with self._lock:
+            return self._reconcile(force)
+
+    def _reconcile(self, force: bool) -> bool:
+        if not self._loaded:
+            self._load()
+        changed = False
+        pending = [""] if force or not self._dirs else sorted(self._dirs)
+        known_by_dir: Dict[str, List[str]] = {}
+        for rel in self._files:
+            known_by_dir.setdefault(self._parent(rel), []).append(rel)
+        seen_dirs = set()
+        while pending:
+            rel_dir = pending.pop()
+            if rel_dir in seen_dirs:
+                continue
+            seen_dirs.add(rel_dir)
+            directory = self.memory_root / rel_dir
+            try:
+                dir_mtime = directory.stat().st_mtime_ns
+            except FileNotFoundError:
+                changed |= self._drop_dir(rel_dir)
+                continue
+            if not force and self._dirs.get(rel_dir) == dir_mtime:
+                # 目录没变：文件可能被原地改写（mtime 不冒泡到目录），逐个 stat
+                for rel in known_by_dir.get(rel_dir, ()):
+                    try:
+                        st = (self.memory_root / rel).stat()
+                    except FileNotFoundError:
+                        del self._files[rel]
+                        changed = True
+                        continue
+                    changed |= self._refresh(rel, st)
+                continue
+
+            listed = set()
+            with os.scandir(directory) as it:
+                for item in it:
+                    if item.name.startswith("."):
+                        continue
+                    rel = f"{rel_dir}/{item.name}" if rel_dir else item.name
+                    if item.is_dir(follow_symlinks=False):
+                        if rel not in self._dirs or force:
+                            pending.append(rel)
+                        continue
+                    if not item.name.endswith(".md"):
+                        continue
+                    listed.add(rel)
+                    changed |= self._refresh(rel, item.stat())
+
+            for rel in [r for r in self._files if self._parent(r) == rel_dir and r not in listed]:
+                del self._files[rel]
+                changed = True
+            if self._dirs.get(rel_dir) != dir_mtime:
+                self._dirs[rel_dir] = dir_mtime
+                changed = True
+
+        if changed or self._dirty:
+            self.save()
+        return changed
+
+    def _refresh(self, rel: str, st: os.stat_result) -> bool:
+        """大小或 mtime 变化时重读文件；Returns: 是否更新"""
+        known = self._files.get(rel)
+        if known and known.size == st.st_size and known.mtime_ns == st.st_mtime_ns:
+            return False
+        try:
+            text = (self.memory_root / rel).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return False
+        self._files[rel] = self._entry(rel, st, text)
+        return True
+
+    @staticmethod
+    def _parent(rel: str) -> str:
+        return rel.rpartition("/")[0]
+
+    def _drop_dir(self, rel_dir: str) -> bool:
+        prefix = f"{rel_dir}/"
+        dirs = [d for d in self._dirs if d == rel_dir or d.startswith(prefix)]
+        files = [f for f in self._files if f.startswith(prefix)]
+        for d in dirs:
+            del self._dirs[d]
+        for f in files:
+            del self._files[f]
+        return bool(dirs or files)
+
+    # ==================== 查询 ====================
+
+    def files(self, kind: Optional[str] = None) -> List[CatalogEntry]:
+        with self._lock:
+            self._reconcile(force=False)
+            return [e for e in self._files.values() if kind is None or e.kind == kind]
+
+    def file_count(self, kind: Optional[str] = None) -> int:
+        return len(self.files(kind))
+
+    def total_size(self, kind: Optional[str] = None) -> int:
+        return sum(e.size for e in self.files(kind))
+
+    def dailies(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        newest_first: bool = True,
+    ) -> Iterator[CatalogEntry]:
+        """按日期范围（含两端）逐个产出 daily 日志"""
+        lo = start.isoformat() if start else ""
+        hi = end.isoformat() if end else "9999-12-31"
+        entries = sorted(
+            (e for e in self.files("daily") if e.date and lo <= e.date <= hi),
+            key=lambda e: e.date,
+            reverse=newest_first,
+        )
+        yield from entries
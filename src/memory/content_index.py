@@ -0,0 +1,294 @@
+"""
+记忆系统 - 全文内容索引
+
+index.db 里的 memory_index 只存 200 字摘要；真正的内容在
+memory/daily/*.md 与 memory/topics/*.md。这里把 Markdown 按条目切分后
+写入 FTS5，并记录每个文件的 mtime / 大小 / 内容哈希，只重建变化过的文件。
+"""
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from .index import MemoryIndex
+
+
+@dataclass
+class ContentSection:
+    """Markdown 中的一个可检索单元（一条日志条目，或一个 section）"""
+    heading: str
+    line: int                 # 起始行号（从 1 开始）
+    body: str
+
+
+@dataclass
+class ContentHit:
+    """全文检索命中"""
+    path: str
+    heading: str
+    line: int
+    snippet: str
+    score: float
+
+
+@dataclass
+class ReindexStats:
+    """一次增量索引的统计"""
+    files_scanned: int = 0
+    files_indexed: int = 0     # 内容变化、已重建
+    files_touched: int = 0     # mtime 变了但内容哈希相同
+    files_removed: int = 0
+    sections: int = 0
+    bytes_read: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_scanned / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes_read / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"扫描 {self.files_scanned} 个文件，重建 {self.files_indexed} 个"
+            f"（{self.sections} 段），删除 {self.files_removed} 个，"
+            f"读取 {self.bytes_read / 1024:.1f} KB，用时 {self.seconds * 1000:.0f} ms"
+            f"（{self.files_per_second:.0f} 文件/秒，{self.mb_per_second:.1f} MB/秒）"
+        )
+
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*$")
+# daily 日志条目：- 10:23 ⭐⭐⭐ **标题**
+_ENTRY = re.compile(r"^- ")
+
+
+def split_markdown(text: str) -> List[ContentSection]:
+    """
+    按标题切分 Markdown；section 内有顶层列表项时每一项单独成段
+
+    heading 为 "一级标题 › 二级标题" 形式的标题路径
+    """
+    sections: List[ContentSection] = []
+    path: List[str] = []
+    current: List[str] = []
+    start = 1
+
+    def flush():
+        body = "\n".join(current).strip()
+        if body:
+            sections.append(ContentSection(heading=" › ".join(path), line=start, body=body))
+
+    for i, line in enumerate(text.splitlines(), 1):
+        heading = _HEADING.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            path[level - 1:] = [heading.group(2)]
+            current = []
+        elif _ENTRY.match(line):
+            flush()
+            current, start = [line], i
+        elif current or line.strip():
+            if not current:
+                start = i
+            current.append(line)
+    flush()
+    return sections
+
+
+class ContentIndexer:
+    """
+    Markdown 全文索引（与 MemoryIndex 共用 index.db 和连接）
+
+    - memory_files: 每个文件的 mtime / 大小 / 内容哈希
+    - memory_sections: 切分后的条目（外部内容表）
+    - memory_content_fts: FTS5 索引，由触发器同步
+    """
+
+    # 参与索引的子目录
+    SUBDIRS = ("daily", "topics")
+
+    def __init__(self, index: MemoryIndex, memory_root: Path):
+        self.index = index
+        self.memory_root = Path(memory_root)
+        self._init_db()
+
+    def _init_db(self):
+        """初始化表结构"""
+        tokenize = "trigram" if self.index._trigram else "unicode61"
+        with self.index._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS memory_files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    sections INTEGER DEFAULT 0,
+                    indexed_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS memory_sections (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    heading TEXT,
+                    line INTEGER,
+                    body TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sections_path ON memory_sections(path)")
+
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS memory_content_fts USING fts5(
+                    heading,
+                    body,
+                    content='memory_sections',
+                    content_rowid='id',
+                    tokenize='{tokenize}'
+                )
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS memory_sections_ai AFTER INSERT ON memory_sections BEGIN
+                    INSERT INTO memory_content_fts(rowid, heading, body)
+                    VALUES (new.id, new.heading, new.body);
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS memory_sections_ad AFTER DELETE ON memory_sections BEGIN
+                    INSERT INTO memory_content_fts(memory_content_fts, rowid, heading, body)
+                    VALUES ('delete', old.id, old.heading, old.body);
+                END
+            """)
+
+    # ==================== 索引 ====================
+
+    def _files(self) -> List[Path]:
+        files = []
+        for sub in self.SUBDIRS:
+            directory = self.memory_root / sub
+            if directory.is_dir():
+                files.extend(sorted(directory.glob("*.md")))
+        return files
+
+    def reindex(self, full: bool = False, max_files: Optional[int] = None) -> ReindexStats:
+        """
+        增量索引
+
+        Args:
+            full: 忽略 mtime / 哈希，全部重建
+            max_files: 本次最多重建多少个文件（心跳中调用时限制单次耗时），
+                       剩下的留给下一次
+        """
+        stats = ReindexStats()
+        started = time.perf_counter()
+
+        conn = self.index._connection()
+        known = {
+            row["path"]: row
+            for row in conn.execute("SELECT path, mtime, size, hash FROM memory_files")
+        }
+        seen = set()
+
+        for path in self._files():
+            key = str(path)
+            seen.add(key)
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            stats.files_scanned += 1
+
+            row = known.get(key)
+            if not full and row and row["mtime"] == st.st_mtime and row["size"] == st.st_size:
+                continue
+            if max_files is not None and stats.files_indexed >= max_files:
+                continue
+
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue
+            stats.bytes_read += len(data)
+            digest = hashlib.sha1(data).hexdigest()
+
+            with conn:
+                if not full and row and row["hash"] == digest:
+                    conn.execute(
+                        "UPDATE memory_files SET mtime = ?, size = ? WHERE path = ?",
+                        (st.st_mtime, st.st_size, key)
+                    )
+                    stats.files_touched += 1
+                    continue
+
+                sections = split_markdown(data.decode("utf-8", errors="replace"))
+                conn.execute("DELETE FROM memory_sections WHERE path = ?", (key,))
+                conn.executemany(
+                    "INSERT INTO memory_sections (path, heading, line, body) VALUES (?, ?, ?, ?)",
+                    [(key, s.heading, s.line, s.body) for s in sections]
+                )
+                conn.execute("""
+                    INSERT OR REPLACE INTO memory_files (path, mtime, size, hash, sections, indexed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (key, st.st_mtime, st.st_size, digest, len(sections), time.time()))
+            stats.files_indexed += 1
+            stats.sections += len(sections)
+
+        removed = [key for key in known if key not in seen]
+        if removed:
+            with conn:
+                for key in removed:
+                    conn.execute("DELETE FROM memory_sections WHERE path = ?", (key,))
+                    conn.execute("DELETE FROM memory_files WHERE path = ?", (key,))
+            stats.files_removed = len(removed)
+
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    # ==================== 查询 ====================
+
+    def search(self, query: str, limit: int = 10, marks: tuple = ("【", "】")) -> List[ContentHit]:
+        """全文检索，按 bm25 排序（标题权重高于正文）"""
+        fts_query, short_terms = self.index._fts_query(query)
+        if not fts_query and not short_terms:
+            return []
+
+        if fts_query:
+            source = "memory_content_fts JOIN memory_sections AS s ON s.id = memory_content_fts.rowid"
+            select = "snippet(memory_content_fts, 1, ?, ?, '…', 16), -bm25(memory_content_fts, 3.0, 1.0)"
+            select_params = list(marks)
+            conditions = ["memory_content_fts MATCH ?"]
+            params = [fts_query]
+        else:
+            source = "memory_sections AS s"
+            select = "substr(s.body, 1, 80), 1.0"
+            select_params = []
+            conditions = []
+            params = []
+        for term in short_terms:
+            conditions.append("(s.heading LIKE ? OR s.body LIKE ?)")
+            params.extend([f"%{term}%"] * 2)
+
+        with self.index._connection() as conn:
+            rows = conn.execute(f"""
+                SELECT s.path, s.heading, s.line, {select}
+                FROM {source}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY 5 DESC
+                LIMIT ?
+            """, select_params + params + [limit]).fetchall()
+
+        return [
+            ContentHit(path=row[0], heading=row[1] or "", line=row[2], snippet=row[3], score=row[4])
+            for row in rows
+        ]
+
+    def count(self) -> tuple:
+        """Returns: (已索引文件数, 段数)"""
+        with self.index._connection() as conn:
+            files = conn.execute("SELECT COUNT(*) FROM memory_files").fetchone()[0]
+            sections = conn.execute("SELECT COUNT(*) FROM memory_sections").fetchone()[0]
+        return files, sections
@@ -5,6 +5,7 @@ SQLite 索引用于快速检索，内容存储在 Markdown 文件中
 """
 import sqlite3
 import json
+import threading
 from datetime import datetime, date
 from pathlib import Path
 from typing import List, Optional
@@ -23,6 +24,8 @@ class IndexEntry:
     importance: int
     summary: str              # 简短摘要
     created_at: datetime = None
+    score: Optional[float] = None    # 排序得分（仅 rank 结果）
+    snippet: Optional[str] = None    # 命中片段（仅 rank 结果）
     
     def __post_init__(self):
         if self.created_at is None:
@@ -38,17 +41,74 @@ class MemoryIndex:
     - 按标签过滤
     - 按重要性排序
     - 关键词搜索（标题和摘要）
+    
+    每个线程复用一条连接（WAL 模式：daemon 写入时 CLI 读取不互相阻塞），
+    热点语句由连接的语句缓存复用，`with conn:` 即一个事务。
+    """
+    
+    # page cache 大小（KB）
+    CACHE_SIZE_KB = 8192
+    # 语句缓存条数（sqlite3 默认 128）
+    CACHED_STATEMENTS = 256
+    # 遇到写锁时的等待时间（秒）
+    BUSY_TIMEOUT = 5.0
+    
+    # 排序：bm25 相关度 × 重要性系数 × 时间衰减
+    BM25_WEIGHTS = (0.0, 10.0, 4.0, 2.0)  # id, title, summary, tags
+    IMPORTANCE_WEIGHT = 0.15              # 以 3 星为基准，每颗星 ±15%
+    RECENCY_HALF_LIFE_DAYS = 30.0         # 这么多天前的记忆得分减半
+    # trigram 分词无法索引的短词（中文两字词很常见）用 LIKE 兜底
+    TRIGRAM_MIN_CHARS = 3
+    
+    _INSERT_ENTRY = """
+        INSERT OR REPLACE INTO memory_index
+        (id, entry_type, file_path, date, title, tags, importance, summary, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """
     
     def __init__(self, db_path: Path):
-        self.db_path = db_path
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
         self._init_db()
     
+    # ==================== 连接 ====================
+    
+    def _connection(self) -> sqlite3.Connection:
+        """当前线程的连接（首次使用时打开并设置 PRAGMA）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.BUSY_TIMEOUT,
+                cached_statements=self.CACHED_STATEMENTS,
+                check_same_thread=False,  # 只在本线程使用；close() 可能在其他线程调用
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{self.CACHE_SIZE_KB}")
+            # INSERT OR REPLACE 删除旧行时也触发 DELETE 触发器，FTS 不留残余条目
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+    
     def _init_db(self):
         """初始化数据库"""
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS memory_index (
                     id TEXT PRIMARY KEY,
@@ -69,16 +129,27 @@ class MemoryIndex:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_importance ON memory_index(importance)")
             
             # 创建全文搜索虚拟表 (FTS5)
-            conn.execute("""
+            # 旧库的 unicode61 表按整段中文切词，升级为 trigram 后重建
+            fts_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'memory_fts'"
+            ).fetchone()
+            rebuild = fts_sql is not None and self._trigram_supported() and "trigram" not in fts_sql[0]
+            if rebuild:
+                conn.execute("DROP TABLE memory_fts")
+            self._trigram = self._trigram_supported()
+            conn.execute(f"""
                 CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
-                    id,
+                    id UNINDEXED,
                     title,
                     summary,
                     tags,
                     content='memory_index',
-                    content_rowid='rowid'
+                    content_rowid='rowid',
+                    tokenize='{"trigram" if self._trigram else "unicode61"}'
                 )
             """)
+            if rebuild:
+                conn.execute("INSERT INTO memory_fts(memory_fts) VALUES ('rebuild')")
             
             # 创建触发器保持 FTS 同步
             conn.execute("""
@@ -104,18 +175,84 @@ class MemoryIndex:
                 END
             """)
             
-            conn.commit()
+            # 发现（daemon 的 LLM 洞察），未读/重要性查询走索引
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS discoveries (
+                    id TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    content TEXT,
+                    importance INTEGER DEFAULT 3,
+                    source_files TEXT DEFAULT '[]',
+                    suggested_action TEXT,
+                    acknowledged INTEGER DEFAULT 0
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_discoveries_unread ON discoveries(acknowledged, importance)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_discoveries_ts ON discoveries(timestamp)")
+            
+            # 标签表：由触发器从 memory_index.tags（JSON 数组）同步
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS memory_tags (
+                    entry_id TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (entry_id, tag)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tags_tag ON memory_tags(tag)")
+            
+            # 本类的连接开启了 recursive_triggers，INSERT OR REPLACE 删旧行时 _ad 会清标签；
+            # 插入时仍先清一次，未开启该 PRAGMA 的连接（外部工具、旧版本）也不留残余标签
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS memory_tags_ai AFTER INSERT ON memory_index BEGIN
+                    DELETE FROM memory_tags WHERE entry_id = new.id;
+                    INSERT OR IGNORE INTO memory_tags(entry_id, tag)
+                    SELECT new.id, value FROM json_each(new.tags) WHERE json_valid(new.tags);
+                END
+            """)
+            
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS memory_tags_ad AFTER DELETE ON memory_index BEGIN
+                    DELETE FROM memory_tags WHERE entry_id = old.id;
+                END
+            """)
+            
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS memory_tags_au AFTER UPDATE OF id, tags ON memory_index BEGIN
+                    DELETE FROM memory_tags WHERE entry_id = old.id;
+                    INSERT OR IGNORE INTO memory_tags(entry_id, tag)
+                    SELECT new.id, value FROM json_each(new.tags) WHERE json_valid(new.tags);
+                END
+            """)
+            
+            # 旧库升级：回填标签表
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                conn.execute("""
+                    INSERT OR IGNORE INTO memory_tags(entry_id, tag)
+                    SELECT m.id, j.value FROM memory_index AS m, json_each(m.tags) AS j
+                    WHERE json_valid(m.tags)
+                """)
+                conn.execute("PRAGMA user_version = 1")
     
     # ==================== 写入 ====================
     
     def add(self, entry: IndexEntry) -> str:
         """添加索引条目"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO memory_index 
-                (id, entry_type, file_path, date, title, tags, importance, summary, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+        self.bulk_add([entry])
+        return entry.id
+    
+    def bulk_add(self, entries: List[IndexEntry], discoveries: Optional[List[dict]] = None) -> int:
+        """
+        批量添加索引条目（单个事务）
+        
+        Args:
+            discoveries: 同一事务内一并写入的发现记录（Discovery.to_dict() 格式）
+        """
+        rows = [
+            (
                 entry.id,
                 entry.entry_type,
                 entry.file_path,
@@ -125,15 +262,19 @@ class MemoryIndex:
                 entry.importance,
                 entry.summary,
                 entry.created_at.isoformat()
-            ))
-            conn.commit()
-        return entry.id
+            )
+            for entry in entries
+        ]
+        with self._connection() as conn:
+            conn.executemany(self._INSERT_ENTRY, rows)
+            if discoveries:
+                self._insert_discoveries(conn, discoveries)
+        return len(rows)
     
     def delete(self, entry_id: str):
         """删除索引条目"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute("DELETE FROM memory_index WHERE id = ?", (entry_id,))
-            conn.commit()
     
     # ==================== 查询 ====================
     
@@ -162,15 +303,15 @@ class MemoryIndex:
         conditions = []
         params = []
         
-        # 全文搜索
+        # 全文搜索（按 rowid 关联 FTS，短词 LIKE 兜底）
         if query:
-            # 使用 FTS5 搜索，添加 * 通配符支持前缀匹配
-            # 将每个词后面加上 * 以支持部分匹配
-            fts_query = " ".join(f"{word}*" for word in query.split())
-            conditions.append("""
-                id IN (SELECT id FROM memory_fts WHERE memory_fts MATCH ?)
-            """)
-            params.append(fts_query)
+            fts_query, short_terms = self._fts_query(query)
+            if fts_query:
+                conditions.append("rowid IN (SELECT rowid FROM memory_fts WHERE memory_fts MATCH ?)")
+                params.append(fts_query)
+            for term in short_terms:
+                conditions.append("(title LIKE ? OR summary LIKE ? OR tags LIKE ?)")
+                params.extend([f"%{term}%"] * 3)
         
         # 类型过滤
         if entry_type:
@@ -190,19 +331,16 @@ class MemoryIndex:
             conditions.append("importance >= ?")
             params.append(min_importance)
         
-        # 标签过滤（JSON 数组搜索）
+        # 标签过滤（走 memory_tags 的 tag 索引）
         if tags:
-            tag_conditions = []
-            for tag in tags:
-                tag_conditions.append("tags LIKE ?")
-                params.append(f'%"{tag}"%')
-            conditions.append(f"({' OR '.join(tag_conditions)})")
+            placeholders = ", ".join("?" * len(tags))
+            conditions.append(f"id IN (SELECT entry_id FROM memory_tags WHERE tag IN ({placeholders}))")
+            params.extend(tags)
         
         # 构建查询
         where_clause = " AND ".join(conditions) if conditions else "1=1"
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.execute(f"""
                 SELECT * FROM memory_index
                 WHERE {where_clause}
@@ -214,6 +352,18 @@ class MemoryIndex:
         
         return [self._row_to_entry(row) for row in rows]
     
+    def get_many(self, entry_ids: List[str]) -> List[IndexEntry]:
+        """按 id 批量获取条目（保持传入顺序，不存在的跳过）"""
+        if not entry_ids:
+            return []
+        placeholders = ", ".join("?" * len(entry_ids))
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM memory_index WHERE id IN ({placeholders})", list(entry_ids)
+            ).fetchall()
+        by_id = {row["id"]: self._row_to_entry(row) for row in rows}
+        return [by_id[i] for i in entry_ids if i in by_id]
+    
     def get_by_date(self, d: date) -> List[IndexEntry]:
         """获取指定日期的所有条目"""
         return self.search(date_from=d, date_to=d)
@@ -230,11 +380,99 @@ class MemoryIndex:
     
     def recall(self, keyword: str, limit: int = 20) -> List[IndexEntry]:
         """
-        回忆：根据关键词搜索记忆
+        回忆：根据关键词搜索记忆（最相关的在前）
         
         这是给用户用的主要接口
         """
-        return self.search(query=keyword, limit=limit)
+        return self.rank(keyword, limit=limit)
+    
+    def rank(
+        self,
+        query: str,
+        entry_type: str = None,
+        min_importance: int = None,
+        limit: int = 20,
+        marks: tuple = ("【", "】")
+    ) -> List[IndexEntry]:
+        """
+        按相关度排序的全文检索（单条查询）
+        
+        得分 = bm25 相关度 × (1 + IMPORTANCE_WEIGHT × (重要性 - 3)) / (1 + 天数 / RECENCY_HALF_LIFE_DAYS)
+        
+        Args:
+            query: 关键词（空格分隔，全部命中）
+            marks: snippet 中包裹命中词的前后标记
+        Returns: 带 score / snippet 的条目
+        """
+        fts_query, short_terms = self._fts_query(query)
+        if not fts_query and not short_terms:
+            return []
+        
+        if fts_query:
+            weights = ", ".join(str(w) for w in self.BM25_WEIGHTS)
+            source = "memory_fts JOIN memory_index AS m ON m.rowid = memory_fts.rowid"
+            select_params = list(marks)
+            snippet = "snippet(memory_fts, -1, ?, ?, '…', 16)"
+            relevance = f"-bm25(memory_fts, {weights})"
+            conditions = ["memory_fts MATCH ?"]
+            params = [fts_query]
+        else:
+            source = "memory_index AS m"
+            select_params = []
+            snippet = "NULL"
+            relevance = "1.0"
+            conditions = []
+            params = []
+        
+        for term in short_terms:
+            conditions.append("(m.title LIKE ? OR m.summary LIKE ? OR m.tags LIKE ?)")
+            params.extend([f"%{term}%"] * 3)
+        if entry_type:
+            conditions.append("m.entry_type = ?")
+            params.append(entry_type)
+        if min_importance:
+            conditions.append("m.importance >= ?")
+            params.append(min_importance)
+        
+        with self._connection() as conn:
+            rows = conn.execute(f"""
+                SELECT m.*, {snippet} AS snippet,
+                    {relevance}
+                    * (1.0 + ? * (m.importance - 3))
+                    / (1.0 + MAX(0.0, julianday('now', 'localtime')
+                        - COALESCE(julianday(m.date), julianday('now', 'localtime'))) / ?) AS score
+                FROM {source}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY score DESC
+                LIMIT ?
+            """, select_params + [self.IMPORTANCE_WEIGHT, self.RECENCY_HALF_LIFE_DAYS] + params + [limit]).fetchall()
+        
+        entries = []
+        for row in rows:
+            entry = self._row_to_entry(row)
+            entry.score = row["score"]
+            entry.snippet = row["snippet"]
+            entries.append(entry)
+        return entries
+    
+    @staticmethod
+    def _trigram_supported() -> bool:
+        """FTS5 trigram 分词需要 SQLite 3.34+"""
+        return sqlite3.sqlite_version_info >= (3, 34, 0)
+    
+    def _fts_query(self, query: str) -> tuple:
+        """
+        用户输入 → (FTS5 MATCH 表达式, 需要 LIKE 兜底的短词)
+        
+        每个词作为短语加引号，避免特殊字符被当成 FTS 语法
+        """
+        terms = query.split()
+        quote = lambda t: '"' + t.replace('"', '""') + '"'
+        if not self._trigram:
+            return " ".join(f"{quote(t)}*" for t in terms) or None, []
+        long_terms = [t for t in terms if len(t) >= self.TRIGRAM_MIN_CHARS]
+        short_terms = [t for t in terms if len(t) < self.TRIGRAM_MIN_CHARS]
+        return " AND ".join(quote(t) for t in long_terms) or None, short_terms
     
     def _row_to_entry(self, row: sqlite3.Row) -> IndexEntry:
         """将数据库行转换为 IndexEntry"""
@@ -250,11 +488,119 @@ class MemoryIndex:
             created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None
         )
     
+    # ==================== 发现 ====================
+    
+    def add_discoveries(self, records: List[dict], replace: bool = True) -> int:
+        """
+        写入发现（Discovery.to_dict() 格式），单个事务
+        
+        Args:
+            replace: False 时已存在的 id 保持不变（用于导入）
+        """
+        with self._connection() as conn:
+            return self._insert_discoveries(conn, records, replace)
+    
+    def _insert_discoveries(self, conn: sqlite3.Connection, records: List[dict], replace: bool = True) -> int:
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        rows = [
+            (
+                r["id"],
+                r["timestamp"],
+                r.get("type", "file_insight"),
+                r["title"],
+                r.get("content", ""),
+                r.get("importance", 3),
+                json.dumps(r.get("source_files") or [], ensure_ascii=False),
+                r.get("suggested_action"),
+                1 if r.get("acknowledged") else 0,
+            )
+            for r in records
+        ]
+        conn.executemany(f"""
+            {verb} INTO discoveries
+            (id, timestamp, type, title, content, importance, source_files, suggested_action, acknowledged)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        return len(rows)
+    
+    def acknowledge_discovery(self, discovery_id: str) -> bool:
+        """标记单条发现已读"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE discoveries SET acknowledged = 1 WHERE id = ? AND acknowledged = 0",
+                (discovery_id,)
+            )
+            return cursor.rowcount > 0
+    
+    def acknowledge_all_discoveries(self) -> int:
+        """标记全部发现已读，返回更新条数"""
+        with self._connection() as conn:
+            cursor = conn.execute("UPDATE discoveries SET acknowledged = 1 WHERE acknowledged = 0")
+            return cursor.rowcount
+    
+    def count_discoveries(self, unread_only: bool = False) -> int:
+        """统计发现数量（unread_only 走 (acknowledged, importance) 索引）"""
+        sql = "SELECT COUNT(*) FROM discoveries"
+        if unread_only:
+            sql += " WHERE acknowledged = 0"
+        with self._connection() as conn:
+            return conn.execute(sql).fetchone()[0]
+    
+    def query_discoveries(
+        self,
+        unread_only: bool = False,
+        by_importance: bool = False,
+        since: datetime = None,
+        limit: int = 10,
+        offset: int = 0
+    ) -> List[dict]:
+        """
+        查询发现
+        
+        Args:
+            unread_only: 只返回未读
+            by_importance: 按重要性降序（其次按时间），否则按时间从新到旧
+            since: 只返回该时间之后的发现
+        """
+        conditions = []
+        params = []
+        if unread_only:
+            conditions.append("acknowledged = 0")
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since.isoformat())
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        order = "importance DESC, timestamp DESC" if by_importance else "timestamp DESC"
+        
+        with self._connection() as conn:
+            rows = conn.execute(f"""
+                SELECT * FROM discoveries
+                WHERE {where_clause}
+                ORDER BY {order}
+                LIMIT ? OFFSET ?
+            """, params + [limit, offset]).fetchall()
+        
+        return [self._row_to_discovery(row) for row in rows]
+    
+    def _row_to_discovery(self, row: sqlite3.Row) -> dict:
+        """将发现行转换为 Discovery.to_dict() 格式"""
+        return {
+            "id": row["id"],
+            "timestamp": row["timestamp"],
+            "type": row["type"],
+            "title": row["title"],
+            "content": row["content"] or "",
+            "importance": row["importance"],
+            "source_files": json.loads(row["source_files"]) if row["source_files"] else [],
+            "suggested_action": row["suggested_action"],
+            "acknowledged": bool(row["acknowledged"]),
+        }
+    
     # ==================== 统计 ====================
     
     def count(self, entry_type: str = None) -> int:
         """统计条目数量"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             if entry_type:
                 cursor = conn.execute(
                     "SELECT COUNT(*) FROM memory_index WHERE entry_type = ?",
@@ -266,11 +612,26 @@ class MemoryIndex:
     
     def get_all_tags(self) -> List[str]:
         """获取所有使用过的标签"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT DISTINCT tags FROM memory_index")
-            all_tags = set()
-            for row in cursor.fetchall():
-                if row[0]:
-                    tags = json.loads(row[0])
-                    all_tags.update(tags)
-            return sorted(all_tags)
+        with self._connection() as conn:
+            cursor = conn.execute("SELECT DISTINCT tag FROM memory_tags ORDER BY tag")
+            return [row[0] for row in cursor.fetchall()]
+    
+    def tag_counts(self, limit: int = None, entry_type: str = None) -> List[tuple]:
+        """
+        标签使用次数，按次数降序
+        
+        Args:
+            limit: 只返回前 N 个
+            entry_type: 只统计该类型的条目
+        Returns: [(tag, count), ...]
+        """
+        sql = "SELECT t.tag, COUNT(*) AS n FROM memory_tags AS t"
+        params = []
+        if entry_type:
+            sql += " JOIN memory_index AS m ON m.id = t.entry_id WHERE m.entry_type = ?"
+            params.append(entry_type)
+        sql += " GROUP BY t.tag ORDER BY n DESC, t.tag LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        
+        with self._connection() as conn:
+            return [(row[0], row[1]) for row in conn.execute(sql, params).fetchall()]
@@ -0,0 +1,188 @@
+"""
+记忆系统 - LLM 响应缓存
+
+Daemon 每次心跳发出的 prompt 经常完全相同（同一批文件反复自动保存、
+定时自省），缓存命中即可省掉一次完整的 LLM 调用。
+
+- 键: sha256(model + 规范化 prompt)，空白差异不影响命中
+- 过期: TTL（写入时确定）
+- 容量: 超过 max_entries 时按最近使用时间 LRU 淘汰
+- 统计: 按天记录命中/未命中次数
+"""
+import hashlib
+import re
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LLMCache:
+    """
+    磁盘 LLM 响应缓存（SQLite）
+
+    用法:
+        cache = LLMCache(jarvis_home / "llm_cache.db")
+        text = cache.get(model, prompt)
+        if text is None:
+            text = await call(prompt)
+            cache.put(model, prompt, text)
+
+    或直接包装 evolution 模块使用的 llm_call:
+        llm_call = cache.wrap(model, llm_call)
+    """
+
+    DEFAULT_TTL_SECONDS = 3600
+    DEFAULT_MAX_ENTRIES = 500
+
+    def __init__(
+        self,
+        db_path: Path,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._init_db()
+
+    def _init_db(self):
+        """初始化数据库"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON llm_cache(expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON llm_cache(last_used)")
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                    day TEXT PRIMARY KEY,
+                    hits INTEGER DEFAULT 0,
+                    misses INTEGER DEFAULT 0
+                )
+            """)
+            conn.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """模型 + 规范化 prompt（合并空白、去首尾空白）的哈希"""
+        normalized = _WHITESPACE.sub(" ", prompt).strip()
+        return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+    # ==================== 读写 ====================
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """查询缓存，未命中或已过期返回 None"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and row[1] > now:
+                conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+                self._count(conn, hit=True)
+                conn.commit()
+                return row[0]
+
+            if row:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._count(conn, hit=False)
+            conn.commit()
+        return None
+
+    def put(self, model: str, prompt: str, response: str, ttl_seconds: Optional[int] = None):
+        """写入缓存，并按 TTL / 容量淘汰旧条目"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO llm_cache
+                (key, model, response, created_at, expires_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, response, now, now + ttl, now))
+            self._evict(conn, now)
+            conn.commit()
+
+    def wrap(
+        self,
+        model: str,
+        llm_call: Callable[[str], Awaitable[str]],
+    ) -> Callable[[str], Awaitable[str]]:
+        """把 async llm_call(prompt) -> str 包装为带缓存的版本"""
+        async def cached_call(prompt: str) -> str:
+            cached = self.get(model, prompt)
+            if cached is not None:
+                return cached
+            response = await llm_call(prompt)
+            self.put(model, prompt, response)
+            return response
+
+        return cached_call
+
+    def clear(self):
+        """清空缓存条目（保留统计）"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目；仍超出容量时按 last_used 淘汰最久未用的"""
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        overflow = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?
+                )
+            """, (overflow,))
+
+    # ==================== 统计 ====================
+
+    def _count(self, conn: sqlite3.Connection, hit: bool):
+        conn.execute("""
+            INSERT INTO llm_cache_stats (day, hits, misses) VALUES (?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                hits = hits + excluded.hits,
+                misses = misses + excluded.misses
+        """, (date.today().isoformat(), int(hit), int(not hit)))
+
+    def stats(self, day: Optional[date] = None) -> dict:
+        """
+        某天的命中统计（默认今天）
+
+        Returns: {"day", "hits", "misses", "hit_rate", "entries"}
+        """
+        day_str = (day or date.today()).isoformat()
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT hits, misses FROM llm_cache_stats WHERE day = ?", (day_str,)
+            ).fetchone()
+            entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+        hits, misses = row if row else (0, 0)
+        total = hits + misses
+        return {
+            "day": day_str,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": entries,
+        }
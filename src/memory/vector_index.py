@@ -0,0 +1,377 @@
+"""
+记忆系统 - 语义向量索引（可选）
+
+关键词 FTS 找不到同义改写（"deployment problem" ↔ "上线失败"），这里在
+MemoryIndex 旁边维护一份向量索引：
+
+- 向量: 定长 float32，按行存放在内存映射文件 vectors.f32 中；
+  追加只写新行，容量不足时把文件扩大一倍，不重建已有矩阵
+- id 映射: index.db 的 memory_vectors 表（entry_id ↔ 行号）
+- 检索: 分批暴力点积取 top-k，可与 FTS 排序做 RRF 融合
+- 向量模型可插拔：本地 sentence-transformers 模型，或离线可用的哈希向量
+
+依赖 numpy（可选）；未安装时 HAS_NUMPY = False，调用方应跳过语义检索。
+"""
+import json
+import logging
+import re
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from .index import MemoryIndex, IndexEntry
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 向量模型 ====================
+
+class Embedder(ABC):
+    """向量模型接口：embed() 返回 L2 归一化的 (n, dim) float32 矩阵"""
+    name: str = "base"
+    dim: int = 0
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """批量向量化"""
+        ...
+
+
+class HashingEmbedder(Embedder):
+    """
+    哈希向量（离线兜底）
+
+    拉丁文按词、中文按单字和相邻双字切分，带符号地哈希到 dim 维。
+    只反映字面重叠，跨语言的同义改写需要配置本地模型。
+    """
+
+    _TOKEN = re.compile(r"[a-z0-9_]+|[\u3400-\u9fff]+")
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for token in self._TOKEN.findall(text.lower()):
+            if token.isascii():
+                features.append(token)
+            else:
+                features.extend(token)
+                features.extend(token[i:i + 2] for i in range(len(token) - 1))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(matrix)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """本地 sentence-transformers 模型（需要另外安装 sentence-transformers）"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self.name = model_name
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = self._model.encode(
+            list(texts), batch_size=32, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+def load_embedder(model: str = "hashing") -> Embedder:
+    """
+    按名称加载向量模型
+
+    "hashing" / "hashing-512" → 哈希向量；其他名称按 sentence-transformers 模型加载，
+    加载失败时退回哈希向量。
+    """
+    if model.startswith("hashing"):
+        _, _, dim = model.partition("-")
+        return HashingEmbedder(int(dim) if dim else 256)
+    try:
+        return SentenceTransformerEmbedder(model)
+    except Exception as e:
+        logger.warning("加载向量模型 %s 失败（%s），改用哈希向量", model, e)
+        return HashingEmbedder()
+
+
+def _normalize(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def entry_text(title: str, summary: Optional[str], tags: Sequence[str] = ()) -> str:
+    """参与向量化的文本：标题 + 摘要 + 标签"""
+    return "\n".join(part for part in (title, summary or "", " ".join(tags)) if part)
+
+
+# ==================== 向量索引 ====================
+
+@dataclass
+class VectorHit:
+    """向量检索命中"""
+    entry_id: str
+    score: float  # 余弦相似度
+
+
+class VectorIndex:
+    """
+    内存映射的向量索引
+
+    daemon 与 CLI 可能同时写：写入在 BEGIN IMMEDIATE 事务内分配行号，
+    先落盘向量再提交映射，读者只看已提交的行数。
+    """
+
+    # 向量文件的最小容量（行）
+    MIN_CAPACITY = 1024
+    # 检索时每批参与点积的行数
+    SEARCH_BATCH = 8192
+    # 每次调用向量模型的文本数
+    EMBED_BATCH = 64
+    # RRF 融合常数
+    RRF_K = 60
+
+    def __init__(self, index: MemoryIndex, path: Path, embedder: Optional[Embedder] = None):
+        if not HAS_NUMPY:
+            raise RuntimeError("语义索引需要 numpy：pip install numpy")
+        self.index = index
+        self.path = Path(path)
+        self.embedder = embedder or HashingEmbedder()
+        self._matrix: Optional["np.memmap"] = None
+        self._capacity = 0
+        self._init_db()
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.embedder.dim * 4
+
+    def _init_db(self):
+        """初始化映射表；向量模型或维度变化时清空旧向量"""
+        with self.index._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS memory_vectors (
+                    entry_id TEXT PRIMARY KEY,
+                    row INTEGER NOT NULL UNIQUE
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS memory_vector_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            meta = dict(conn.execute("SELECT key, value FROM memory_vector_meta").fetchall())
+            if meta.get("model") != self.embedder.name or meta.get("dim") != str(self.embedder.dim):
+                if meta:
+                    logger.info("向量模型变为 %s，重建语义索引", self.embedder.name)
+                conn.execute("DELETE FROM memory_vectors")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO memory_vector_meta (key, value) VALUES (?, ?)",
+                    [("model", self.embedder.name), ("dim", str(self.embedder.dim)), ("count", "0")]
+                )
+                self.path.unlink(missing_ok=True)
+
+    def _committed_rows(self, conn) -> int:
+        return int(conn.execute("SELECT value FROM memory_vector_meta WHERE key = 'count'").fetchone()[0])
+
+    def _map(self, rows: int, grow: bool = False):
+        """确保内存映射覆盖至少 rows 行；grow=True 时不够就把文件扩大（至少一倍）"""
+        file_rows = self.path.stat().st_size // self._row_bytes if self.path.exists() else 0
+        if grow and file_rows < rows:
+            new_rows = max(rows, file_rows * 2, self.MIN_CAPACITY)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.truncate(new_rows * self._row_bytes)
+            file_rows = new_rows
+        if file_rows != self._capacity:
+            self._matrix = None
+            if file_rows:
+                self._matrix = np.memmap(
+                    self.path, dtype=np.float32, mode="r+", shape=(file_rows, self.embedder.dim)
+                )
+            self._capacity = file_rows
+
+    # ==================== 写入 ====================
+
+    def add(self, items: Sequence[tuple]) -> int:
+        """
+        写入 (entry_id, text) 列表；已存在的 id 原地覆盖，新 id 追加到末尾
+        Returns: 写入条数
+        """
+        written = 0
+        for start in range(0, len(items), self.EMBED_BATCH):
+            batch = items[start:start + self.EMBED_BATCH]
+            vectors = self.embedder.embed([text for _, text in batch])
+            written += self._write(batch, vectors)
+        return written
+
+    def _write(self, batch: Sequence[tuple], vectors: "np.ndarray") -> int:
+        conn = self.index._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._committed_rows(conn)
+            placeholders = ", ".join("?" * len(batch))
+            existing = dict(conn.execute(
+                f"SELECT entry_id, row FROM memory_vectors WHERE entry_id IN ({placeholders})",
+                [entry_id for entry_id, _ in batch]
+            ).fetchall())
+
+            rows = []
+            for entry_id, _ in batch:
+                if entry_id not in existing:
+                    existing[entry_id] = count
+                    count += 1
+                rows.append(existing[entry_id])
+
+            self._map(count, grow=True)
+            self._matrix[rows] = vectors
+            self._matrix.flush()
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO memory_vectors (entry_id, row) VALUES (?, ?)",
+                [(entry_id, row) for (entry_id, _), row in zip(batch, rows)]
+            )
+            conn.execute("UPDATE memory_vector_meta SET value = ? WHERE key = 'count'", (str(count),))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return len(batch)
+
+    def remove(self, entry_ids: Sequence[str]) -> int:
+        """删除向量（行清零，不再映射；空行不回收）"""
+        if not entry_ids:
+            return 0
+        conn = self.index._connection()
+        with conn:
+            placeholders = ", ".join("?" * len(entry_ids))
+            rows = [r[0] for r in conn.execute(
+                f"SELECT row FROM memory_vectors WHERE entry_id IN ({placeholders})", list(entry_ids)
+            ).fetchall()]
+            if rows:
+                self._map(max(rows) + 1)
+                self._matrix[rows] = 0.0
+                self._matrix.flush()
+                conn.execute(f"DELETE FROM memory_vectors WHERE entry_id IN ({placeholders})", list(entry_ids))
+        return len(rows)
+
+    def sync(self, batch: int = 256) -> int:
+        """
+        与 memory_index 对齐：为还没有向量的条目补向量，删除已不存在条目的向量
+        Returns: 新增的向量数
+        """
+        conn = self.index._connection()
+        added = 0
+        while True:
+            rows = conn.execute("""
+                SELECT m.id, m.title, m.summary, m.tags FROM memory_index AS m
+                LEFT JOIN memory_vectors AS v ON v.entry_id = m.id
+                WHERE v.entry_id IS NULL
+                LIMIT ?
+            """, (batch,)).fetchall()
+            if not rows:
+                break
+            added += self.add([
+                (row["id"], entry_text(row["title"], row["summary"], json.loads(row["tags"] or "[]")))
+                for row in rows
+            ])
+
+        orphans = [r[0] for r in conn.execute("""
+            SELECT v.entry_id FROM memory_vectors AS v
+            LEFT JOIN memory_index AS m ON m.id = v.entry_id
+            WHERE m.id IS NULL
+        """).fetchall()]
+        self.remove(orphans)
+        return added
+
+    def count(self) -> int:
+        with self.index._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM memory_vectors").fetchone()[0]
+
+    # ==================== 查询 ====================
+
+    def search(self, query: str, k: int = 10) -> List[VectorHit]:
+        """分批暴力检索余弦相似度最高的 k 条"""
+        with self.index._connection() as conn:
+            count = self._committed_rows(conn)
+        if not count or not query.strip():
+            return []
+        self._map(count)
+
+        q = self.embedder.embed([query])[0]
+        want = k * 2  # 多取一些，抵消已删除的空行
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, count, self.SEARCH_BATCH):
+            scores = np.asarray(self._matrix[start:min(count, start + self.SEARCH_BATCH)] @ q)
+            top = np.argpartition(-scores, want)[:want] if len(scores) > want else np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > want:
+                keep = np.argpartition(-best_scores, want)[:want]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        best_rows, best_scores = best_rows[order], best_scores[order]
+        positive = best_scores > 0
+        best_rows, best_scores = best_rows[positive], best_scores[positive]
+        if not len(best_rows):
+            return []
+
+        placeholders = ", ".join("?" * len(best_rows))
+        with self.index._connection() as conn:
+            ids = dict(conn.execute(
+                f"SELECT row, entry_id FROM memory_vectors WHERE row IN ({placeholders})",
+                [int(r) for r in best_rows]
+            ).fetchall())
+        hits = [
+            VectorHit(entry_id=ids[int(row)], score=float(score))
+            for row, score in zip(best_rows, best_scores)
+            if int(row) in ids
+        ]
+        return hits[:k]
+
+    def hybrid(self, query: str, limit: int = 10, marks: tuple = ("【", "】")) -> List[IndexEntry]:
+        """
+        FTS 排序与向量检索的 RRF 融合：score = Σ 1 / (RRF_K + 名次)
+
+        两路都命中的条目排在前面；只有语义命中的条目也能被召回。
+        """
+        keyword = self.index.rank(query, limit=limit * 3, marks=marks)
+        semantic = self.search(query, k=limit * 3)
+
+        fused: dict = {}
+        for rank, entry_id in enumerate(e.id for e in keyword):
+            fused[entry_id] = fused.get(entry_id, 0.0) + 1.0 / (self.RRF_K + rank + 1)
+        for rank, hit in enumerate(semantic):
+            fused[hit.entry_id] = fused.get(hit.entry_id, 0.0) + 1.0 / (self.RRF_K + rank + 1)
+
+        ranked = sorted(fused, key=fused.get, reverse=True)[:limit]
+        snippets = {e.id: e.snippet for e in keyword}
+        entries = self.index.get_many(ranked)
+        for entry in entries:
+            entry.score = fused[entry.id]
+            entry.snippet = snippets.get(entry.id)
+        return entries
+
+    def close(self):
+        self._matrix = None
+        self._capacity = 0
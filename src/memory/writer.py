@@ -5,13 +5,49 @@ LLM-native 的记忆存储：
 - 📅 daily/ 编年体日志
 - 📂 topics/ 纪传体主题
 - 🎭 persona.md 人格定义
+
+daily 日志的写入是追加式的：条目先追加到 daily/.segments/<日期>/<section>.md
+（每条 O(条目)），daily/<日期>.md 作为视图按需物化（读取时或 flush()），
+物化进度（每个 segment 已写入视图的字节偏移）记录在同目录的 offsets.json。
 """
-import os
+import fcntl
+import json
+import re
+import threading
 from datetime import datetime, date
 from pathlib import Path
-from typing import Optional, List
+from typing import Iterator, Optional, List
 from dataclasses import dataclass
 
+from ..utils.fileio import atomic_write_text
+from .catalog import MemoryCatalog
+
+
+# entry_type → daily 日志中的 section 标题
+DAILY_SECTIONS = {
+    "discovery": "## 发现",
+    "dialogue": "## 对话",
+    "decision": "## 决策",
+    "milestone": "## 里程碑",
+}
+
+# 每个条目以 "- " 开头（内容行缩进两格，不会出现在行首）
+_ENTRY_START = re.compile(r"(?m)^(?=- )")
+
+
+def _insert_after_header(content: str, section_header: str, text: str) -> str:
+    """把 text 插到 section 标题之后（跳过空行）；section 不存在时追加到末尾"""
+    lines = content.split("\n")
+    for i, line in enumerate(lines):
+        if line.strip() == section_header:
+            insert_idx = i + 1
+            # 跳过空行
+            while insert_idx < len(lines) and lines[insert_idx].strip() == "":
+                insert_idx += 1
+            lines.insert(insert_idx, text)
+            return "\n".join(lines)
+    return content + f"\n{section_header}\n\n{text}"
+
 
 @dataclass
 class MemoryEntry:
@@ -46,6 +82,9 @@ class MemoryWriter:
         self.daily_dir = memory_root / "daily"
         self.topics_dir = memory_root / "topics"
         self.persona_path = memory_root / "persona.md"
+        self._lock = threading.Lock()
+        # 所有 Markdown 文件的日期 / 大小 / 条目数，写入时更新
+        self.catalog = MemoryCatalog(memory_root)
         
         # 确保目录存在
         self._ensure_dirs()
@@ -63,21 +102,50 @@ class MemoryWriter:
             d = date.today()
         return self.daily_dir / f"{d.isoformat()}.md"
     
+    def get_segment_dir(self, d: date) -> Path:
+        """获取某天的 segment 目录"""
+        return self.daily_dir / ".segments" / d.isoformat()
+
     def append_to_daily(self, entry: MemoryEntry) -> Path:
         """
         追加条目到当日日志
-        
+
         格式：
         ## 发现
         - 10:23 ⭐⭐⭐ 标题
           内容...
+
+        只追加到对应 section 的 segment 文件，不重写日志；
+        日志视图在 read_daily() / flush() 时物化。
         """
-        daily_path = self.get_daily_path(entry.timestamp.date())
-        
-        # 如果文件不存在，创建带标题的新文件
-        if not daily_path.exists():
-            self._create_daily_file(daily_path, entry.timestamp.date())
-        
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries: List[MemoryEntry]) -> List[Path]:
+        """
+        批量追加条目：同一天同一 section 的条目合并为一次写入
+        Returns: 每个条目对应的日志路径
+        """
+        paths = []
+        segments: dict = {}
+        for entry in entries:
+            d = entry.timestamp.date()
+            daily_path = self.get_daily_path(d)
+            # 如果文件不存在，创建带标题的新文件
+            if not daily_path.exists():
+                self._create_daily_file(daily_path, d)
+            paths.append(daily_path)
+
+            section = entry.entry_type if entry.entry_type in DAILY_SECTIONS else "discovery"
+            segments.setdefault((d, section), []).append(self._format_daily_entry(entry))
+
+        for (d, section), texts in segments.items():
+            segment_dir = self.get_segment_dir(d)
+            segment_dir.mkdir(parents=True, exist_ok=True)
+            with open(segment_dir / f"{section}.md", "ab") as f:
+                f.write("".join(texts).encode("utf-8"))
+        return paths
+
+    def _format_daily_entry(self, entry: MemoryEntry) -> str:
         # 格式化条目
         time_str = entry.timestamp.strftime("%H:%M")
         stars = "⭐" * min(entry.importance, 5)
@@ -93,18 +161,19 @@ class MemoryWriter:
             indented = "\n".join(f"  {line}" for line in entry.content.split("\n"))
             entry_text += f"{indented}\n"
         entry_text += "\n"
-        
-        # 追加到对应 section
-        self._append_to_section(daily_path, entry.entry_type, entry_text)
-        
-        return daily_path
+        return entry_text
     
     def _create_daily_file(self, path: Path, d: date):
         """创建新的日志文件"""
+        template = self._daily_template(d)
+        path.write_text(template, encoding="utf-8")
+        self.catalog.record(path, template)
+
+    def _daily_template(self, d: date) -> str:
         weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
         weekday = weekday_names[d.weekday()]
         
-        template = f"""# {d.isoformat()} {weekday}
+        return f"""# {d.isoformat()} {weekday}
 
 ## 发现
 
@@ -115,60 +184,138 @@ class MemoryWriter:
 ## 里程碑
 
 """
-        path.write_text(template, encoding="utf-8")
+
+    def materialize(self, d: date = None) -> bool:
+        """
+        把 segment 中尚未写入视图的条目合并进当日日志（每个 section 内新条目在前）
+
+        日志原子替换后再更新 offsets.json；进程内外都加锁，daemon 与 CLI 可同时调用。
+        Returns: 是否重写了日志
+        """
+        if d is None:
+            d = date.today()
+        segment_dir = self.get_segment_dir(d)
+        if not segment_dir.is_dir():
+            return False
+
+        with self._lock, open(segment_dir / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            offsets_path = segment_dir / "offsets.json"
+            try:
+                offsets = json.loads(offsets_path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                offsets = {}
+
+            pending = {}
+            for section in DAILY_SECTIONS:
+                segment = segment_dir / f"{section}.md"
+                start = offsets.get(section, 0)
+                try:
+                    with open(segment, "rb") as f:
+                        f.seek(start)
+                        data = f.read()
+                except FileNotFoundError:
+                    continue
+                # 只取完整的条目（条目以空行结尾），写到一半的留给下次
+                end = data.rfind(b"\n\n") + 2
+                if end < 2:
+                    continue
+                pending[section] = data[:end].decode("utf-8", errors="replace")
+                offsets[section] = start + end
+
+            if not pending:
+                return False
+
+            daily_path = self.get_daily_path(d)
+            try:
+                content = daily_path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                content = self._daily_template(d)
+            for section, text in pending.items():
+                entries = [e for e in _ENTRY_START.split(text) if e]
+                content = _insert_after_header(
+                    content, DAILY_SECTIONS[section], "\n".join(reversed(entries))
+                )
+
+            atomic_write_text(daily_path, content)
+            atomic_write_text(offsets_path, json.dumps(offsets))
+            self.catalog.record(daily_path, content, save=False)
+            return True
+
+    def flush(self) -> int:
+        """
+        物化所有有未写入条目的日志，清理已完全物化的往日 segment，并保存文件目录
+        Returns: 重写的日志数
+        """
+        segments_root = self.daily_dir / ".segments"
+        if not segments_root.is_dir():
+            return 0
+
+        rewritten = 0
+        # 前天及更早的日志不会再有新条目，物化完即可删除 segment
+        prune_before = date.fromordinal(date.today().toordinal() - 1)
+        for segment_dir in sorted(segments_root.iterdir()):
+            try:
+                d = date.fromisoformat(segment_dir.name)
+            except ValueError:
+                continue
+            if self.materialize(d):
+                rewritten += 1
+            if d < prune_before:
+                self._prune_segments(segment_dir)
+        self.catalog.flush()
+        return rewritten
+
+    def _prune_segments(self, segment_dir: Path):
+        """删除已完全物化的 segment 目录"""
+        with self._lock, open(segment_dir / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                offsets = json.loads((segment_dir / "offsets.json").read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                offsets = {}
+            for section in DAILY_SECTIONS:
+                segment = segment_dir / f"{section}.md"
+                if segment.exists() and segment.stat().st_size > offsets.get(section, 0):
+                    return
+            for path in segment_dir.iterdir():
+                path.unlink()
+            segment_dir.rmdir()
     
     def _append_to_section(self, path: Path, entry_type: str, text: str):
-        """追加内容到指定 section"""
-        section_map = {
-            "discovery": "## 发现",
-            "dialogue": "## 对话",
-            "decision": "## 决策",
-            "milestone": "## 里程碑",
-        }
-        section_header = section_map.get(entry_type, "## 发现")
-        
-        content = path.read_text(encoding="utf-8")
-        
-        # 找到 section 位置，在其后追加
-        lines = content.split("\n")
-        insert_idx = None
-        
-        for i, line in enumerate(lines):
-            if line.strip() == section_header:
-                insert_idx = i + 1
-                # 跳过空行
-                while insert_idx < len(lines) and lines[insert_idx].strip() == "":
-                    insert_idx += 1
-                break
-        
-        if insert_idx is not None:
-            # 在 section 后插入
-            lines.insert(insert_idx, text)
-            path.write_text("\n".join(lines), encoding="utf-8")
-        else:
-            # section 不存在，追加到文件末尾
-            with open(path, "a", encoding="utf-8") as f:
-                f.write(f"\n{section_header}\n\n{text}")
+        """追加内容到指定 section（读改写整个文件，只用于低频的主题文件）"""
+        section_header = DAILY_SECTIONS.get(entry_type, "## 发现")
+        content = _insert_after_header(path.read_text(encoding="utf-8"), section_header, text)
+        atomic_write_text(path, content)
+        self.catalog.record(path, content)
     
     def read_daily(self, d: date = None) -> Optional[str]:
-        """读取当日日志"""
+        """读取当日日志（先物化未写入的条目）"""
+        self.materialize(d)
         path = self.get_daily_path(d)
         if path.exists():
             return path.read_text(encoding="utf-8")
         return None
     
+    def iter_dailies(
+        self, start: Optional[date] = None, end: Optional[date] = None
+    ) -> Iterator[tuple[date, str]]:
+        """
+        按日期范围（含两端）从新到旧逐天产出 (日期, 内容)
+
+        只读取目录中存在的日志，调用方停止迭代后不再读取更早的文件
+        """
+        for entry in self.catalog.dailies(start, end):
+            d = date.fromisoformat(entry.date)
+            content = self.read_daily(d)
+            if content:
+                yield d, content
+    
     def read_recent_dailies(self, days: int = 7) -> List[tuple[date, str]]:
         """读取最近 N 天的日志"""
-        result = []
         today = date.today()
-        
-        for i in range(days):
-            d = date.fromordinal(today.toordinal() - i)
-            content = self.read_daily(d)
-            if content:
-                result.append((d, content))
-        
-        return result
+        start = date.fromordinal(today.toordinal() - days + 1)
+        return list(self.iter_dailies(start, today))
     
     # ==================== Topics (纪传体) ====================
     
@@ -210,6 +357,7 @@ class MemoryWriter:
 
 """
         path.write_text(template, encoding="utf-8")
+        self.catalog.record(path, template)
     
     def read_topic(self, topic_name: str) -> Optional[str]:
         """读取主题文件"""
@@ -220,7 +368,7 @@ class MemoryWriter:
     
     def list_topics(self) -> List[str]:
         """列出所有主题"""
-        return [p.stem for p in self.topics_dir.glob("*.md")]
+        return [Path(e.path).stem for e in self.catalog.files("topics")]
     
     # ==================== Persona (人格) ====================
     
@@ -269,6 +417,7 @@ class MemoryWriter:
 *最后更新: {datetime.now().isoformat()}*
 """
         self.persona_path.write_text(template, encoding="utf-8")
+        self.catalog.record(self.persona_path, template)
     
     def append_to_persona(self, section: str, content: str):
         """追加内容到人格文件的指定 section"""
@@ -278,3 +427,4 @@ class MemoryWriter:
         # 简单追加到文件末尾（可以优化为精确插入）
         with open(self.persona_path, "a", encoding="utf-8") as f:
             f.write(f"\n### {section}\n\n{content}\n")
+        self.catalog.record(self.persona_path)
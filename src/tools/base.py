@@ -75,6 +75,15 @@ class Tool(ABC):
         """
         ...
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        """
+        并发冲突键
+
+        同一轮中冲突键相同的调用按原顺序串行执行，None 表示可与其他调用并发。
+        有副作用的工具应覆盖此方法（如 file_write 按目标路径返回键）。
+        """
+        return None
+
     def to_openai_function(self) -> dict:
         """转换为 OpenAI function calling 格式"""
         return {
@@ -6,6 +6,7 @@ Layer 0 原子工具。支持全文或按行范围读取。
 
 import os
 from pathlib import Path
+from typing import Optional
 
 from ..base import Tool, ToolResult
 
@@ -41,6 +42,11 @@ class FileReadTool(Tool):
             "required": ["path"],
         }
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        # 与 file_write 共用路径键，读写同一文件时保持原顺序
+        path = os.path.expanduser(os.path.expandvars(kwargs.get("path", "")))
+        return f"path:{Path(path).resolve()}"
+
     async def execute(self, **kwargs) -> ToolResult:
         path = kwargs.get("path", "")
         start_line = kwargs.get("start_line")
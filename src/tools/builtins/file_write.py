@@ -6,6 +6,7 @@ Layer 0 原子工具。支持创建、覆盖、追加三种模式。
 
 import os
 from pathlib import Path
+from typing import Optional
 
 from ..base import Tool, ToolResult
 
@@ -55,6 +56,11 @@ class FileWriteTool(Tool):
             "required": ["path", "content"],
         }
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        # 同一路径的写入按原顺序串行，不同路径可并发
+        path = os.path.expanduser(os.path.expandvars(kwargs.get("path", "")))
+        return f"path:{Path(path).resolve()}"
+
     async def execute(self, **kwargs) -> ToolResult:
         path = kwargs.get("path", "")
         content = kwargs.get("content", "")
@@ -7,6 +7,7 @@ Layer 0 原子工具。带超时保护和危险命令警告。
 import asyncio
 import os
 import shlex
+from typing import Optional
 
 from ..base import Tool, ToolResult
 
@@ -51,6 +52,10 @@ class ShellExecTool(Tool):
             "required": ["command"],
         }
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        # 命令副作用不可预知，同一轮的 shell 命令一律串行
+        return self.name
+
     async def execute(self, **kwargs) -> ToolResult:
         command = kwargs.get("command", "")
         workdir = kwargs.get("workdir")
@@ -6,6 +6,7 @@ Layer 1 元工具。生成 FastMCP 格式的 MCP Server 项目骨架。
 
 import json
 from pathlib import Path
+from typing import Optional
 
 from ..base import Tool, ToolResult
 
@@ -120,6 +121,10 @@ class CreateMCPTool(Tool):
             "required": ["name", "description"],
         }
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        # 生成 MCP 项目目录，同一轮内不并发
+        return self.name
+
     async def execute(self, **kwargs) -> ToolResult:
         server_name = kwargs.get("name", "")
         description = kwargs.get("description", "")
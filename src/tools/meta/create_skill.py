@@ -7,6 +7,7 @@ Skills 存放在 ~/.jarvis/skills/{name}/
 
 import os
 from pathlib import Path
+from typing import Optional
 
 from ..base import Tool, ToolResult
 
@@ -70,6 +71,10 @@ class CreateSkillTool(Tool):
             "required": ["name", "description", "instructions"],
         }
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        # 写入 ~/.jarvis/skills/，同一轮内不并发
+        return self.name
+
     async def execute(self, **kwargs) -> ToolResult:
         skill_name = kwargs.get("name", "")
         skill_desc = kwargs.get("description", "")
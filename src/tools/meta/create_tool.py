@@ -7,6 +7,7 @@ Layer 1 元工具。生成标准 Tool 子类代码并保存到 ~/.jarvis/tools/
 import os
 import json
 from pathlib import Path
+from typing import Optional
 from textwrap import dedent
 
 from ..base import Tool, ToolResult
@@ -79,6 +80,10 @@ class CreateToolTool(Tool):
             "required": ["name", "description", "parameters_schema", "code"],
         }
 
+    def concurrency_key(self, **kwargs) -> Optional[str]:
+        # 写入 ~/.jarvis/tools/ 的代码文件，同一轮内不并发
+        return self.name
+
     async def execute(self, **kwargs) -> ToolResult:
         tool_name = kwargs.get("name", "")
         description = kwargs.get("description", "")
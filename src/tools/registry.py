@@ -4,9 +4,10 @@ Tool Registry — 工具注册表
 自动发现 builtins/ 和 meta/ 下的工具，统一管理。
 """
 
+import asyncio
 import importlib
 import pkgutil
-from typing import Optional
+from typing import Callable, Optional
 
 from .base import Tool, ToolResult
 
@@ -51,11 +52,11 @@ class ToolRegistry:
         """导出为 OpenAI tools 格式（用于 function calling）"""
         return [tool.to_openai_function() for tool in self._tools.values()]
 
-    async def execute(self, tool_name: str, **kwargs) -> ToolResult:
+    async def execute(self, tool_name: str, /, **kwargs) -> ToolResult:
         """执行指定工具
 
         Args:
-            tool_name: 工具名称（用 tool_name 避免与工具参数 name 冲突）
+            tool_name: 工具名称（仅限位置参数，工具参数里也可以有 name / tool_name）
             **kwargs: 工具参数
         """
         tool = self.get(tool_name)
@@ -74,6 +75,81 @@ class ToolRegistry:
                 error=f"Tool '{tool_name}' execution failed: {e}"
             )
 
+    def _concurrency_key(self, tool_name: str, args: dict) -> Optional[str]:
+        tool = self.get(tool_name)
+        if not tool:
+            return None
+        try:
+            return tool.concurrency_key(**args)
+        except Exception:
+            return tool_name  # 无法判断时保守串行
+
+    async def execute_many(
+        self,
+        calls: list[tuple[str, dict]],
+        max_concurrency: int = 4,
+        on_start: Optional[Callable[[str, dict], None]] = None,
+        on_end: Optional[Callable[[str, ToolResult], None]] = None,
+    ) -> list[ToolResult]:
+        """并发执行一组工具调用（同一轮 LLM 回复中的多个 tool_calls）
+
+        - concurrency_key 相同的调用按原顺序串行，其余在 max_concurrency 上限内并发
+        - 返回结果与 calls 顺序一致
+        - on_start / on_end 也按原顺序触发，便于 CLI 逐行显示
+        - 单个调用出错（含参数不是 dict）只得到失败的 ToolResult，不影响其他调用
+
+        Args:
+            calls: [(tool_name, kwargs), ...]
+            max_concurrency: 同时执行的工具数上限
+        """
+        if not calls:
+            return []
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in calls]
+
+        # 按冲突键分"车道"：车道内串行，车道间并发
+        lanes: dict[object, list[int]] = {}
+        for i, (tool_name, args) in enumerate(calls):
+            key = self._concurrency_key(tool_name, args)
+            lanes.setdefault(key if key is not None else i, []).append(i)
+
+        async def run_lane(indices: list[int]) -> None:
+            for i in indices:
+                tool_name, args = calls[i]
+                try:
+                    if not isinstance(args, dict):
+                        raise TypeError(f"arguments must be an object, got {type(args).__name__}")
+                    async with semaphore:
+                        result = await self.execute(tool_name, **args)
+                except Exception as e:
+                    result = ToolResult(
+                        success=False,
+                        output="",
+                        error=f"Tool '{tool_name}' execution failed: {e}"
+                    )
+                if not futures[i].done():
+                    futures[i].set_result(result)
+
+        lane_tasks = asyncio.gather(*(run_lane(indices) for indices in lanes.values()))
+        try:
+            results = []
+            for (tool_name, args), future in zip(calls, futures):
+                if on_start:
+                    on_start(tool_name, args)
+                result = await future
+                if on_end:
+                    on_end(tool_name, result)
+                results.append(result)
+            await lane_tasks
+            return results
+        finally:
+            # 提前退出（回调出错、被取消）时取消剩余调用，并取走结果免得告警
+            lane_tasks.cancel()
+            if lane_tasks.done() and not lane_tasks.cancelled():
+                lane_tasks.exception()
+
     def discover(self) -> int:
         """
         自动发现并注册工具
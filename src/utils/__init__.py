@@ -0,0 +1,7 @@
+"""
+通用工具（只依赖标准库，任何包都可以导入而不拖入 daemon / llm 的依赖）
+"""
+from .fileio import atomic_write_json, atomic_write_text
+from .write_queue import WriteBehindQueue, WriteQueueMetrics
+
+__all__ = ["atomic_write_json", "atomic_write_text", "WriteBehindQueue", "WriteQueueMetrics"]
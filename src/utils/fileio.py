@@ -0,0 +1,40 @@
+"""
+原子文件写入
+
+写到同目录临时文件再 os.replace：读者看到的要么是完整的旧文件，要么是完整的新文件，
+写到一半崩溃也不会留下截断的文件。只依赖标准库，memory / daemon / evolution 共用。
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+PathLike = Union[str, Path]
+
+
+def atomic_write_text(path: PathLike, text: str) -> None:
+    """原子写入文本（UTF-8，不做换行符转换）；父目录不存在时创建"""
+    path = os.fspath(path)
+    directory = os.path.dirname(path) or "."
+    suffix = os.path.splitext(path)[1]
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=suffix)
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: PathLike, data, indent: Optional[int] = None) -> None:
+    """原子写入 JSON（保留非 ASCII 字符）"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
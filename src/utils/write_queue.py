@@ -0,0 +1,173 @@
+"""
+写入队列（write-behind）
+
+发现的落盘（发现存储、Markdown 日志、SQLite 索引、通知）不在事件循环里同步做：
+_process_discovery 只把发现放进队列，后台线程把短时间内到达的发现攒成一批，
+交给 commit 回调一次提交（一个事务、每个文件一次追加）。
+
+- flush(): 等待此前提交的条目全部落盘
+- close(): flush 后停止线程（daemon stop() 时调用，保证不丢）
+- metrics(): 队列深度、批大小、提交耗时
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+
+# 队列中的控制信号
+_FLUSH = object()
+_STOP = object()
+
+
+@dataclass
+class WriteQueueMetrics:
+    """写入队列统计"""
+    submitted: int = 0
+    committed: int = 0
+    failed: int = 0
+    batches: int = 0
+    depth: int = 0              # 已提交但尚未落盘的条数
+    max_depth: int = 0
+    last_batch_size: int = 0
+    last_commit_ms: float = 0.0
+    max_commit_ms: float = 0.0
+    total_commit_ms: float = 0.0
+
+    @property
+    def avg_commit_ms(self) -> float:
+        return self.total_commit_ms / self.batches if self.batches else 0.0
+
+    @property
+    def avg_batch_size(self) -> float:
+        return (self.committed + self.failed) / self.batches if self.batches else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.committed} 条 / {self.batches} 批（平均 {self.avg_batch_size:.1f} 条/批），"
+            f"提交耗时 平均 {self.avg_commit_ms:.1f} ms / 最大 {self.max_commit_ms:.1f} ms，"
+            f"队列深度 {self.depth}（峰值 {self.max_depth}）"
+            + (f"，失败 {self.failed} 条" if self.failed else "")
+        )
+
+
+class WriteBehindQueue:
+    """
+    后台线程批量提交
+
+    commit(batch) 在工作线程中调用；抛出异常时这一批记为失败，不重试
+    （避免坏数据反复阻塞队列）。
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[list], None],
+        max_batch: int = 64,
+        max_delay: float = 0.5,
+        name: str = "jarvis-writer",
+    ):
+        self.commit = commit
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._metrics = WriteQueueMetrics()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, item) -> None:
+        """放入队列立即返回（线程安全）"""
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            self._metrics.submitted += 1
+            self._metrics.depth += 1
+            self._metrics.max_depth = max(self._metrics.max_depth, self._metrics.depth)
+        self._queue.put(item)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已提交的条目全部落盘
+        Returns: 超时前是否清空
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._metrics.depth == 0
+        self._queue.put(_FLUSH)
+        with self._cond:
+            return self._cond.wait_for(lambda: self._metrics.depth == 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """清空队列并停止工作线程"""
+        if self._thread is None:
+            return True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        done = not self._thread.is_alive()
+        if done:
+            self._thread = None
+        return done
+
+    def metrics(self) -> WriteQueueMetrics:
+        """统计快照"""
+        with self._cond:
+            return replace(self._metrics)
+
+    # ── 工作线程 ──────────────────────────────────────────
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [] if item is _FLUSH else [item]
+
+            # 攒批：最多 max_batch 条，或等到 max_delay；收到 flush / stop 立即提交
+            deadline = time.monotonic() + self.max_delay
+            while batch and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _FLUSH:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if batch:
+                self._commit(batch)
+            else:
+                with self._cond:
+                    self._cond.notify_all()
+
+    def _commit(self, batch: list):
+        started = time.perf_counter()
+        ok = True
+        try:
+            self.commit(batch)
+        except Exception as e:
+            ok = False
+            print(f"[Daemon] 写入队列提交失败（{len(batch)} 条）: {e}")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._cond:
+            m = self._metrics
+            m.batches += 1
+            if ok:
+                m.committed += len(batch)
+            else:
+                m.failed += len(batch)
+            m.depth -= len(batch)
+            m.last_batch_size = len(batch)
+            m.last_commit_ms = elapsed_ms
+            m.max_commit_ms = max(m.max_commit_ms, elapsed_ms)
+            m.total_commit_ms += elapsed_ms
+            self._cond.notify_all()
@@ -0,0 +1,965 @@
+"""
+Phase 2 Memory System & Daemon 基础设施 — 测试脚本
+
+测试覆盖:
+1. LLMCache: 命中/未命中、prompt 规范化、TTL 过期、LRU 淘汰、按天统计
+2. ChangeCoalescer: 同路径合并、去抖、按目录/类型聚合、摘要有界
+3. IgnoreMatcher: gitignore 语义、.gitignore/.jarvisignore、监控点规划
+4. StateWriter: 原子写入、仅变化时写、心跳间隔、mmap 状态记录
+5. DiscoveryStore: 追加日志、侧索引、跨实例同步、压缩、旧格式迁移
+6. SQLiteDiscoveryStore: discoveries 表、索引查询、单行确认、从日志导入
+7. MemoryIndex 连接: WAL、连接复用、bulk_add 单事务、多线程
+8. 标签表: 触发器同步、标签过滤走索引、标签计数、旧库回填
+9. 排序召回: trigram 中文检索、bm25 × 重要性 × 时间衰减、snippet、短词兜底
+10. ContentIndexer: Markdown 切分、增量索引（mtime / 哈希）、全文检索
+11. VectorIndex: 哈希向量、内存映射追加与扩容、删除、同步、RRF 融合（需要 numpy）
+12. MemoryWriter 日志: segment 追加、按需物化、增量合并、保留手工编辑、清理旧 segment
+13. WriteBehindQueue: 攒批提交、flush / close 不丢、失败计数、daemon 批量落盘
+14. MemoryCatalog: 写入时登记、按目录 mtime 对账、日期范围生成器
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+
+# ── 颜色辅助 ──────────────────────────────────────────────
+
+def green(s): return f"\033[32m{s}\033[0m"
+def red(s): return f"\033[31m{s}\033[0m"
+def yellow(s): return f"\033[33m{s}\033[0m"
+def cyan(s): return f"\033[36m{s}\033[0m"
+def bold(s): return f"\033[1m{s}\033[0m"
+
+
+class TestRunner:
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+        self.errors = []
+
+    def check(self, name: str, condition: bool, detail: str = ""):
+        if condition:
+            print(f"  {green('✅')} {name}")
+            self.passed += 1
+        else:
+            msg = f"  {red('❌')} {name}" + (f" — {detail}" if detail else "")
+            print(msg)
+            self.failed += 1
+            self.errors.append(name)
+
+    def summary(self):
+        total = self.passed + self.failed
+        print(f"\n{'='*60}")
+        if self.failed == 0:
+            print(f"{green(bold(f'🎉 ALL PASSED: {total}/{total}'))}")
+        else:
+            print(f"{red(bold(f'❌ FAILED: {self.failed}/{total}'))}")
+            for e in self.errors:
+                print(f"  - {e}")
+        print(f"{'='*60}\n")
+        return self.failed == 0
+
+
+async def main():
+    runner = TestRunner()
+    tmp_dir = tempfile.mkdtemp(prefix="jarvis_memory_test_")
+    jarvis_home = Path(tmp_dir) / ".jarvis"
+
+    try:
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 1. LLMCache 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from src.memory import LLMCache
+
+        cache = LLMCache(jarvis_home / "llm_cache.db", ttl_seconds=60, max_entries=3)
+
+        # 1a. 未命中
+        runner.check("空缓存未命中", cache.get("m", "hello") is None)
+
+        # 1b. 写入后命中，空白差异不影响
+        cache.put("m", "hello   world\n", "hi")
+        runner.check("写入后命中", cache.get("m", "hello world") == "hi")
+        runner.check(
+            "规范化 prompt（空白折叠）",
+            cache.get("m", "  hello\n\tworld ") == "hi",
+        )
+
+        # 1c. 模型不同不共享
+        runner.check("不同模型不命中", cache.get("other-model", "hello world") is None)
+
+        # 1d. TTL 过期
+        cache.put("m", "short-lived", "x", ttl_seconds=0)
+        runner.check("TTL 过期后未命中", cache.get("m", "short-lived") is None)
+
+        # 1e. LRU 淘汰：容量 3，先访问 a，再写 d → b 被淘汰
+        lru = LLMCache(jarvis_home / "lru.db", max_entries=3)
+        for key in ("a", "b", "c"):
+            lru.put("m", key, key.upper())
+            time.sleep(0.01)
+        lru.get("m", "a")
+        lru.put("m", "d", "D")
+        runner.check(
+            "LRU 淘汰最久未用的条目",
+            lru.get("m", "b") is None and lru.get("m", "a") == "A" and lru.get("m", "d") == "D",
+        )
+        runner.check("容量上限", lru.stats()["entries"] == 3, f"实际: {lru.stats()['entries']}")
+
+        # 1f. 按天统计
+        stats = cache.stats()
+        runner.check(
+            "按天统计命中/未命中",
+            stats["hits"] == 2 and stats["misses"] == 3,
+            f"实际: {stats}",
+        )
+
+        # 1g. 跨实例持久化
+        reopened = LLMCache(jarvis_home / "llm_cache.db")
+        runner.check("缓存持久化到磁盘", reopened.get("m", "hello world") == "hi")
+
+        # 1h. wrap: 第二次调用不再触发底层 llm_call
+        calls = []
+
+        async def fake_llm(prompt: str) -> str:
+            calls.append(prompt)
+            return f"answer:{prompt}"
+
+        cached_llm = cache.wrap("m", fake_llm)
+        first = await cached_llm("same prompt")
+        second = await cached_llm("same  prompt")
+        runner.check(
+            "wrap() 包装 llm_call 命中缓存",
+            first == second == "answer:same prompt" and len(calls) == 1,
+            f"calls: {len(calls)}",
+        )
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 2. ChangeCoalescer 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from src.daemon.changes import ChangeCoalescer
+
+        root = str(Path(tmp_dir) / "project")
+        coalescer = ChangeCoalescer(roots=[root], quiet_seconds=0.05, max_tracked_paths=10)
+
+        def at(rel: str) -> str:
+            return os.path.join(root, rel)
+
+        # 2a. 同路径合并
+        coalescer.record("created", at("new.py"))
+        coalescer.record("modified", at("new.py"))
+        coalescer.record("modified", at("new.py"))
+        coalescer.record("modified", at("old.py"))
+        coalescer.record("deleted", at("old.py"))
+        coalescer.record("created", at("tmp.swp"))
+        coalescer.record("deleted", at("tmp.swp"))
+
+        # 2b. 去抖：突发中不交出
+        runner.check("突发期间不交出批次", not coalescer.drain())
+        delay = coalescer.settle_delay()
+        runner.check("settle_delay 返回剩余安静期", delay is not None and 0 < delay <= 0.05)
+        time.sleep(0.06)
+        batch = coalescer.drain()
+        by_path = {c.path: c for c in batch.changes}
+        runner.check(
+            "created + modified → created（带计数）",
+            by_path[at("new.py")].action == "created" and by_path[at("new.py")].count == 3,
+        )
+        runner.check("modified + deleted → deleted", by_path[at("old.py")].action == "deleted")
+        runner.check(
+            "创建后删除的临时文件被抵消",
+            at("tmp.swp") not in by_path and batch.transient == 1,
+        )
+        runner.check("原始事件计数", batch.raw_events == 7, f"实际: {batch.raw_events}")
+        runner.check(
+            "交出后清空",
+            coalescer.pending() == 0 and coalescer.settle_delay() is None,
+        )
+
+        # 2c. 大批量：跟踪上限外的路径仍计入聚合
+        for i in range(500):
+            coalescer.record("created", at(f"node_modules/pkg{i % 5}/lib/f{i}.js"))
+        coalescer.record("modified", at("src/main.py"))
+        batch = coalescer.drain(force=True)
+        runner.check("聚合不丢数据", len(batch) == 501, f"实际: {len(batch)}")
+        runner.check("只跟踪上限内的路径", len(batch.changes) == 10)
+        runner.check(
+            "按扩展名聚合",
+            batch.by_extension[".js"] == 500 and batch.by_extension[".py"] == 1,
+        )
+        runner.check(
+            "按目录聚合（截断到两级）",
+            batch.by_directory[os.path.join("project", "node_modules", "pkg0")] == 100,
+            f"实际: {dict(batch.by_directory)}",
+        )
+
+        prompt = batch.to_prompt(max_files=20)
+        runner.check(
+            "摘要有界且包含总数",
+            len(prompt) < 2000 and "共 501 个文件" in prompt and "另有 491 个文件" in prompt,
+            f"长度: {len(prompt)}",
+        )
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 3. IgnoreMatcher 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from src.explorer.ignore import IgnoreMatcher, plan_watches
+
+        ws = Path(tmp_dir) / "workspace"
+        for rel in ("app/src", "app/node_modules/lib", "app/dist", "docs/drafts", "logs"):
+            (ws / rel).mkdir(parents=True)
+        (ws / "app" / ".gitignore").write_text("dist/\n*.log\n!keep.log\n/build\n")
+        (ws / ".jarvisignore").write_text("docs/drafts/\n")
+
+        matcher = IgnoreMatcher(["node_modules/", "*.pyc", ".git/"], roots=[ws])
+        plan = plan_watches(ws, matcher)
+        watched = {Path(p).relative_to(ws).as_posix(): recursive for p, recursive in plan}
+
+        runner.check("内置规则: 目录名", matcher.is_ignored(ws / "app/node_modules/lib/x.js"))
+        runner.check("内置规则: 扩展名", matcher.is_ignored(ws / "app/src/a.pyc"))
+        runner.check("普通文件不忽略", not matcher.is_ignored(ws / "app/src/main.py"))
+        runner.check(".gitignore 目录规则", matcher.is_ignored(ws / "app/dist/bundle.js"))
+        runner.check(".gitignore 通配符", matcher.is_ignored(ws / "app/src/debug.log"))
+        runner.check("! 取反", not matcher.is_ignored(ws / "app/src/keep.log"))
+        runner.check(
+            "/ 锚定只匹配所在目录",
+            matcher.is_ignored(ws / "app/build") and not matcher.is_ignored(ws / "app/src/build"),
+        )
+        runner.check(".gitignore 只作用于所在子树", not matcher.is_ignored(ws / "logs/run.log"))
+        runner.check(".jarvisignore 生效", matcher.is_ignored(ws / "docs/drafts/todo.md"))
+        runner.check(
+            "root 之上的路径段不参与匹配",
+            not IgnoreMatcher(["workspace/"], roots=[ws]).is_ignored(ws / "app/a.py"),
+        )
+
+        runner.check(
+            "监控点跳过被忽略的子树",
+            not any(k.startswith(("app/node_modules", "app/dist", "docs/drafts")) for k in watched),
+            f"实际: {watched}",
+        )
+        runner.check(
+            "干净子树递归监控，含忽略目录的非递归",
+            watched.get("app/src") is True and watched.get("logs") is True
+            and watched.get("app") is False and watched.get(".") is False,
+            f"实际: {watched}",
+        )
+        runner.check(
+            "监控点超上限时退回单个递归监控",
+            plan_watches(ws, matcher, max_watches=2) == [(str(ws), True)],
+        )
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 4. StateWriter 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from src.daemon.state import (
+            LifeSigns, StateWriter, read_state, read_status_record,
+            status_record_path, mark_stopped,
+        )
+
+        state_path = jarvis_home / "state.json"
+        writer = StateWriter(state_path, heartbeat_interval=60)
+        signs = LifeSigns(status="running", heartbeat_interval_seconds=60)
+
+        runner.check("首次写入", writer.write(signs) and state_path.exists())
+        runner.check(
+            "不留临时文件",
+            not any(p.name.startswith(".tmp-") for p in jarvis_home.iterdir()),
+        )
+
+        signs.last_heartbeat += timedelta(seconds=5)
+        runner.check("内容未变且未到心跳间隔时不写", not writer.write(signs))
+
+        signs.discoveries_today += 1
+        runner.check("字段变化立即写", writer.write(signs))
+        runner.check(
+            "state.json 内容正确",
+            json.loads(state_path.read_text())["discoveries_today"] == 1,
+        )
+
+        signs.last_heartbeat += timedelta(seconds=61)
+        runner.check("到心跳间隔时刷新时间戳", writer.write(signs))
+
+        record = read_status_record(status_record_path(state_path))
+        runner.check(
+            "mmap 状态记录与 state.json 一致",
+            record is not None
+            and record["status"] == "running"
+            and record["discoveries_today"] == 1
+            and record["last_heartbeat"] == signs.last_heartbeat.isoformat(),
+            f"实际: {record}",
+        )
+
+        signs.last_heartbeat += timedelta(seconds=1)
+        writer.write(signs)
+        runner.check(
+            "mmap 记录每次都更新（不受 JSON 节流影响）",
+            read_state(state_path)["last_heartbeat"] == signs.last_heartbeat.isoformat(),
+        )
+        writer.close()
+
+        mark_stopped(state_path)
+        runner.check(
+            "mark_stopped 同时更新 JSON 与 mmap 记录",
+            read_state(state_path)["status"] == "stopped"
+            and json.loads(state_path.read_text())["status"] == "stopped",
+        )
+
+        status_record_path(state_path).unlink()
+        runner.check("没有 mmap 记录时回退到 state.json", read_state(state_path)["status"] == "stopped")
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 5. DiscoveryStore 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from src.daemon.discovery import Discovery, DiscoveryStore
+
+        log_path = jarvis_home / "discoveries.jsonl"
+        store = DiscoveryStore(str(log_path))
+        store.INDEX_EVERY = 2
+        items = [Discovery(title=f"发现 {i}", content="c", importance=(i % 5) + 1) for i in range(5)]
+        for d in items:
+            store.add(d)
+
+        lines = log_path.read_text().splitlines()
+        runner.check("每条发现追加一行", len(lines) == 5 and all(json.loads(l)["op"] == "add" for l in lines))
+        runner.check("最近发现从新到旧", [d.title for d in store.get_recent(2)] == ["发现 4", "发现 3"])
+        runner.check(
+            "未读按重要性排序",
+            [r["title"] for r in store.unread_records(2)] == ["发现 4", "发现 3"]
+            and store.unread_count() == 5,
+        )
+
+        store.acknowledge(items[4].id)
+        runner.check("确认只追加一条 ack 记录", len(log_path.read_text().splitlines()) == 6)
+        runner.check("确认后未读数减少", store.unread_count() == 4)
+
+        # 另一个进程（CLI）读到 daemon 追加的尾部
+        other = DiscoveryStore(str(log_path))
+        runner.check("新实例从索引 + 日志尾部恢复", other.count() == 5 and other.unread_count() == 4)
+        store.add(Discovery(title="发现 5", content="c", importance=3))
+        runner.check("已打开的实例看到其他实例的追加", other.count() == 6 and other.get_recent(1)[0].title == "发现 5")
+        other.acknowledge_all()
+        runner.check("acknowledge_all 对其他实例可见", store.unread_count() == 0)
+        runner.check("今日发现", len(store.get_today()) == 6)
+
+        # 压缩：只保留最近 MAX_ENTRIES 条，已读状态并入记录
+        store.MAX_ENTRIES = 3
+        store.compact()
+        lines = [json.loads(l) for l in log_path.read_text().splitlines()]
+        runner.check(
+            "压缩后只保留最近的发现",
+            [r["title"] for r in lines] == ["发现 3", "发现 4", "发现 5"]
+            and all(r["acknowledged"] for r in lines),
+        )
+        runner.check("压缩后其他实例重新加载", other.count() == 3 and other.unread_count() == 0)
+
+        # 旧版 discoveries.json 迁移
+        legacy_home = jarvis_home / "legacy"
+        legacy_home.mkdir()
+        legacy = [Discovery(title="新", content="c", importance=3).to_dict(), Discovery(title="旧", content="c", importance=3).to_dict()]
+        legacy[1]["acknowledged"] = True
+        (legacy_home / "discoveries.json").write_text(json.dumps({"discoveries": legacy}))
+        migrated = DiscoveryStore(str(legacy_home / "discoveries.jsonl"))
+        runner.check(
+            "迁移旧版 discoveries.json",
+            [d.title for d in migrated.get_recent(5)] == ["新", "旧"]
+            and migrated.unread_count() == 1
+            and (legacy_home / "discoveries.json.migrated").exists(),
+        )
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 6. SQLiteDiscoveryStore 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        import sqlite3
+        from src.memory import MemoryIndex
+        from src.daemon.discovery import SQLiteDiscoveryStore
+
+        index = MemoryIndex(jarvis_home / "index.db")
+        sql_store = SQLiteDiscoveryStore(index, import_path=str(log_path))
+        runner.check(
+            "导入追加日志中的发现",
+            sql_store.count() == 3
+            and [d.title for d in sql_store.get_recent(3)] == ["发现 5", "发现 4", "发现 3"]
+            and not log_path.exists()
+            and log_path.with_suffix(".jsonl.migrated").exists(),
+        )
+
+        sql_items = [Discovery(title=f"库 {i}", content="c", importance=i) for i in (2, 5, 4)]
+        for d in sql_items:
+            sql_store.add(d)
+        runner.check("未读数", sql_store.unread_count() == 3)
+        runner.check(
+            "未读按重要性排序",
+            [r["title"] for r in sql_store.unread_records(2)] == ["库 5", "库 4"],
+        )
+        sql_store.acknowledge(sql_items[1].id)
+        runner.check(
+            "确认单条发现",
+            sql_store.unread_count() == 2
+            and [d.title for d in sql_store.get_unacknowledged()] == ["库 4", "库 2"],
+        )
+        runner.check(
+            "分批读取今日记录",
+            [r["title"] for r in sql_store.iter_records(today_only=True, batch=2)][:3] == ["库 4", "库 5", "库 2"],
+        )
+
+        from src.cli import common as cli_common
+        original_home = cli_common.JARVIS_HOME
+        try:
+            cli_common.JARVIS_HOME = jarvis_home
+            ro_count = cli_common.count_unread_discoveries()
+            broken_home = jarvis_home / "broken-home"
+            broken_home.mkdir()
+            (broken_home / "index.db").write_bytes(b"not a database" * 100)
+            cli_common.JARVIS_HOME = broken_home
+            broken_count = cli_common.count_unread_discoveries()
+        finally:
+            cli_common.JARVIS_HOME = original_home
+        runner.check("状态栏未读数只读 COUNT", ro_count == 2, f"实际: {ro_count}")
+        runner.check("索引损坏时未读数回退为 0", broken_count == 0)
+
+        with sqlite3.connect(index.db_path) as conn:
+            plan = " ".join(
+                row[-1] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT * FROM discoveries WHERE acknowledged = 0 "
+                    "ORDER BY importance DESC, timestamp DESC LIMIT 3"
+                )
+            )
+        runner.check("未读查询使用 (acknowledged, importance) 索引", "idx_discoveries_unread" in plan, plan)
+
+        sql_store.acknowledge_all()
+        runner.check("全部确认", sql_store.unread_count() == 0 and sql_store.count() == 6)
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 7. MemoryIndex 连接测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        import threading
+        from src.memory import IndexEntry
+
+        conn = index._connection()
+        runner.check("WAL 模式", conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal")
+        runner.check("synchronous=NORMAL", conn.execute("PRAGMA synchronous").fetchone()[0] == 1)
+        index.count()
+        runner.check("同一线程复用连接", index._connection() is conn)
+
+        entries = [
+            IndexEntry(
+                id=f"bulk-{i}", entry_type="topic", file_path="t.md", date="2024-01-01",
+                title=f"批量 {i}", tags=["bulk"], importance=3, summary="s",
+            )
+            for i in range(200)
+        ]
+        before = conn.total_changes
+        index.bulk_add(entries)
+        runner.check(
+            "bulk_add 单事务写入",
+            index.count("topic") == 200 and conn.total_changes - before >= 200 and not conn.in_transaction,
+        )
+        runner.check("FTS 触发器同步", len(index.recall("批量", limit=500)) == 200)
+
+        counts = []
+        worker = threading.Thread(target=lambda: counts.append(index.count("topic")))
+        worker.start()
+        worker.join()
+        runner.check("其他线程使用独立连接", counts == [200] and len(index._connections) == 2)
+
+        index.close()
+        runner.check("close 后可重新打开", index.count("topic") == 200)
+        index.close()
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 8. 标签表测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        tag_index = MemoryIndex(jarvis_home / "tags.db")
+
+        def tagged(entry_id, *tags):
+            return IndexEntry(
+                id=entry_id, entry_type="topic", file_path="t.md", date="2024-01-01",
+                title=entry_id, tags=list(tags), importance=3, summary="",
+            )
+
+        tag_index.bulk_add([tagged("a", "python", "rust"), tagged("b", "python"), tagged("c", "go")])
+        runner.check("所有标签", tag_index.get_all_tags() == ["go", "python", "rust"])
+        runner.check(
+            "标签计数 / Top-N",
+            tag_index.tag_counts() == [("python", 2), ("go", 1), ("rust", 1)]
+            and tag_index.tag_counts(limit=1) == [("python", 2)],
+        )
+        runner.check(
+            "按标签过滤",
+            sorted(e.id for e in tag_index.search(tags=["rust", "go"])) == ["a", "c"],
+        )
+
+        tag_index.add(tagged("a", "zig"))
+        runner.check(
+            "替换条目时标签同步",
+            tag_index.get_all_tags() == ["go", "python", "zig"] and dict(tag_index.tag_counts())["python"] == 1,
+        )
+        tag_index.delete("c")
+        runner.check("删除条目时标签同步", "go" not in tag_index.get_all_tags())
+
+        with sqlite3.connect(tag_index.db_path) as conn:
+            plan = " ".join(
+                row[-1] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT entry_id FROM memory_tags WHERE tag IN ('python')"
+                )
+            )
+        runner.check("标签查询使用 tag 索引", "idx_tags_tag" in plan, plan)
+
+        # 旧库（没有标签表）升级时回填
+        with sqlite3.connect(tag_index.db_path) as conn:
+            conn.execute("DELETE FROM memory_tags")
+            conn.execute("PRAGMA user_version = 0")
+        tag_index.close()
+        runner.check("旧库回填标签表", MemoryIndex(tag_index.db_path).get_all_tags() == ["python", "zig"])
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 9. 排序召回测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from datetime import date as date_type
+
+        rank_index = MemoryIndex(jarvis_home / "rank.db")
+        today = date_type.today()
+
+        def memory(entry_id, title, summary, importance=3, days_ago=0):
+            return IndexEntry(
+                id=entry_id, entry_type="discovery", file_path="d.md",
+                date=(today - timedelta(days=days_ago)).isoformat(),
+                title=title, tags=[], importance=importance, summary=summary,
+            )
+
+        rank_index.bulk_add([
+            memory("title", "数据库迁移方案", "整理了迁移步骤"),
+            memory("body", "周报", "顺带提到数据库迁移方案还没定"),
+            memory("old", "数据库迁移方案", "整理了迁移步骤", days_ago=365),
+            memory("other", "前端重构", "组件拆分"),
+        ])
+
+        hits = rank_index.rank("数据库迁移")
+        runner.check("中文子串可检索（trigram）", {h.id for h in hits} == {"title", "body", "old"}, str([h.id for h in hits]))
+        runner.check("标题命中排在正文命中之前", hits[0].id == "title", str([(h.id, h.score) for h in hits]))
+        runner.check(
+            "时间衰减：一年前的同样记忆排在后面",
+            [h.id for h in hits].index("old") > [h.id for h in hits].index("title"),
+        )
+        runner.check(
+            "snippet 高亮命中词",
+            all("【" in (h.snippet or "") for h in hits),
+            str([h.snippet for h in hits]),
+        )
+
+        rank_index.add(memory("body", "周报", "顺带提到数据库迁移方案还没定", importance=5))
+        rank_index.add(memory("title", "数据库迁移方案", "整理了迁移步骤", importance=1))
+        boosted = [h.id for h in rank_index.rank("迁移方案")]
+        runner.check("重要性参与排序", boosted.index("body") < boosted.index("title"), str(boosted))
+
+        runner.check(
+            "两字短词 LIKE 兜底",
+            {h.id for h in rank_index.rank("重构")} == {"other"}
+            and {e.id for e in rank_index.search(query="重构")} == {"other"},
+        )
+        runner.check("recall 返回排序结果", rank_index.recall("数据库迁移")[0].score is not None)
+        runner.check("特殊字符不会导致 FTS 语法错误", rank_index.rank('"迁移" OR (') == [])
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 10. ContentIndexer 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from datetime import datetime
+        from src.memory import ContentIndexer, MemoryEntry, MemoryWriter
+        from src.memory.content_index import split_markdown
+
+        sections = split_markdown("# 标题\n\n## 发现\n\n- 10:00 ⭐ **甲**\n  内容甲\n\n- 11:00 ⭐ **乙**\n\n## 笔记\n\n自由文本\n")
+        runner.check(
+            "按标题和列表条目切分",
+            [(sec.heading, sec.line) for sec in sections] == [("标题 › 发现", 5), ("标题 › 发现", 8), ("标题 › 笔记", 12)]
+            and sections[0].body == "- 10:00 ⭐ **甲**\n  内容甲",
+            str(sections),
+        )
+
+        memory_root = jarvis_home / "memory"
+        writer = MemoryWriter(memory_root)
+        for day in (1, 2, 3):
+            writer.append_to_daily(MemoryEntry(
+                timestamp=datetime(2024, 5, day, 9, 0), title=f"第 {day} 天", content="讨论缓存失效策略",
+            ))
+        writer.update_topic("project-jarvis", "笔记", "- 采用 trigram 分词解决中文检索\n")
+        writer.flush()
+
+        content_index = MemoryIndex(jarvis_home / "content.db")
+        indexer = ContentIndexer(content_index, memory_root)
+        first = indexer.reindex()
+        runner.check("首次全部索引", first.files_scanned == 4 and first.files_indexed == 4 and first.bytes_read > 0)
+        second = indexer.reindex()
+        runner.check("未变化的文件只 stat 不读取", second.files_indexed == 0 and second.bytes_read == 0)
+
+        hits = indexer.search("缓存失效")
+        runner.check(
+            "全文检索命中正文（摘要之外的内容）",
+            len(hits) == 3 and all("【缓存失效】" in h.snippet for h in hits) and hits[0].line > 0,
+        )
+        runner.check("检索主题文件", indexer.search("中文检索")[0].path.endswith("project-jarvis.md"))
+
+        daily = writer.get_daily_path(datetime(2024, 5, 1).date())
+        os.utime(daily, (time.time() + 5, time.time() + 5))
+        touched = indexer.reindex()
+        runner.check("只有 mtime 变化时按哈希跳过重建", touched.files_touched == 1 and touched.files_indexed == 0)
+
+        writer.append_to_daily(MemoryEntry(timestamp=datetime(2024, 5, 1, 10, 0), title="新条目", content="向量检索原型"))
+        writer.append_to_daily(MemoryEntry(timestamp=datetime(2024, 5, 2, 10, 0), title="新条目", content="向量检索原型"))
+        writer.flush()
+        limited = indexer.reindex(max_files=1)
+        runner.check("max_files 限制单次重建数量", limited.files_indexed == 1 and len(indexer.search("向量检索")) == 1)
+        indexer.reindex()
+        runner.check("剩余文件在下次补上", len(indexer.search("向量检索")) == 2)
+
+        writer.get_daily_path(datetime(2024, 5, 3).date()).unlink()
+        removed = indexer.reindex()
+        runner.check(
+            "删除的文件移出索引",
+            removed.files_removed == 1 and len(indexer.search("缓存失效")) == 2 and indexer.count()[0] == 3,
+        )
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 11. VectorIndex 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from src.memory.vector_index import HAS_NUMPY, Embedder, HashingEmbedder, VectorIndex
+
+        class IncompleteEmbedder(Embedder):
+            name = "incomplete"
+
+        try:
+            IncompleteEmbedder()
+            abstract_ok = False
+        except TypeError:
+            abstract_ok = True
+        runner.check("未实现 embed 的向量模型实例化即失败", abstract_ok)
+
+        if not HAS_NUMPY:
+            print(yellow("  ⊘ 未安装 numpy，跳过"))
+        else:
+            import numpy as np
+
+            embedder = HashingEmbedder(dim=64)
+            vectors = embedder.embed(["数据库迁移", "", "deploy failed"])
+            norms = np.linalg.norm(vectors, axis=1)
+            runner.check("哈希向量 L2 归一化（空文本为零向量）", np.allclose(norms, [1.0, 0.0, 1.0]))
+
+            vector_index = MemoryIndex(jarvis_home / "vectors.db")
+            vector_path = jarvis_home / "vectors.f32"
+            vi = VectorIndex(vector_index, vector_path, embedder)
+            vi.MIN_CAPACITY = 4
+            vi.SEARCH_BATCH = 2
+            vi.add([("a", "数据库迁移方案"), ("b", "前端组件重构"), ("c", "deploy pipeline failed")])
+            runner.check("检索返回最相近的条目", vi.search("数据库迁移", k=1)[0].entry_id == "a")
+
+            vi.add([("b", "数据库迁移回滚")])
+            runner.check("已有 id 原地覆盖", vi.count() == 3 and vi.search("迁移回滚", k=1)[0].entry_id == "b")
+
+            size_before = vector_path.stat().st_size
+            vi.add([(f"x{i}", f"条目 {i}") for i in range(3)])
+            runner.check(
+                "容量不足时文件扩大一倍",
+                vector_path.stat().st_size == size_before * 2 and vi.count() == 6,
+            )
+            runner.check("跨批检索", vi.search("deploy failed", k=1)[0].entry_id == "c")
+
+            vi.remove(["c"])
+            runner.check("删除后不再命中", all(h.entry_id != "c" for h in vi.search("deploy failed")))
+
+            vector_index.bulk_add([
+                memory("title", "数据库迁移方案", "整理了迁移步骤"),
+                memory("other", "前端重构", "组件拆分"),
+            ])
+            synced = VectorIndex(vector_index, vector_path, embedder)
+            runner.check(
+                "sync 补齐缺失向量并清理孤儿",
+                synced.sync() == 2 and synced.count() == 2,
+                str(synced.count()),
+            )
+
+            fused = [e.id for e in synced.hybrid("数据库迁移失败")]
+            runner.check(
+                "RRF 融合召回仅语义命中的条目",
+                vector_index.rank("数据库迁移失败") == [] and fused[:1] == ["title"],
+                str(fused),
+            )
+
+            runner.check("向量模型变化时重置", VectorIndex(vector_index, vector_path, HashingEmbedder(dim=32)).count() == 0)
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 12. MemoryWriter 日志测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from datetime import date
+
+        journal = MemoryWriter(jarvis_home / "journal")
+        today = date.today()
+        now = datetime.combine(today, datetime.min.time())
+        daily = journal.get_daily_path(today)
+
+        journal.append_to_daily(MemoryEntry(timestamp=now.replace(hour=9), title="早", content="第一条"))
+        template_size = daily.stat().st_size
+        journal.append_to_daily(MemoryEntry(timestamp=now.replace(hour=10), title="午", content="第二条"))
+        journal.append_to_daily(MemoryEntry(
+            timestamp=now.replace(hour=11), title="定了", content="用 SQLite", entry_type="decision",
+        ))
+        runner.check(
+            "追加只写 segment，不重写日志",
+            daily.stat().st_size == template_size
+            and (journal.get_segment_dir(today) / "discovery.md").read_text(encoding="utf-8").count("- ") == 2,
+        )
+
+        text = journal.read_daily(today)
+        runner.check(
+            "读取时物化，section 内新条目在前",
+            text.index("**午**") < text.index("**早**") < text.index("## 对话") < text.index("**定了**"),
+            text,
+        )
+
+        daily.write_text(text.replace("## 里程碑", "## 里程碑\n\n手写的备注"), encoding="utf-8")
+        journal.append_to_daily(MemoryEntry(timestamp=now.replace(hour=12), title="晚", content="第三条"))
+        other = MemoryWriter(jarvis_home / "journal")
+        text = other.read_daily(today)
+        runner.check(
+            "增量合并不重复，保留手工编辑",
+            text.count("**早**") == 1 and text.index("**晚**") < text.index("**午**") and "手写的备注" in text,
+        )
+        runner.check("没有新条目时不重写", other.materialize(today) is False)
+
+        with open(journal.get_segment_dir(today) / "discovery.md", "ab") as f:
+            f.write("- 13:00 ⭐ **半截".encode("utf-8"))
+        runner.check("写到一半的条目留给下次", journal.materialize(today) is False and "半截" not in journal.read_daily(today))
+
+        old_day = date(2024, 1, 1)
+        journal.append_to_daily(MemoryEntry(timestamp=datetime(2024, 1, 1, 8, 0), title="旧", content="旧日志"))
+        rewritten = journal.flush()
+        runner.check(
+            "flush 物化并清理往日 segment，保留当天",
+            rewritten == 1
+            and "**旧**" in journal.get_daily_path(old_day).read_text(encoding="utf-8")
+            and not journal.get_segment_dir(old_day).exists()
+            and journal.get_segment_dir(today).exists(),
+        )
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 13. WriteBehindQueue 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        import threading
+        from src.utils.write_queue import WriteBehindQueue
+
+        batches = []
+        gate = threading.Event()
+
+        def slow_commit(batch):
+            gate.wait(5)
+            batches.append(list(batch))
+
+        wq = WriteBehindQueue(slow_commit, max_batch=4, max_delay=5.0)
+        started = time.perf_counter()
+        for i in range(10):
+            wq.submit(i)
+        runner.check("submit 不等待落盘", time.perf_counter() - started < 0.5 and wq.metrics().depth == 10)
+        gate.set()
+        runner.check("flush 等待全部落盘", wq.flush(timeout=5) and wq.metrics().depth == 0)
+        runner.check(
+            "按 max_batch 攒批，顺序不变",
+            sum(batches, []) == list(range(10)) and max(len(b) for b in batches) == 4,
+            str(batches),
+        )
+
+        wq.submit(10)
+        runner.check("close 时提交剩余条目", wq.close(timeout=5) and batches[-1] == [10])
+        metrics = wq.metrics()
+        runner.check(
+            "统计队列深度与提交耗时",
+            metrics.committed == 11 and metrics.max_depth == 10 and metrics.batches == len(batches)
+            and metrics.max_commit_ms >= metrics.avg_commit_ms > 0,
+            metrics.summary(),
+        )
+
+        def broken_commit(batch):
+            raise OSError("disk full")
+
+        broken = WriteBehindQueue(broken_commit, max_delay=0.01)
+        broken.submit("x")
+        broken.close(timeout=5)
+        runner.check("提交失败计入 failed，不阻塞队列", broken.metrics().failed == 1 and broken.metrics().depth == 0)
+
+        from src.daemon.daemon import DaemonConfig, JarvisDaemon
+        from src.daemon.discovery import DiscoveryType
+
+        daemon_home = jarvis_home / "daemon-home"
+        daemon = JarvisDaemon(DaemonConfig(
+            jarvis_home=str(daemon_home), notification_terminal=False, notification_macos=False,
+            write_batch_delay_seconds=0.2,
+        ))
+        daemon.write_queue.start()
+        for i in range(5):
+            daemon._process_discovery(Discovery(
+                type=DiscoveryType.FILE_INSIGHT, title=f"批量发现 {i}", content="内容", importance=3,
+            ))
+        daemon.write_queue.close(timeout=5)
+        daemon_text = daemon.memory_writer.read_daily()
+        runner.check(
+            "daemon 一批提交：发现、索引、日志都已落盘",
+            daemon.discovery_store.count() == 5
+            and len(daemon.memory_index.search(entry_type="discovery", limit=10)) == 5
+            and daemon_text.count("批量发现") == 5
+            and daemon.write_queue.metrics().batches == 1,
+            daemon.write_queue.metrics().summary(),
+        )
+
+        # 计数变化立即写 state.json，无变化时跳过
+        daemon._state_writer = StateWriter(daemon_home / "state.json", heartbeat_interval=60)
+        daemon._state_writer.write(daemon.life_signs, force=True)
+        daemon._process_discovery(Discovery(
+            type=DiscoveryType.FILE_INSIGHT, title="重要发现", content="内容", importance=5,
+        ))
+        saved = json.loads((daemon_home / "state.json").read_text())
+        runner.check(
+            "发现计数变化立即写入 state.json",
+            saved["discoveries_today"] == 6 and saved["important_discoveries_today"] == 1
+            and daemon._state_writer.writes == 2,
+            f"实际: {saved}",
+        )
+        daemon._save_life_signs()
+        runner.check(
+            "内容未变且未到心跳间隔时跳过写入",
+            daemon._state_writer.writes == 2 and daemon._state_writer.skipped == 1,
+        )
+        daemon.write_queue.close(timeout=5)
+        daemon._state_writer.close()
+        daemon.memory_index.close()
+
+        # 运行中新建被忽略的目录（npm install）：递归监控点重新规划
+        from src.daemon.daemon import HAS_WATCHDOG
+        if HAS_WATCHDOG:
+            watch_root = Path(tmp_dir) / "watch-replan"
+            (watch_root / "web" / "src").mkdir(parents=True)
+            watcher = JarvisDaemon(DaemonConfig(
+                jarvis_home=str(jarvis_home / "watch-home"), watch_paths=[str(watch_root)],
+                notification_terminal=False, notification_macos=False,
+            ))
+            watcher._start_file_watcher()
+            try:
+                before = dict((p, p not in watcher._shallow_watches) for p in watcher._watches)
+                node_modules = watch_root / "web" / "node_modules"
+                (node_modules / "lib").mkdir(parents=True)
+                watcher._on_directory_created(str(node_modules))
+                after = {
+                    Path(p).relative_to(watch_root).as_posix(): p not in watcher._shallow_watches
+                    for p in watcher._watches
+                }
+                runner.check(
+                    "新建的 node_modules 不再被递归监控",
+                    before == {str(watch_root): True}
+                    and after.get("web") is False and after.get("web/src") is True
+                    and not any(k.startswith("web/node_modules") for k in after),
+                    f"之前: {before} 之后: {after}",
+                )
+            finally:
+                watcher._observer.stop()
+                watcher._observer.join(timeout=5)
+                watcher.memory_index.close()
+
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 14. MemoryCatalog 测试 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        from itertools import islice
+        from src.memory import MemoryCatalog
+
+        catalog_root = jarvis_home / "catalog"
+        cw = MemoryWriter(catalog_root)
+        for day in (1, 2, 5):
+            for hour in (9, 10):
+                cw.append_to_daily(MemoryEntry(timestamp=datetime(2024, 3, day, hour, 0), title="条目", content="x"))
+        cw.flush()
+        cw.update_topic("jarvis", "笔记", "- 一条笔记\n")
+        cw.init_persona({})
+
+        runner.check(
+            "写入时登记文件与条目数（不含 segment）",
+            cw.catalog.file_count() == 5 and cw.catalog.file_count("daily") == 3
+            and all(e.entries == 2 for e in cw.catalog.files("daily")),
+            str([(e.path, e.entries) for e in cw.catalog.files()]),
+        )
+
+        days = cw.iter_dailies(date(2024, 3, 2), date(2024, 3, 31))
+        runner.check(
+            "日期范围按新到旧逐个产出",
+            [d.day for d, _ in days] == [5, 2],
+        )
+        runner.check(
+            "调用方停止迭代后不再读取",
+            [d.day for d, _ in islice(cw.iter_dailies(), 1)] == [5],
+        )
+
+        fresh = MemoryCatalog(catalog_root)
+        runner.check("新实例从磁盘加载，无变化时不重列", fresh.reconcile() is False and fresh.file_count() == 5)
+
+        (catalog_root / "daily" / "2024-03-07.md").write_text("# 手写\n\n- a\n- b\n- c\n", encoding="utf-8")
+        (catalog_root / "daily" / "2024-03-01.md").unlink()
+        (catalog_root / "notes").mkdir()
+        (catalog_root / "notes" / "idea.md").write_text("- 想法\n", encoding="utf-8")
+        runner.check(
+            "目录 mtime 变化时对账：新增、删除、新子目录",
+            fresh.reconcile() is True
+            and sorted(e.date for e in fresh.dailies()) == ["2024-03-02", "2024-03-05", "2024-03-07"]
+            and next(fresh.dailies()).entries == 3
+            and fresh.file_count("notes") == 1,
+        )
+        runner.check(
+            "总大小来自目录",
+            fresh.total_size() == sum(
+                p.stat().st_size for p in catalog_root.rglob("*.md") if ".segments" not in p.parts
+            ),
+        )
+
+        with open(catalog_root / "daily" / "2024-03-07.md", "a", encoding="utf-8") as f:
+            f.write("- d\n")
+        runner.check(
+            "目录未变时原地追加也能对账",
+            fresh.reconcile() is True
+            and next(e for e in fresh.dailies() if e.date == "2024-03-07").entries == 4,
+        )
+
+        def saved_entries(day: str) -> int:
+            data = json.loads(cw.catalog.path.read_text(encoding="utf-8"))
+            return next(e["entries"] for e in data["files"] if e["date"] == day)
+
+        cw.append_to_daily(MemoryEntry(timestamp=datetime(2024, 3, 5, 11, 0), title="条目", content="x"))
+        cw.read_daily(date(2024, 3, 5))
+        unsaved = saved_entries("2024-03-05")
+        cw.flush()
+        runner.check(
+            "物化只标记目录为脏，flush 时才保存 files.json",
+            unsaved == 2 and saved_entries("2024-03-05") == 3,
+            f"物化后 {unsaved}，flush 后 {saved_entries('2024-03-05')}",
+        )
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    runner.summary()
+    return runner.failed == 0
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    exit(0 if success else 1)
@@ -360,6 +360,126 @@ async def main():
         runner.check("SYSTEM_PROMPT 包含工具指引", "工具" in client.SYSTEM_PROMPT)
         runner.check("MAX_TOOL_ROUNDS > 0", client.MAX_TOOL_ROUNDS > 0)
 
+        # 连接池: 同一事件循环内复用同一个 AsyncClient
+        http_a = client._get_http()
+        http_b = client._get_http()
+        runner.check("连接池复用同一 AsyncClient", http_a is http_b)
+        async with client:
+            pass
+        runner.check("async with 退出后连接池关闭", http_a.is_closed and client._http is None)
+
+        # Token 账本: 估算规则 + 增量缓存 + tool_calls 参数计入
+        from src.llm.context import TokenLedger, estimate_tokens
+        runner.check("中文按 1 token 估算", estimate_tokens("你好世界") == 4)
+        runner.check("ASCII 按 1/4 token 估算", estimate_tokens("abcdefgh") == 2)
+
+        ledger = TokenLedger()
+        history = [{"role": "user", "content": "你好" * 10}]
+        ledger.sync(history)
+        history.append({
+            "role": "assistant", "content": None,
+            "tool_calls": [{"id": "c1", "type": "function",
+                            "function": {"name": "file_read", "arguments": '{"path": "' + "x" * 40 + '"}'}}],
+        })
+        total = ledger.sync(history)
+        runner.check("账本增量追加", len(ledger) == 2 and total == sum(ledger.counts))
+        runner.check("tool_calls 参数计入 token", ledger.counts[1] > 0)
+        history[:] = history[1:]
+        runner.check("历史被改写后账本重建", ledger.sync(history) == ledger.counts[0] and len(ledger) == 1)
+
+        # 窗口裁剪: tool_calls 与 tool 结果不被拆开
+        convo: list[dict] = []
+        for i in range(5):
+            convo.append({"role": "user", "content": f"问题 {i} " + "x" * 400})
+            convo.append({
+                "role": "assistant", "content": None,
+                "tool_calls": [
+                    {"id": f"t{i}a", "type": "function",
+                     "function": {"name": "file_read", "arguments": "{}"}},
+                    {"id": f"t{i}b", "type": "function",
+                     "function": {"name": "file_read", "arguments": "{}"}},
+                ],
+            })
+            convo.append({"role": "tool", "tool_call_id": f"t{i}a", "content": "y" * 400})
+            convo.append({"role": "tool", "tool_call_id": f"t{i}b", "content": "y" * 400})
+            convo.append({"role": "assistant", "content": f"回答 {i}"})
+        reserve = client.RESPONSE_RESERVE + client.SYSTEM_RESERVE
+        for budget in (50, 150, 250, 400, 10_000):
+            fitted = client._fit_messages_to_window(convo, reserve + budget)
+            ids_open: set = set()
+            paired = True
+            for m in fitted:
+                if m["role"] == "tool" and m["tool_call_id"] not in ids_open:
+                    paired = False
+                if m.get("tool_calls"):
+                    ids_open = {tc["id"] for tc in m["tool_calls"]}
+                    expected = [f["tool_call_id"] for f in fitted if f["role"] == "tool"
+                                and f["tool_call_id"] in ids_open]
+                    paired = paired and len(expected) == len(ids_open)
+            runner.check(f"预算 {budget}: 无孤立 tool 消息", paired and fitted[0]["role"] != "tool")
+        runner.check(
+            "预算充足时保留全部消息",
+            len(client._fit_messages_to_window(convo, reserve + 10_000)) == len(convo),
+        )
+        tiny = client._fit_messages_to_window(convo, reserve + 1)
+        runner.check("预算不足时至少保留最后两个单元", len(tiny) >= 2 and tiny[-1] is convo[-1])
+        orphaned = client._fit_messages_to_window(convo[3:], reserve + 10_000)
+        runner.check("开头的孤立 tool 结果被丢弃", orphaned[0]["role"] != "tool")
+
+        # 后台滚动摘要: 不阻塞 + 只处理新消息 + 分层合并
+        from src.llm.context import RollingSummarizer
+
+        prompts: list[str] = []
+
+        async def fake_summarize(prompt: str) -> str:
+            prompts.append(prompt)
+            await asyncio.sleep(0.05)
+            return f"S{len(prompts)}"
+
+        summarizer = RollingSummarizer(
+            fake_summarize, "{conversation}", keep_recent=2, min_segment=2, fan_in=2,
+        )
+        chat = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"}
+                for i in range(8)]
+        runner.check("启动后台摘要", summarizer.schedule(chat))
+        runner.check("任务未完成时 apply 不阻塞", not summarizer.apply(chat) and len(chat) == 8)
+        await asyncio.sleep(0.1)
+        runner.check("任务完成后替换前缀", summarizer.apply(chat) and len(chat) == 3)
+        runner.check("摘要消息在最前", chat[0]["content"].startswith("[对话摘要]"))
+
+        chat += [{"role": "user" if i % 2 == 0 else "assistant", "content": f"n{i}"}
+                 for i in range(4)]
+        summarizer.schedule(chat)
+        await asyncio.sleep(0.2)
+        summarizer.apply(chat)
+        runner.check("第二段只摘要新消息", "m0" not in prompts[1] and "n0" in prompts[1])
+        runner.check(
+            "满 fan_in 段后合并为上层摘要",
+            len(prompts) == 3 and chat[0]["content"] == "[对话摘要] S3",
+            f"prompts={len(prompts)}, summary={chat[0]['content']}",
+        )
+
+        # 单次提问（background_compaction=False）不启动后台摘要
+        import httpx
+
+        def fake_completion(request):
+            body = 'data: {"choices": [{"delta": {"content": "好"}}]}\n\ndata: [DONE]\n\n'
+            return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+        oneshot = JarvisLLMClient(base_url="http://llm.test", model="test", auth_token="x")
+        oneshot._http = httpx.AsyncClient(transport=httpx.MockTransport(fake_completion))
+        oneshot._http_loop = asyncio.get_running_loop()
+        oneshot.BACKGROUND_COMPACTION_RATIO = 0.0
+        scheduled = []
+        oneshot._summarizer.schedule = lambda msgs: scheduled.append(len(msgs)) or False
+        reply = await oneshot.chat_with_tools(
+            [{"role": "user", "content": "你好"}], background_compaction=False,
+        )
+        runner.check("单次提问不调度后台摘要", reply == "好" and scheduled == [], f"scheduled={scheduled}")
+        await oneshot.chat_with_tools([{"role": "user", "content": "你好"}])
+        runner.check("多轮对话默认仍调度后台摘要", len(scheduled) == 1)
+        await oneshot.aclose()
+
         # 验证 openai tools 格式完整性
         tools_json = client.registry.to_openai_tools()
         for t in tools_json:
@@ -387,6 +507,99 @@ async def main():
                 func.get("parameters", {}).get("type") == "object",
             )
 
+        # ════════════════════════════════════════════════════
+        print(f"\n{bold(cyan('═══ 12. 同轮工具并发执行 ═══'))}\n")
+        # ════════════════════════════════════════════════════
+
+        import time
+
+        class SleepTool(Tool):
+            """测试用：睡眠后返回参数，按 lane 参数决定冲突键"""
+            log: list = []
+
+            @property
+            def name(self): return "sleep_echo"
+            @property
+            def description(self): return "sleep then echo"
+            @property
+            def parameters(self): return {"type": "object", "properties": {}}
+
+            def concurrency_key(self, **kwargs):
+                return kwargs.get("lane")
+
+            async def execute(self, **kwargs):
+                SleepTool.log.append(("start", kwargs["tag"]))
+                await asyncio.sleep(0.2)
+                SleepTool.log.append(("end", kwargs["tag"]))
+                return ToolResult(success=True, output=kwargs["tag"])
+
+        par_registry = ToolRegistry()
+        par_registry.register(SleepTool())
+
+        t0 = time.perf_counter()
+        results = await par_registry.execute_many(
+            [("sleep_echo", {"tag": t}) for t in ("a", "b", "c", "d")],
+            max_concurrency=4,
+        )
+        elapsed = time.perf_counter() - t0
+        runner.check("4 个独立调用并发执行", elapsed < 0.5, f"耗时 {elapsed:.2f}s")
+        runner.check(
+            "结果保持原顺序",
+            [r.output for r in results] == ["a", "b", "c", "d"],
+        )
+
+        t0 = time.perf_counter()
+        await par_registry.execute_many(
+            [("sleep_echo", {"tag": t}) for t in ("a", "b", "c", "d")],
+            max_concurrency=2,
+        )
+        elapsed = time.perf_counter() - t0
+        runner.check("max_concurrency 限制并发数", elapsed >= 0.35, f"耗时 {elapsed:.2f}s")
+
+        SleepTool.log.clear()
+        await par_registry.execute_many([
+            ("sleep_echo", {"tag": "w1", "lane": "path:/tmp/x"}),
+            ("sleep_echo", {"tag": "w2", "lane": "path:/tmp/x"}),
+        ])
+        runner.check(
+            "相同冲突键按原顺序串行",
+            SleepTool.log == [("start", "w1"), ("end", "w1"), ("start", "w2"), ("end", "w2")],
+            f"log: {SleepTool.log}",
+        )
+
+        class BoomTool(Tool):
+            @property
+            def name(self): return "boom"
+            @property
+            def description(self): return "always raises"
+            @property
+            def parameters(self): return {"type": "object", "properties": {}}
+
+            async def execute(self, **kwargs):
+                raise RuntimeError("boom")
+
+        par_registry.register(BoomTool())
+        results = await asyncio.wait_for(par_registry.execute_many([
+            ("sleep_echo", {"tag": "a"}),
+            ("boom", {}),
+            ("sleep_echo", ["a"]),
+            ("sleep_echo", {"tag": "b", "tool_name": "x"}),
+        ]), timeout=5)
+        runner.check(
+            "单个工具出错不阻塞其他调用，结果保持原顺序",
+            [r.success for r in results] == [True, False, False, True]
+            and results[0].output == "a" and results[3].output == "b",
+            f"results: {results}",
+        )
+
+        key_a = registry.get("file_write").concurrency_key(path="~/a.txt", content="")
+        key_b = registry.get("file_read").concurrency_key(path="~/a.txt")
+        runner.check("file_read/file_write 同路径冲突键一致", key_a == key_b)
+        runner.check(
+            "shell_exec 声明串行",
+            registry.get("shell_exec").concurrency_key(command="ls") is not None,
+        )
+
     finally:
         # 清理临时目录
         shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -2,7 +2,7 @@
 Phase 4 Evolution System — 完整测试脚本
 
 测试覆盖:
-1. PatternDetector: 指纹记录、持久化、模式检测
+1. PatternDetector: 指纹记录、SQLite 持久化、SQL 分组检测、旧格式导入
 2. SkillRegistry: 解析、发现、启用/禁用、关键词匹配
 3. SkillGenerator: 草稿生成（降级版）、finalize 写入
 4. SkillSandbox: 格式检查、危险操作检测、综合报告
@@ -205,6 +205,143 @@ async def main():
             "翻译这个文档" in prompt and "file_read" in prompt,
         )
 
+        # 1l. 增量检测：记录第 3 条时立即产生模式事件
+        sql_home = Path(tmp_dir) / ".jarvis_fp_sql"
+        sql_detector = PatternDetector(sql_home)
+        heard = []
+        sql_detector.on_pattern(heard.append)
+        sql_detector.record(InteractionFingerprint(
+            intent="很久以前", domain="blog", tool_chain="file_read→file_write",
+            timestamp=datetime.now() - timedelta(days=60),
+        ))
+        sql_detector.record(InteractionFingerprint(intent="失败", domain="blog", tool_chain="file_read→file_write", success=False))
+        events = []
+        for i in range(4):
+            events.append(sql_detector.record(InteractionFingerprint(
+                intent=f"写博客 #{i}", domain="blog", tool_chain="file_read→file_write",
+                timestamp=datetime.now() - timedelta(minutes=i),
+            )))
+        runner.check(
+            "窗口外与失败的指纹不计数，第 3 条成功指纹触发事件",
+            events[:2] == [None, None] and events[2] is not None and events[3] is None
+            and events[2].frequency == 3,
+            f"events={events}",
+        )
+        runner.check(
+            "on_pattern 回调收到同一事件",
+            len(heard) == 1 and heard[0] is events[2],
+        )
+        in_sql = sql_detector.detect_patterns()
+        runner.check(
+            "detect_patterns() 取走待处理事件，计数桶兜底不重复",
+            [p.id for p in in_sql] == [events[2].id] and sql_detector.detect_patterns() == [],
+        )
+        other = PatternDetector(sql_home)
+        runner.check(
+            "其他实例不会重复产生同一模式",
+            other.detect_patterns() == []
+            and other.detect_patterns(other.get_recent_fingerprints()) == [],
+        )
+        with sql_detector._conn:
+            sql_detector._conn.execute("DELETE FROM fingerprint_groups")
+        sql_detector._rebuild_counters()
+        runner.check(
+            "从指纹表重建计数桶",
+            sql_detector._crossed_groups() == [("blog", "file_read→file_write")],
+        )
+        runner.check(
+            "count_fingerprints 走索引计数",
+            sql_detector.count_fingerprints() == 5 and sql_detector.count_fingerprints(success_only=True) == 4
+            and sql_detector.count_fingerprints(days=90) == 6,
+        )
+
+        # 1m. 每月上限
+        sql_detector.MAX_FINGERPRINTS = 3
+        sql_detector.record(InteractionFingerprint(intent="最新", domain="blog"))
+        runner.check(
+            "当月超过上限时删除最旧的",
+            sql_detector.count_fingerprints() == 3
+            and sql_detector.get_recent_fingerprints()[0].intent == "最新",
+        )
+
+        # 1n. 旧版按月 JSON 导入
+        legacy_home = Path(tmp_dir) / ".jarvis_fp_legacy"
+        legacy_dir = legacy_home / "memory" / "fingerprints"
+        legacy_dir.mkdir(parents=True)
+        (legacy_dir / f"{datetime.now().strftime('%Y-%m')}.json").write_text(
+            json.dumps([InteractionFingerprint(intent="旧格式", domain="code").to_dict()], ensure_ascii=False),
+            encoding="utf-8",
+        )
+        legacy = PatternDetector(legacy_home)
+        runner.check(
+            "导入旧版按月 JSON 文件",
+            [fp.intent for fp in legacy.get_recent_fingerprints()] == ["旧格式"]
+            and not list(legacy_dir.glob("*.json")),
+        )
+
+        # 1o. 本地相似度聚类
+        from src.evolution.fingerprint_cluster import fingerprint_features, cluster_fingerprints
+
+        runner.check(
+            "指纹特征：中文双字 + 英文词 + 领域 + 工具",
+            fingerprint_features("翻译README文档", "translation", "file_read→file_write")
+            == {"翻译", "readme", "文档", "domain:translation", "tool:file_read", "tool:file_write"},
+        )
+        similar = [
+            InteractionFingerprint(intent="翻译 README 文档为英文", domain="translation", tool_chain="file_read→file_write"),
+            InteractionFingerprint(intent="翻译 README 文档", domain="translation", tool_chain="file_read→translate→file_write"),
+            InteractionFingerprint(intent="把 README 文档翻译为英文", domain="translation", tool_chain="file_read→file_write"),
+            InteractionFingerprint(intent="查询明天的天气", domain="weather", tool_chain="web_search"),
+            InteractionFingerprint(intent="翻译 README 文档为英文", domain="translation", tool_chain="file_read→file_write", success=False),
+        ]
+        clusters = cluster_fingerprints(similar, min_size=3)
+        runner.check(
+            "工具链不同的近似重复聚成一簇（排除失败）",
+            len(clusters) == 1 and clusters[0].fingerprint_ids == [fp.id for fp in similar[:3]]
+            and clusters[0].tool_chain == "file_read→file_write",
+            f"clusters={clusters}",
+        )
+
+        cluster_home = Path(tmp_dir) / ".jarvis_fp_cluster"
+        cluster_detector = PatternDetector(cluster_home)
+        for fp in similar:
+            cluster_detector.record(fp)
+        runner.check(
+            "精确分组漏掉近似重复",
+            cluster_detector.detect_patterns() == [],
+        )
+        prompts = []
+
+        async def fake_llm(prompt):
+            prompts.append(prompt)
+            return '[{"cluster": 0, "name": "README 翻译", "suggested_skill_name": "readme-translator"}]'
+
+        named = await cluster_detector.detect_patterns_llm(cluster_detector.get_recent_fingerprints(), fake_llm)
+        runner.check(
+            "LLM 只给簇起名，指纹归属来自本地聚类",
+            len(named) == 1 and named[0].name == "README 翻译"
+            and named[0].suggested_skill_name == "readme-translator"
+            and sorted(named[0].fingerprint_ids) == sorted(fp.id for fp in similar[:3])
+            and len(prompts) == 1 and "天气" not in prompts[0],
+        )
+        runner.check(
+            "已覆盖的簇不再重复产生模式",
+            cluster_detector.detect_similar_patterns() == []
+            and PatternDetector(cluster_home).detect_clusters() == [],
+        )
+
+        async def broken_llm(prompt):
+            raise RuntimeError("offline")
+
+        offline_home = Path(tmp_dir) / ".jarvis_fp_offline"
+        offline = PatternDetector(offline_home)
+        fallback = await offline.detect_patterns_llm(similar, broken_llm)
+        runner.check(
+            "LLM 失败时用代表意图命名",
+            len(fallback) == 1 and fallback[0].name.startswith("translation: ")
+            and fallback[0].frequency == 3,
+        )
+
         # ════════════════════════════════════════════════════
         print(f"\n{bold(cyan('═══ 2. SkillRegistry 测试 ═══'))}\n")
         # ════════════════════════════════════════════════════
@@ -670,6 +807,42 @@ body here
             latest is not None,
         )
 
+        # 6h. 单次快照：指纹只汇总一次，评分不再读数据
+        import dataclasses
+        fetches = []
+        original_fetch = detector.get_recent_fingerprints
+        detector.get_recent_fingerprints = lambda *a, **kw: fetches.append(kw) or original_fetch(*a, **kw)
+        try:
+            snap = meta.snapshot()
+            assessment = meta.assess(snap)
+            report2 = await meta.reflect(snapshot=snap)
+        finally:
+            detector.get_recent_fingerprints = original_fetch
+        runner.check(
+            "快照只取一次最近指纹样例（带 limit）",
+            fetches == [{"days": 30, "limit": meta.LLM_SAMPLE}],
+            f"fetches={fetches}",
+        )
+        runner.check(
+            "快照汇总与逐条统计一致",
+            snap.fingerprint_count == detector.count_fingerprints(days=30)
+            and snap.success_count == detector.count_fingerprints(days=30, success_only=True)
+            and report2.fingerprints_total == snap.fingerprint_count
+            and report2.ability_radar == assessment.ability_radar,
+        )
+        try:
+            snap.memory_files = 0
+            frozen = False
+        except dataclasses.FrozenInstanceError:
+            frozen = True
+        runner.check("快照不可变", frozen)
+        runner.check(
+            "报告记录快照与评分耗时",
+            set(report2.timings) == {"snapshot_ms", "scoring_ms"}
+            and "快照" in report2.render()
+            and meta.get_latest_report().timings == report2.timings,
+        )
+
         # ════════════════════════════════════════════════════
         print(f"\n{bold(cyan('═══ 7. CLI 集成测试 ═══'))}\n")
         # ════════════════════════════════════════════════════
@@ -799,42 +972,85 @@ body here
                 _infer_domain("翻译代码注释", ["shell_exec"]) == "translation",
             )
 
-            # 8b. 测试 _record_fingerprint 写入
+            # 8b. 测试 _record_fingerprint 写入（共享 EvolutionContext 的后台队列）
+            import time
+            from src.cli import evolution_context
+            from src.cli.evolution_context import EvolutionContext, close_evolution_context
+
             fp_home = Path(tmp_dir) / ".jarvis_fp_test"
-            import sys
-            chat_module = sys.modules["src.cli.chat"]
-            original_home = chat_module.JARVIS_HOME
             try:
-                chat_module.JARVIS_HOME = fp_home
+                evolution_context._context = EvolutionContext(fp_home)
+                started = time.perf_counter()
                 _record_fingerprint("读取 README.md 的内容", ["file_read"], success=True)
                 _record_fingerprint("写入新文件", ["file_write"], success=True)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                shared = evolution_context.get_evolution_context()
+                detector, registry, learner, meta = shared.components()
+                runner.check(
+                    "components() 先等队列落盘，再返回共享实例",
+                    detector.count_fingerprints() == 2 and shared.metrics().committed == 2
+                    and shared.components()[0] is detector and shared.components()[3] is meta,
+                    f"入队耗时 {elapsed_ms:.1f} ms",
+                )
+                learner.observe_explicit("language", "reply", "中文")
+                other_learner = PreferenceLearner(fp_home)
+                other_learner.observe_explicit("style", "tone", "简洁")
+                runner.check(
+                    "preferences.json 被其他实例改过后重新加载",
+                    shared.learner is not learner and len(shared.learner.get_all_preferences()) == 2,
+                )
+                batch_context = EvolutionContext(Path(tmp_dir) / ".jarvis_fp_batch")
+                batch_context._write_fingerprints([
+                    InteractionFingerprint(intent="批内第一条", domain="code"),
+                    None,  # 坏数据
+                    InteractionFingerprint(intent="批内第三条", domain="code"),
+                ])
+                runner.check(
+                    "同批中一条失败不影响其他指纹",
+                    batch_context.detector.count_fingerprints() == 2,
+                )
+                batch_context.close()
+                close_evolution_context()
+
+                import subprocess
+                import sys
+                probe = subprocess.run(
+                    [sys.executable, "-c",
+                     "import sys, src.cli.evolution_context; print('src.daemon' in sys.modules)"],
+                    capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent,
+                )
+                runner.check(
+                    "EvolutionContext 不导入 daemon 包",
+                    probe.stdout.strip() == "False",
+                    probe.stdout + probe.stderr,
+                )
 
-                fp_dir = fp_home / "memory" / "fingerprints"
-                fp_files = list(fp_dir.glob("*.json"))
+                fp_db = fp_home / "memory" / "fingerprints" / "fingerprints.db"
                 runner.check(
-                    "指纹文件已创建",
-                    len(fp_files) >= 1,
-                    f"found {len(fp_files)} files in {fp_dir}",
+                    "指纹库已创建",
+                    fp_db.exists(),
+                    f"missing {fp_db}",
                 )
 
-                if fp_files:
-                    data = json.loads(fp_files[0].read_text(encoding="utf-8"))
+                if fp_db.exists():
+                    from src.evolution.pattern_detector import PatternDetector
+                    data = PatternDetector(fp_home).get_recent_fingerprints()
                     runner.check(
                         "指纹内容正确",
-                        len(data) == 2 and data[0]["domain"] == "document",
-                        f"count={len(data)}, domain={data[0].get('domain') if data else '?'}",
+                        len(data) == 2 and data[-1].domain == "document",
+                        f"count={len(data)}, domain={data[-1].domain if data else '?'}",
                     )
             finally:
-                chat_module.JARVIS_HOME = original_home
+                close_evolution_context()
 
             # 8c. _record_fingerprint 不抛异常（静默失败）
             try:
-                chat_module.JARVIS_HOME = Path("/nonexistent/path/12345")
+                evolution_context._context = EvolutionContext(Path("/nonexistent/path/12345"))
                 _record_fingerprint("test", [], success=True)
-                chat_module.JARVIS_HOME = original_home
+                close_evolution_context()
                 runner.check("指纹记录失败不抛异常", True)
             except Exception as e:
-                chat_module.JARVIS_HOME = original_home
+                close_evolution_context()
                 runner.check("指纹记录失败不抛异常", False, str(e))
 
         else:
@@ -865,8 +1081,8 @@ body here
                 "_DOMAIN_KEYWORDS" in chat_source,
             )
             runner.check(
-                "PatternDetector 导入 (源码)",
-                "PatternDetector" in chat_source,
+                "共享 EvolutionContext (源码)",
+                "get_evolution_context" in chat_source,
             )
 
         # ════════════════════════════════════════════════════